@@ -0,0 +1,45 @@
+from typing import Optional
+from telegram._utils.defaultvalue import DefaultValue
+from telegram.request import BaseRequest, HTTPXRequest, RequestData
+from app.utils.deadline import time_remaining
+
+
+class DeadlineRequest(HTTPXRequest):
+    """
+    Request backend that caps Bot API timeouts by the current update's deadline.
+    
+    A reply still gets `MIN_TIMEOUT` once the budget is spent: the user is
+    better served by a late answer than by none.
+    """
+    
+    MIN_TIMEOUT = 1.0
+    
+    async def do_request(
+        self,
+        url: str,
+        method: str,
+        request_data: Optional[RequestData] = None,
+        read_timeout=BaseRequest.DEFAULT_NONE,
+        write_timeout=BaseRequest.DEFAULT_NONE,
+        connect_timeout=BaseRequest.DEFAULT_NONE,
+        pool_timeout=BaseRequest.DEFAULT_NONE,
+    ):
+        remaining = time_remaining()
+        if remaining is not None:
+            budget = max(remaining, self.MIN_TIMEOUT)
+            timeouts = self._client.timeout
+            default_write = self._media_write_timeout if request_data and request_data.multipart_data else timeouts.write
+            read_timeout = self._cap(read_timeout, timeouts.read, budget)
+            write_timeout = self._cap(write_timeout, default_write, budget)
+            connect_timeout = self._cap(connect_timeout, timeouts.connect, budget)
+            pool_timeout = self._cap(pool_timeout, timeouts.pool, budget)
+        
+        return await super().do_request(
+            url, method, request_data, read_timeout, write_timeout, connect_timeout, pool_timeout
+        )
+    
+    @staticmethod
+    def _cap(value, default: Optional[float], budget: float) -> float:
+        if isinstance(value, DefaultValue):
+            value = default
+        return budget if value is None else min(value, budget)
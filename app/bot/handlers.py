@@ -1,17 +1,27 @@
+import html
 import logging
 import asyncio
 from typing import Dict, List, Optional
 from telegram import Update, Bot, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import RetryAfter
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters
 from app.config import settings
 from app.bot.messages import ArabicMessages
 from app.bot.keyboards import ArabicKeyboards
+from app.bot.webhook_reply import direct_send
+from app.bot.deadline_request import DeadlineRequest
+from app.bot.result_service import result_service
 from app.database.supabase_client import supabase_client
-from app.external.najah_api import najah_api
+from app.database.analytics import analytics_buffer
 from app.external.cache import redis_cache
+from app.external.rollups import usage_rollups
+from app.external.user_activity import user_activity
+from app.external.retry_policy import retry_policies, parse_retry_after
 from app.utils.validation import ValidationUtils, RateLimitUtils
-from app.database.models import UserSession
-from datetime import datetime
+from app.utils.deadline import deadline_scope, no_deadline, run_with_deadline
+from app.utils.profiler import runtime_profiler
+from app.database.models import UserSession, AnalyticsEvent
+from datetime import datetime, timezone
 import time
 
 logger = logging.getLogger(__name__)
@@ -26,9 +36,13 @@ class BotHandlers:
         self.keyboards = ArabicKeyboards()
         self.bot_manager = bot_manager  # For single interface mode
         self.application = application  # Direct reference to application
+        self._warmup_task: Optional[asyncio.Task] = None
+        self._profile_task: Optional[asyncio.Task] = None
     
     async def start_command(self, update: Update, context) -> None:
         """Handle /start command"""
+        started = time.monotonic()
+        success = True
         try:
             user = update.effective_user
             logger.info(f"Start command from user {user.id} on shard {self.shard_id}")
@@ -39,7 +53,7 @@ class BotHandlers:
                 return
             
             # Save user session
-            self._save_user_session(user.id, "main_menu")
+            await self._save_user_session(user.id, "main_menu")
             
             await update.message.reply_text(
                 self.messages.WELCOME_MESSAGE,
@@ -47,21 +61,32 @@ class BotHandlers:
             )
             
         except Exception as e:
+            success = False
             logger.error(f"Error in start command: {e}")
             await self._send_error_message(update)
+        finally:
+            self._track(update, "start", started, success)
     
     async def button_callback(self, update: Update, context) -> None:
         """Handle inline keyboard button callbacks"""
+        started = time.monotonic()
+        success = True
+        action = "callback"
+        search_type = search_term = None
         try:
             query = update.callback_query
             user = query.from_user
             data = query.data
             
             logger.info(f"Callback from user {user.id}: {data}")
+            action = self._callback_action(data)
+            if data.startswith("select_student_"):
+                search_type, search_term = "examno", data[15:]
             
             # Only check rate limit for actual searches, not menu navigation
             if data in ["search_name", "search_examno"] or data.startswith("select_student_"):
                 if not await self._check_rate_limit(user.id):
+                    action = "rate_limited"
                     await query.answer(self.messages.RATE_LIMIT_EXCEEDED, show_alert=True)
                     return
             
@@ -92,11 +117,18 @@ class BotHandlers:
                 )
                 
         except Exception as e:
+            success = False
             logger.error(f"Error in button callback: {e}")
             await self._send_callback_error(update.callback_query)
+        finally:
+            self._track(update, action, started, success, search_type, search_term)
     
     async def text_message(self, update: Update, context) -> None:
         """Handle text messages"""
+        started = time.monotonic()
+        success = True
+        action = "message"
+        search_type = search_term = None
         try:
             user = update.effective_user
             text = update.message.text
@@ -104,12 +136,16 @@ class BotHandlers:
             logger.info(f"Text message from user {user.id}: {text[:50]}...")
             
             # Get user session to determine current state
-            session = supabase_client.get_user_session(user.id)
+            session = await self._get_user_session(user.id)
             current_state = session.current_state if session else "main_menu"
+            if current_state in ["waiting_name", "waiting_examno"]:
+                search_type = "name" if current_state == "waiting_name" else "examno"
+                action, search_term = f"search_{search_type}", text
             
             # Only check rate limit for actual search inputs, not menu navigation
             if current_state in ["waiting_name", "waiting_examno"]:
                 if not await self._check_rate_limit(user.id):
+                    action = "rate_limited"
                     await update.message.reply_text(
                         self.messages.RATE_LIMIT_EXCEEDED,
                         reply_markup=self.keyboards.back_to_main_keyboard()
@@ -133,8 +169,11 @@ class BotHandlers:
                 )
                 
         except Exception as e:
+            success = False
             logger.error(f"Error in text message handler: {e}")
             await self._send_error_message(update)
+        finally:
+            self._track(update, action, started, success, search_type, search_term)
 
     async def admin_status_command(self, update: Update, context) -> None:
         """Admin command to get bot status and statistics"""
@@ -170,7 +209,7 @@ class BotHandlers:
             logger.info(f"Admin broadcast command from user {user.id}")
             
             # Set state to waiting for broadcast message
-            self._save_user_session(user.id, "waiting_broadcast")
+            await self._save_user_session(user.id, "waiting_broadcast")
             
             await update.message.reply_text(
                 "📢 <b>إرسال رسالة جماعية</b>\n\n"
@@ -186,6 +225,129 @@ class BotHandlers:
         except Exception as e:
             logger.error(f"Error in admin broadcast command: {e}")
             await update.message.reply_text("❌ خطأ في أمر البث")
+    
+    async def admin_warm_cache_command(self, update: Update, context) -> None:
+        """Admin command to warm exam result caches in the background"""
+        try:
+            user = update.effective_user
+            
+            # Check if user is admin
+            if not self._is_admin(user.id):
+                await update.message.reply_text("❌ غير مصرح لك بالوصول لهذا الأمر")
+                return
+            
+            logger.info(f"Admin warm cache command from user {user.id}")
+            
+            if self._warmup_task and not self._warmup_task.done():
+                await update.message.reply_text("⏳ تسخين الذاكرة المؤقتة قيد التنفيذ بالفعل")
+                return
+            
+            # Optional limit: /admin_warm_cache 10000
+            limit = int(context.args[0]) if context.args and context.args[0].isdigit() else None
+            
+            self._warmup_task = asyncio.create_task(self._run_cache_warmup(update, limit))
+            
+            await update.message.reply_text("🔥 بدأ تسخين الذاكرة المؤقتة للنتائج...")
+        
+        except Exception as e:
+            logger.error(f"Error in admin warm cache command: {e}")
+            await update.message.reply_text("❌ خطأ في أمر تسخين الذاكرة المؤقتة")
+    
+    async def admin_profile_command(self, update: Update, context) -> None:
+        """Admin command to profile this worker (CPU and await chains, or memory growth)"""
+        try:
+            user = update.effective_user
+            
+            # Check if user is admin
+            if not self._is_admin(user.id):
+                await update.message.reply_text("❌ غير مصرح لك بالوصول لهذا الأمر")
+                return
+            
+            logger.info(f"Admin profile command from user {user.id}")
+            
+            if self._profile_task and not self._profile_task.done():
+                await update.message.reply_text("⏳ التحليل قيد التنفيذ بالفعل")
+                return
+            
+            # /admin_profile [seconds] [memory]
+            args = context.args or []
+            seconds = float(args[0]) if args and args[0].replace(".", "", 1).isdigit() else 10.0
+            memory = "memory" in args
+            
+            self._profile_task = asyncio.create_task(self._run_profile(update, seconds, memory))
+            
+            mode = "الذاكرة" if memory else "المعالج"
+            await update.message.reply_text(f"🔬 بدأ تحليل {mode} لمدة {min(seconds, settings.profiler_max_seconds):.0f} ثانية...")
+        
+        except Exception as e:
+            logger.error(f"Error in admin profile command: {e}")
+            await update.message.reply_text("❌ خطأ في أمر التحليل")
+    
+    async def _run_profile(self, update: Update, seconds: float, memory: bool) -> None:
+        """Run the profiler and send the result to the admin"""
+        try:
+            with no_deadline():
+                if memory:
+                    report = await runtime_profiler.memory(seconds, limit=10)
+                    lines = [
+                        f"• +{item['size_diff_kb']:.0f} KB ({item['count_diff']:+d}) <code>{html.escape(item['location'][-60:])}</code>"
+                        for item in report["top"]
+                    ]
+                    await update.message.reply_text(
+                        f"🧠 <b>نمو الذاكرة خلال {report['duration']:.0f} ثانية</b>\n"
+                        f"المتتبع: {report['traced_kb']:.0f} KB • الذروة: {report['peak_kb']:.0f} KB\n\n" + "\n".join(lines),
+                        parse_mode='HTML'
+                    )
+                    return
+                
+                result = await runtime_profiler.cpu(seconds)
+            
+            lines = [
+                f"• {item['wall_seconds']:.1f}s <code>{html.escape(item['coroutine'][:60])}</code>"
+                for item in result.top_coroutines(10)
+            ]
+            folded = result.folded(result.stacks)
+            if not folded:
+                # No loop samples (idle worker or starved sampler): Telegram rejects empty files
+                await update.message.reply_text(f"🔬 لم تُجمع عينات للمعالج خلال {result.duration:.0f} ثانية ({result.samples} عينة)")
+            else:
+                await update.message.reply_document(
+                    document=folded.encode(),
+                    filename=f"profile-{time.strftime('%Y%m%d-%H%M%S')}.folded",
+                    caption=f"🔬 {result.samples} عينة خلال {result.duration:.0f} ثانية (speedscope / flamegraph.pl)"
+                )
+            await update.message.reply_text(
+                "⏱️ <b>وقت الانتظار حسب الدالة غير المتزامنة:</b>\n\n" + "\n".join(lines),
+                parse_mode='HTML'
+            )
+        
+        except Exception as e:
+            logger.error(f"Error running profiler: {e}")
+            await update.message.reply_text("❌ فشل التحليل")
+    
+    async def _run_cache_warmup(self, update: Update, limit: Optional[int]) -> None:
+        """Run cache warm-up and report the result to the admin"""
+        from app.jobs.warm_cache import warm_cache
+        
+        try:
+            # Admin jobs are not bound by the triggering update's deadline
+            with no_deadline():
+                report = await warm_cache(limit=limit)
+            
+            await update.message.reply_text(
+                f"✅ <b>تم تسخين الذاكرة المؤقتة</b>\n\n"
+                f"📊 الإجمالي: {report.total}\n"
+                f"🔥 تمت إضافتها: {report.warmed}\n"
+                f"💾 موجودة مسبقاً: {report.already_cached} ({report.hit_ratio:.1%})\n"
+                f"⚠️ بدون نتيجة: {report.not_cacheable}\n"
+                f"❌ فشلت: {report.failed}\n"
+                f"⏱️ الوقت المستغرق: {report.duration:.1f} ثانية",
+                parse_mode='HTML'
+            )
+        
+        except Exception as e:
+            logger.error(f"Error running cache warm-up: {e}")
+            await update.message.reply_text("❌ فشل تسخين الذاكرة المؤقتة")
 
     async def _handle_broadcast_message(self, update: Update, message_text: str) -> None:
         """Handle broadcast message from admin"""
@@ -193,7 +355,7 @@ class BotHandlers:
             user_id = update.effective_user.id
             
             if message_text.strip().lower() == '/cancel':
-                self._save_user_session(user_id, "main_menu")
+                await self._save_user_session(user_id, "main_menu")
                 await update.message.reply_text("❌ تم إلغاء البث الجماعي")
                 return
             
@@ -207,7 +369,7 @@ class BotHandlers:
             )
             
             # Save broadcast message in session
-            self._save_user_session(
+            await self._save_user_session(
                 user_id, 
                 "waiting_broadcast_confirm", 
                 {"broadcast_message": message_text}
@@ -225,7 +387,7 @@ class BotHandlers:
             user_id = update.effective_user.id
             
             if confirmation_text.strip() in ['إلغاء', 'الغاء', 'cancel']:
-                self._save_user_session(user_id, "main_menu")
+                await self._save_user_session(user_id, "main_menu")
                 await update.message.reply_text("❌ تم إلغاء البث الجماعي")
                 return
             
@@ -236,21 +398,23 @@ class BotHandlers:
                 return
             
             # Get broadcast message from session
-            session = supabase_client.get_user_session(user_id)
+            session = await self._get_user_session(user_id)
             if not session or not session.search_history or not session.search_history.get("broadcast_message"):
                 await update.message.reply_text("❌ خطأ: لم يتم العثور على الرسالة")
                 return
             
             broadcast_message = session.search_history["broadcast_message"]
             
-            # Start broadcast
-            status_msg = await update.message.reply_text("🚀 جاري البث الجماعي...")
+            # Start broadcast (sent directly: the message is edited afterwards)
+            with direct_send():
+                status_msg = await update.message.reply_text("🚀 جاري البث الجماعي...")
             
             # Execute broadcast
-            result = await self._execute_broadcast(broadcast_message)
+            with no_deadline():
+                result = await self._execute_broadcast(broadcast_message)
             
             # Reset session
-            self._save_user_session(user_id, "main_menu")
+            await self._save_user_session(user_id, "main_menu")
             
             # Send result
             await status_msg.edit_text(
@@ -288,23 +452,36 @@ class BotHandlers:
                 redis_status = "🔴 خطأ"
                 redis_memory = "غير معروف"
             
-            # Get database stats
+            cache_stats = redis_cache.get_stats()
+            
+            # Traffic from the precomputed rollups
+            hour = await usage_rollups.summary("m", 60)
+            if "error" in hour:
+                traffic_status = "غير متاح"
+            else:
+                latency = hour["latency_ms"]
+                traffic_status = (
+                    f"{hour['requests']} طلب • {hour['failures']} فشل • {hour['unique_users']} مستخدم\n"
+                    f"• زمن الاستجابة: p50 {latency['p50'] or 0:.0f}ms • p95 {latency['p95'] or 0:.0f}ms • p99 {latency['p99'] or 0:.0f}ms\n"
+                    f"• تأخر حلقة الأحداث: p99 {hour['loop_lag_ms']['p99'] or 0:.0f}ms • حظر: {hour['slow_callbacks']}"
+                )
+            near_stats = cache_stats["near"]
+            if near_stats.get("enabled", True):
+                near_status = f"{near_stats['hit_ratio']:.0%} إصابة • {near_stats['entries']} عنصر • {near_stats['evictions']} إخلاء"
+            else:
+                near_status = "معطل"
+            
+            # Unique users from HyperLogLogs (no table scans)
+            user_counts = await user_activity.get_counts()
+            total_users = user_counts.get("total", "خطأ")
+            active_today = user_counts.get("today", "خطأ")
+            active_hour = user_counts.get("this_hour", "خطأ")
+            
+            # Check database with a single-row read
             try:
-                # Get total users count
-                users_result = supabase_client.client.table("user_sessions").select("user_id", count="exact").execute()
-                total_users = users_result.count if users_result.count else 0
-                
-                # Get today's active users
-                today = datetime.now().date()
-                active_today_result = supabase_client.client.table("user_sessions").select(
-                    "user_id", count="exact"
-                ).gte("created_at", today.isoformat()).execute()
-                active_today = active_today_result.count if active_today_result.count else 0
-                
+                supabase_client.client.table("students").select("examno").limit(1).execute()
                 db_status = "🟢 متصل"
             except Exception as e:
-                total_users = "خطأ"
-                active_today = "خطأ"
                 db_status = f"🔴 خطأ: {str(e)[:50]}"
             
             # Build status message
@@ -316,9 +493,13 @@ class BotHandlers:
 • البوتات النشطة: {bot_stats.get('active_shards', 0)}
 • إجمالي السعة: {bot_stats.get('total_capacity_per_second', 'غير معروف')} رسالة/ثانية
 
+📈 <b>آخر ساعة:</b>
+• {traffic_status}
+
 👥 <b>المستخدمين:</b>
 • إجمالي المستخدمين: {total_users}
 • نشط اليوم: {active_today}
+• نشط هذه الساعة: {active_hour}
 
 💾 <b>قاعدة البيانات:</b>
 • الحالة: {db_status}
@@ -327,6 +508,8 @@ class BotHandlers:
 🔄 <b>التخزين المؤقت (Redis):</b>
 • الحالة: {redis_status}
 • الذاكرة المستخدمة: {redis_memory}
+• نسبة الإصابة: {cache_stats['redis']['hit_ratio']:.0%}
+• الذاكرة المحلية: {near_status}
 
 ⚙️ <b>النظام:</b>
 • البيئة: {settings.environment}
@@ -420,11 +603,15 @@ class BotHandlers:
             else:
                 raise Exception("No bot available for broadcast")
             
-            await bot.send_message(
-                chat_id=user_id,
-                text=message,
-                parse_mode='HTML'
-            )
+            policy = retry_policies["telegram"]
+            policy.record_request()
+            try:
+                await bot.send_message(chat_id=user_id, text=message, parse_mode='HTML')
+            except RetryAfter as e:
+                # Flood control: wait as Telegram asks (within the retry budget) and try once more
+                if await policy.backoff(policy.base_delay, parse_retry_after(e.retry_after)) is None:
+                    raise
+                await bot.send_message(chat_id=user_id, text=message, parse_mode='HTML')
             return True
             
         except Exception as e:
@@ -433,7 +620,7 @@ class BotHandlers:
     
     async def _show_main_menu(self, query) -> None:
         """Show main menu"""
-        self._save_user_session(query.from_user.id, "main_menu")
+        await self._save_user_session(query.from_user.id, "main_menu")
         await query.edit_message_text(
             self.messages.WELCOME_MESSAGE,
             reply_markup=self.keyboards.main_menu()
@@ -447,7 +634,7 @@ class BotHandlers:
             return
             
         # Set state to waiting for governorate selection
-        self._save_user_session(query.from_user.id, "waiting_governorate")
+        await self._save_user_session(query.from_user.id, "waiting_governorate")
         
         await query.edit_message_text(
             "🏛️ اختر المحافظة أولاً لتقليل النتائج المكررة:",
@@ -461,7 +648,7 @@ class BotHandlers:
             await self._send_subscription_message(query)
             return
             
-        self._save_user_session(query.from_user.id, "waiting_examno")
+        await self._save_user_session(query.from_user.id, "waiting_examno")
         await query.edit_message_text(
             self.messages.EXAMNO_SEARCH_PROMPT,
             reply_markup=self.keyboards.back_to_main_keyboard()
@@ -488,7 +675,7 @@ class BotHandlers:
         
         # Get selected governorate from session
         user_id = update.effective_user.id
-        session = supabase_client.get_user_session(user_id)
+        session = await self._get_user_session(user_id)
         
         logger.info(f"Name search for user {user_id}: session={session}, history={session.search_history if session else None}")
         
@@ -503,9 +690,9 @@ class BotHandlers:
         
         # Search for students in the selected governorate
         logger.info(f"Searching for name='{clean_name}' in governorate='{selected_governorate}'")
-        search_result = supabase_client.search_students_by_name(
-            clean_name, selected_governorate, limit=5
-        )
+        search_result = await run_with_deadline(asyncio.to_thread(
+            supabase_client.search_students_by_name, clean_name, selected_governorate, limit=5
+        ))
         
         logger.info(f"Search result: {len(search_result.students)} students found")
         
@@ -540,19 +727,19 @@ class BotHandlers:
             )
         
         # Reset session state
-        self._save_user_session(update.effective_user.id, "main_menu")
+        await self._save_user_session(update.effective_user.id, "main_menu")
     
     async def _handle_governorate_selection(self, query, gov_name: str) -> None:
         """Handle governorate selection for name search"""
         user_id = query.from_user.id
         
         # Get session to check current state
-        session = supabase_client.get_user_session(user_id)
+        session = await self._get_user_session(user_id)
         current_state = session.current_state if session else "main_menu"
         
         if current_state == "waiting_governorate":
             # Save selected governorate and prompt for name
-            self._save_user_session(
+            await self._save_user_session(
                 user_id, 
                 "waiting_name", 
                 {"selected_governorate": gov_name}
@@ -582,9 +769,9 @@ class BotHandlers:
             return
         
         # Search for students
-        search_result = supabase_client.search_students_by_name(
-            search_name, gov_name, limit=5
-        )
+        search_result = await run_with_deadline(asyncio.to_thread(
+            supabase_client.search_students_by_name, search_name, gov_name, limit=5
+        ))
         
         if not search_result.students:
             await query.edit_message_text(
@@ -622,74 +809,47 @@ class BotHandlers:
         # Show loading message
         await query.edit_message_text("🔍 جاري البحث عن النتيجة...")
         
-        # Get student and result from database first
-        student_data = supabase_client.get_student_with_result(examno)
+        # Rendered result from cache, database or external API
+        result_text = await result_service.get_result_text(examno)
         
-        if not student_data or not student_data["student"]:
+        if not result_text:
             await query.edit_message_text(
                 "❌ لم يتم العثور على بيانات الطالب",
                 reply_markup=self.keyboards.back_to_main_keyboard()
             )
             return
         
-        student = student_data["student"]
-        exam_result = student_data["exam_result"]
-        
-        # If no result in database, try external API as fallback
-        if not exam_result:
-            result_response = await najah_api.get_exam_result(examno)
-            if result_response.success:
-                result_text = self.messages.format_exam_result_from_api(result_response.data)
-            else:
-                result_text = self.messages.format_exam_result(student, None)
-        else:
-            # Format result from database
-            result_text = self.messages.format_exam_result(student, exam_result)
-        
         await query.edit_message_text(
             result_text,
             reply_markup=self.keyboards.result_actions_keyboard(examno)
         )
         
         # Reset user session
-        self._save_user_session(query.from_user.id, "main_menu")
+        await self._save_user_session(query.from_user.id, "main_menu")
     
     async def _show_student_result_from_message(self, update: Update, examno: str) -> None:
         """Show student result from text message"""
-        # Show loading message
-        loading_msg = await update.message.reply_text("🔍 جاري البحث عن النتيجة...")
+        # Show loading message (sent directly: the message is edited afterwards)
+        with direct_send():
+            loading_msg = await update.message.reply_text("🔍 جاري البحث عن النتيجة...")
         
-        # Get student and result from database first
-        student_data = supabase_client.get_student_with_result(examno)
+        # Rendered result from cache, database or external API
+        result_text = await result_service.get_result_text(examno)
         
-        if not student_data or not student_data["student"]:
+        if not result_text:
             await loading_msg.edit_text(
                 "❌ لم يتم العثور على بيانات الطالب",
                 reply_markup=self.keyboards.back_to_main_keyboard()
             )
             return
         
-        student = student_data["student"]
-        exam_result = student_data["exam_result"]
-        
-        # If no result in database, try external API as fallback
-        if not exam_result:
-            result_response = await najah_api.get_exam_result(examno)
-            if result_response.success:
-                result_text = self.messages.format_exam_result_from_api(result_response.data)
-            else:
-                result_text = self.messages.format_exam_result(student, None)
-        else:
-            # Format result from database
-            result_text = self.messages.format_exam_result(student, exam_result)
-        
         await loading_msg.edit_text(
             result_text,
             reply_markup=self.keyboards.result_actions_keyboard(examno)
         )
         
         # Reset user session
-        self._save_user_session(update.effective_user.id, "main_menu")
+        await self._save_user_session(update.effective_user.id, "main_menu")
     
     async def _share_result(self, query, examno: str) -> None:
         """Handle result sharing - forward the message"""
@@ -716,21 +876,15 @@ class BotHandlers:
         """Show student result via message (not callback)"""
         try:
             # This is a copy of _show_student_result but for message responses
-            student_data = supabase_client.get_student_with_result(examno)
+            result_text = await result_service.get_result_text(examno)
             
-            if not student_data:
+            if not result_text:
                 await update.message.reply_text(
                     self.messages.NO_RESULTS_FOUND,
                     reply_markup=self.keyboards.back_to_main_keyboard()
                 )
                 return
             
-            student = student_data['student']
-            exam_result = student_data.get('exam_result')
-            
-            # Format result message
-            result_text = self.messages.format_exam_result(student, exam_result)
-            
             await update.message.reply_text(
                 result_text,
                 reply_markup=self.keyboards.result_actions_keyboard(examno)
@@ -742,9 +896,48 @@ class BotHandlers:
                 self.messages.SYSTEM_ERROR,
                 reply_markup=self.keyboards.back_to_main_keyboard()
             )
-
-    def _save_user_session(self, user_id: int, state: str, history: dict = None) -> None:
-        """Save user session state"""
+    
+    @staticmethod
+    def _callback_action(data: str) -> str:
+        """Analytics action name for callback data (without user-specific suffixes)"""
+        for prefix, action in (("select_student_", "result"), ("gov_", "governorate"), ("share_", "share")):
+            if data.startswith(prefix):
+                return action
+        return data if data in ("main_menu", "search_name", "search_examno", "check_subscription") else "callback"
+    
+    def _track(
+        self,
+        update: Update,
+        action: str,
+        started: float,
+        success: bool = True,
+        search_type: Optional[str] = None,
+        search_term: Optional[str] = None
+    ) -> None:
+        """Queue an analytics event for this update; never waits on the database"""
+        user = update.effective_user
+        if not user:
+            return
+        event = AnalyticsEvent(
+            user_id=user.id,
+            action=action,
+            search_type=search_type,
+            search_term=search_term[:100] if search_term else None,
+            success=success,
+            response_time_ms=int((time.monotonic() - started) * 1000),
+            shard_id=self.shard_id,
+            created_at=datetime.now(timezone.utc)
+        )
+        analytics_buffer.emit(event)
+        usage_rollups.record(event)
+        user_activity.record(user.id)
+    
+    async def _get_user_session(self, user_id: int) -> Optional[UserSession]:
+        """Get user session state (sync client, off the event loop)"""
+        return await run_with_deadline(asyncio.to_thread(supabase_client.get_user_session, user_id))
+    
+    async def _save_user_session(self, user_id: int, state: str, history: dict = None) -> None:
+        """Save user session state (sync client, off the event loop)"""
         try:
             session = UserSession(
                 user_id=user_id,
@@ -752,7 +945,7 @@ class BotHandlers:
                 search_history=history,
                 created_at=datetime.now()
             )
-            supabase_client.save_user_session(session)
+            await run_with_deadline(asyncio.to_thread(supabase_client.save_user_session, session))
         except Exception as e:
             logger.error(f"Error saving user session: {e}")
     
@@ -778,6 +971,11 @@ class BotHandlers:
 
     async def _check_channel_subscription(self, user_id: int) -> bool:
         """Check if user is subscribed to required channel"""
+        # Only confirmed subscriptions are cached so a new subscriber is let in right away
+        cache_key = redis_cache.get_cache_key("channel_sub", str(user_id))
+        if await redis_cache.get(cache_key):
+            return True
+        
         try:
             # Get the bot instance to check membership
             bot = None
@@ -806,6 +1004,7 @@ class BotHandlers:
                 # Allow if user is member, administrator, or creator
                 if member.status in ['member', 'administrator', 'creator']:
                     logger.info(f"User {user_id} is subscribed to channel")
+                    await redis_cache.set(cache_key, {"subscribed": True}, settings.channel_check_cache_ttl)
                     return True
                 else:
                     logger.info(f"User {user_id} is not subscribed to channel (status: {member.status})")
@@ -903,10 +1102,12 @@ class TelegramBotManager:
         self.active_bots: List[Bot] = []
         self.handlers: Dict[int, BotHandlers] = {}
         self.primary_bot_id = 0  # Primary bot is always at index 0
-        self.is_single_bot_mode = settings.use_single_bot
+        self.is_single_bot_mode = settings.bot_mode == "single_token"
+        self._pending: Dict[int, asyncio.Task] = {}  # Shards still starting up
+        self._init_task: Optional[asyncio.Task] = None
     
     async def initialize(self) -> None:
-        """Initialize bot instance(s)"""
+        """Initialize the primary bot; other shards start concurrently in the background"""
         active_tokens = settings.active_bot_tokens
         
         if not active_tokens:
@@ -922,16 +1123,41 @@ class TelegramBotManager:
         else:
             logger.info(f"Initializing in MULTI-BOT mode with {len(active_tokens)} bot instances...")
             
-            for i, token in enumerate(active_tokens):
-                await self._create_bot_instance(i, token)
+            # The app is ready once the primary shard is; updates for the others wait for their shard
+            await self._create_bot_instance(0, active_tokens[0])
+            semaphore = asyncio.Semaphore(max(1, settings.bot_init_concurrency))
+            for i, token in enumerate(active_tokens[1:], start=1):
+                self._pending[i] = asyncio.create_task(self._create_bot_instance_bounded(semaphore, i, token))
+            if self._pending:
+                self._init_task = asyncio.create_task(self._wait_for_shards(time.monotonic()))
         
-        logger.info(f"Successfully initialized {len(self.applications)} bot instance(s)")
+        logger.info(f"Successfully initialized {len(self.applications)} bot instance(s), {len(self._pending)} starting in background")
+    
+    async def _create_bot_instance_bounded(self, semaphore: asyncio.Semaphore, shard_id: int, token: str) -> None:
+        async with semaphore:
+            await self._create_bot_instance(shard_id, token)
+    
+    async def _wait_for_shards(self, started: float) -> None:
+        """Collect background shard startups and log the outcome"""
+        results = await asyncio.gather(*self._pending.values(), return_exceptions=True)
+        failed = [shard_id for shard_id, result in zip(self._pending, results) if isinstance(result, Exception)]
+        self._pending.clear()
+        
+        if failed:
+            logger.error(f"Bot shards {failed} failed to start; their updates are dropped")
+        logger.info(f"Bot shard startup finished in {time.monotonic() - started:.2f}s ({len(self.applications)} active)")
     
     async def _create_bot_instance(self, shard_id: int, token: str) -> None:
         """Create a single bot instance"""
         try:
             # Create application
-            application = Application.builder().token(token).build()
+            application = (
+                Application.builder()
+                .token(token)
+                .base_url(settings.telegram_api_base_url)
+                .request(DeadlineRequest(connection_pool_size=256))
+                .build()
+            )
             
             # Create handlers for this shard
             handlers = BotHandlers(shard_id, bot_manager=self, application=application)
@@ -940,6 +1166,8 @@ class TelegramBotManager:
             application.add_handler(CommandHandler("start", handlers.start_command))
             application.add_handler(CommandHandler("admin_status", handlers.admin_status_command))
             application.add_handler(CommandHandler("admin_broadcast", handlers.admin_broadcast_command))
+            application.add_handler(CommandHandler("admin_warm_cache", handlers.admin_warm_cache_command))
+            application.add_handler(CommandHandler("admin_profile", handlers.admin_profile_command))
             application.add_handler(CallbackQueryHandler(handlers.button_callback))
             application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handlers.text_message))
             
@@ -967,6 +1195,11 @@ class TelegramBotManager:
                 # In multi-bot mode, use the specified shard
                 target_shard = shard_id
             
+            pending = self._pending.get(target_shard)
+            if target_shard not in self.applications and pending is not None:
+                # Shard still starting up (or failed to): wait for it instead of dropping the update
+                await asyncio.shield(pending)
+            
             if target_shard not in self.applications:
                 logger.error(f"Target shard {target_shard} not available")
                 return
@@ -975,7 +1208,8 @@ class TelegramBotManager:
             update = Update.de_json(update_data, application.bot)
             
             if update:
-                await application.process_update(update)
+                with deadline_scope(settings.update_deadline_seconds):
+                    await application.process_update(update)
             
         except Exception as e:
             logger.error(f"Error processing update for shard {shard_id} (target: {target_shard if 'target_shard' in locals() else 'unknown'}): {e}")
@@ -985,8 +1219,9 @@ class TelegramBotManager:
         return {
             "mode": "single_bot" if self.is_single_bot_mode else "multi_bot",
             "active_shards": len(self.applications),
+            "starting_shards": len([task for task in self._pending.values() if not task.done()]),
             "total_bots": len(self.active_bots),
-            "shard_ids": list(self.applications.keys()),
+            "shard_ids": sorted(self.applications.keys()),
             "primary_bot_id": self.primary_bot_id if self.is_single_bot_mode else None,
             "backup_tokens_available": len(settings.backup_tokens) if self.is_single_bot_mode else None
         }
@@ -995,6 +1230,12 @@ class TelegramBotManager:
         """Shutdown all bot instances"""
         logger.info("Shutting down bot instances...")
         
+        for task in [self._init_task, *self._pending.values()]:
+            if task and not task.done():
+                task.cancel()
+        await asyncio.gather(*[task for task in [self._init_task, *self._pending.values()] if task], return_exceptions=True)
+        self._pending.clear()
+        
         for application in self.applications.values():
             try:
                 await application.shutdown()
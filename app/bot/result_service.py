@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import time
+from typing import Optional, Dict, Any, Tuple
+from app.bot.messages import ArabicMessages
+from app.database.supabase_client import supabase_client
+from app.database.snapshot import results_snapshot
+from app.external.najah_api import najah_api
+from app.external.cache import redis_cache, make_entry, read_entry
+from app.utils.deadline import run_with_deadline
+
+logger = logging.getLogger(__name__)
+
+
+class ResultService:
+    """Looks up exam results and caches the rendered result text"""
+    
+    RENDER_CACHE_PREFIX = "result_render"
+    
+    def __init__(self):
+        self.messages = ArabicMessages()
+    
+    def get_render_cache_key(self, examno: str) -> str:
+        """Generate render cache key for an exam number"""
+        return redis_cache.get_cache_key(self.RENDER_CACHE_PREFIX, examno)
+    
+    async def get_result_text(self, examno: str) -> Optional[str]:
+        """Get formatted result text, or None if the student does not exist"""
+        # Published snapshot answers without any network call
+        snapshot_data = results_snapshot.get_student_with_result(examno)
+        if snapshot_data and snapshot_data["exam_result"]:
+            return self.messages.format_exam_result(snapshot_data["student"], snapshot_data["exam_result"])
+        
+        cache_key = self.get_render_cache_key(examno)
+        cached, refresh_due = read_entry(await redis_cache.get(cache_key))
+        if cached:
+            logger.debug(f"Render cache hit: {examno}")
+            if refresh_due:
+                redis_cache.refresh_in_background(cache_key, lambda: self._load_result_text(examno))
+            return cached["text"]
+        
+        return await self._load_result_text(examno)
+    
+    async def _load_result_text(self, examno: str) -> Optional[str]:
+        """Render result text from the database (or API) and cache it"""
+        load_start = time.monotonic()
+        
+        # Get student and result from database first (sync client, off the event loop)
+        student_data = await run_with_deadline(asyncio.to_thread(supabase_client.get_student_with_result, examno))
+        if not student_data or not student_data["student"]:
+            return None
+        
+        result_text, cacheable = await self.render_result(student_data)
+        if cacheable:
+            entry, ttl = make_entry({"text": result_text}, compute_time=time.monotonic() - load_start)
+            await redis_cache.set(self.get_render_cache_key(examno), entry, ttl)
+        
+        return result_text
+    
+    async def render_result(self, student_data: Dict[str, Any]) -> Tuple[str, bool]:
+        """
+        Format a student's result, falling back to the external API.
+        
+        Returns (text, cacheable); text without any result is not cacheable so
+        results published later are picked up.
+        """
+        student = student_data["student"]
+        exam_result = student_data["exam_result"]
+        
+        if exam_result:
+            # Format result from database
+            return self.messages.format_exam_result(student, exam_result), True
+        
+        # If no result in database, try external API as fallback
+        result_response = await najah_api.get_exam_result(student.examno)
+        if result_response.success:
+            # Stale copies served while the API is down are not cached as rendered text
+            return self.messages.format_exam_result_from_api(result_response.data), not result_response.stale
+        
+        return self.messages.format_exam_result(student, None), False
+
+
+# Global result service instance
+result_service = ResultService()
@@ -1,10 +1,15 @@
 import logging
 import asyncio
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Any
 from telegram import Update, Bot
+from telegram.error import BadRequest, Forbidden, RetryAfter
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters
 from app.config import settings
 from app.bot.handlers import BotHandlers
+from app.bot.webhook_reply import WebhookReplyRequest, webhook_reply_scope
+from app.bot.deadline_request import DeadlineRequest
+from app.utils.deadline import deadline_scope
+from app.external.retry_policy import retry_policies, parse_retry_after
 
 logger = logging.getLogger(__name__)
 
@@ -22,10 +27,11 @@ class SingleInterfaceBotManager:
     
     def __init__(self):
         self.main_application: Optional[Application] = None  # Main bot that receives webhooks
-        self.response_bots: Dict[str, Bot] = {}  # Backend bots for sending responses
+        self.response_bots: Dict[str, Bot] = {}  # Backend bots for sending responses, created on first use
         self.handlers = None
         self.primary_token = settings.get_primary_token()
         self.all_tokens = settings.active_bot_tokens
+        self.retry_policy = retry_policies["telegram"]
     
     @property
     def active_bots(self) -> List[Bot]:
@@ -41,12 +47,9 @@ class SingleInterfaceBotManager:
         logger.info(f"⚡ Backend response tokens: {len(self.all_tokens)} tokens")
         logger.info(f"🎯 Total capacity: {len(self.all_tokens) * 30} messages/second")
         
-        # Initialize main bot that receives all webhooks
+        # Initialize main bot that receives all webhooks; backend bots are created when first needed
         await self._create_main_bot()
         
-        # Initialize all response bots for load balancing
-        await self._create_response_bots()
-        
         logger.info("✅ Single Interface Bot Manager initialized successfully!")
     
     async def _create_main_bot(self) -> None:
@@ -55,7 +58,13 @@ class SingleInterfaceBotManager:
             logger.info("🤖 Creating main bot interface...")
             
             # Create application for main bot
-            self.main_application = Application.builder().token(self.primary_token).build()
+            builder = Application.builder().token(self.primary_token).base_url(settings.telegram_api_base_url)
+            if settings.webhook_reply_enabled:
+                builder = builder.request(WebhookReplyRequest(connection_pool_size=256))
+                logger.info("📨 Webhook reply mode enabled")
+            else:
+                builder = builder.request(DeadlineRequest(connection_pool_size=256))
+            self.main_application = builder.build()
             
             # Create handlers
             self.handlers = BotHandlers(0, bot_manager=self, application=self.main_application)  # Pass self for response routing
@@ -64,6 +73,8 @@ class SingleInterfaceBotManager:
             self.main_application.add_handler(CommandHandler("start", self.handlers.start_command))
             self.main_application.add_handler(CommandHandler("admin_status", self.handlers.admin_status_command))
             self.main_application.add_handler(CommandHandler("admin_broadcast", self.handlers.admin_broadcast_command))
+            self.main_application.add_handler(CommandHandler("admin_warm_cache", self.handlers.admin_warm_cache_command))
+            self.main_application.add_handler(CommandHandler("admin_profile", self.handlers.admin_profile_command))
             self.main_application.add_handler(CallbackQueryHandler(self.handlers.button_callback))
             self.main_application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handlers.text_message))
             
@@ -76,73 +87,70 @@ class SingleInterfaceBotManager:
             logger.error(f"❌ Failed to create main bot: {e}")
             raise
     
-    async def _create_response_bots(self) -> None:
-        """Create backend bots for sending responses"""
-        try:
-            logger.info("⚡ Creating backend response bots...")
-            
-            for i, token in enumerate(self.all_tokens):
-                # Create bot instance (not full application, just bot)
-                bot = Bot(token=token)
-                self.response_bots[token] = bot
-                
-                logger.info(f"   Bot {i}: {token[:10]}... ✅")
-            
-            logger.info(f"✅ Created {len(self.response_bots)} backend response bots")
-            
-        except Exception as e:
-            logger.error(f"❌ Failed to create response bots: {e}")
-            raise
+    def _response_bot(self, token: str) -> Bot:
+        """Backend bot for a token, created on first use"""
+        bot = self.response_bots.get(token)
+        if bot is None:
+            # Each bot builds its own HTTP client (~50ms), so startup does not create all of them
+            bot = Bot(token=token, request=DeadlineRequest(), base_url=settings.telegram_api_base_url)
+            self.response_bots[token] = bot
+            logger.info(f"⚡ Backend bot created: {token[:10]}... ({len(self.response_bots)}/{len(self.all_tokens)})")
+        return bot
     
     async def get_response_bot(self, user_id: int) -> Bot:
         """Get the appropriate bot for responding to a user"""
-        response_token = settings.get_response_token(user_id)
-        return self.response_bots[response_token]
+        return self._response_bot(settings.get_response_token(user_id))
     
     async def send_message(self, chat_id: int, text: str, **kwargs) -> None:
         """Send message using load-balanced bot"""
-        try:
-            response_bot = await self.get_response_bot(chat_id)
-            await response_bot.send_message(chat_id=chat_id, text=text, **kwargs)
-            
-            # Log which backend token was used
-            token_index = chat_id % len(self.all_tokens)
-            logger.debug(f"📤 Message sent via backend bot {token_index} to user {chat_id}")
-            
-        except Exception as e:
-            logger.error(f"❌ Failed to send message to {chat_id}: {e}")
-            # Fallback to main bot
-            try:
-                await self.main_application.bot.send_message(chat_id=chat_id, text=text, **kwargs)
-                logger.info(f"✅ Fallback: Message sent via main bot to user {chat_id}")
-            except Exception as fallback_error:
-                logger.error(f"❌ Fallback also failed for user {chat_id}: {fallback_error}")
-                raise
+        await self._call_with_fallback("send_message", chat_id=chat_id, text=text, **kwargs)
+        
+        # Log which backend token was used
+        token_index = chat_id % len(self.all_tokens)
+        logger.debug(f"📤 Message sent to user {chat_id} (backend bot {token_index})")
     
     async def edit_message_text(self, chat_id: int, message_id: int, text: str, **kwargs) -> None:
         """Edit message using load-balanced bot"""
+        await self._call_with_fallback(
+            "edit_message_text",
+            chat_id=chat_id,
+            message_id=message_id,
+            text=text,
+            **kwargs
+        )
+    
+    async def _call_with_fallback(self, method: str, chat_id: int, **kwargs) -> Any:
+        """
+        Call a Bot API method via the user's backend bot, falling back to the main bot.
+        
+        Users who never started a backend bot get Forbidden/BadRequest, so that
+        fallback is routing. Fallbacks after transient errors are retries and
+        spend the shared Telegram retry budget.
+        """
+        self.retry_policy.record_request()
+        
         try:
             response_bot = await self.get_response_bot(chat_id)
-            await response_bot.edit_message_text(
-                chat_id=chat_id, 
-                message_id=message_id, 
-                text=text, 
-                **kwargs
-            )
-            
+            return await getattr(response_bot, method)(chat_id=chat_id, **kwargs)
         except Exception as e:
-            logger.error(f"❌ Failed to edit message for {chat_id}: {e}")
-            # Fallback to main bot
-            try:
-                await self.main_application.bot.edit_message_text(
-                    chat_id=chat_id, 
-                    message_id=message_id, 
-                    text=text, 
-                    **kwargs
-                )
-            except Exception as fallback_error:
-                logger.error(f"❌ Edit message fallback failed for user {chat_id}: {fallback_error}")
+            logger.error(f"❌ {method} via backend bot failed for {chat_id}: {e}")
+            if not isinstance(e, (BadRequest, Forbidden)) and not self.retry_policy.allow_retry():
                 raise
+        
+        # Fallback to main bot
+        try:
+            result = await getattr(self.main_application.bot, method)(chat_id=chat_id, **kwargs)
+            logger.info(f"✅ Fallback: {method} via main bot for user {chat_id}")
+            return result
+        except RetryAfter as e:
+            # Flood control on the main bot: wait as told if budget and deadline allow, then try once more
+            if await self.retry_policy.backoff(self.retry_policy.base_delay, parse_retry_after(e.retry_after)) is None:
+                logger.error(f"❌ Fallback {method} rate limited for user {chat_id}: {e}")
+                raise
+            return await getattr(self.main_application.bot, method)(chat_id=chat_id, **kwargs)
+        except Exception as fallback_error:
+            logger.error(f"❌ Fallback {method} also failed for user {chat_id}: {fallback_error}")
+            raise
     
     async def answer_callback_query(self, callback_query_id: str, text: str = None, **kwargs) -> None:
         """Answer callback query using main bot"""
@@ -156,8 +164,24 @@ class SingleInterfaceBotManager:
             logger.error(f"❌ Failed to answer callback query {callback_query_id}: {e}")
             raise
     
-    async def process_update(self, update_data: dict) -> None:
-        """Process incoming update through main bot"""
+    async def process_update(self, update_data: dict) -> Optional[Dict[str, Any]]:
+        """
+        Process incoming update through main bot.
+        
+        Returns the Bot API call to send back as the webhook response when
+        webhook reply mode is enabled, otherwise None.
+        """
+        with deadline_scope(settings.update_deadline_seconds):
+            if not settings.webhook_reply_enabled:
+                await self._process_update(update_data)
+                return None
+            
+            with webhook_reply_scope() as slot:
+                await self._process_update(update_data)
+            return slot.to_payload()
+    
+    async def _process_update(self, update_data: dict) -> None:
+        """Parse and dispatch an update through the main application"""
         try:
             if not self.main_application:
                 logger.error("❌ Main application not initialized")
@@ -189,11 +213,13 @@ class SingleInterfaceBotManager:
         return {
             "mode": "single_interface",
             "main_bot_token": self.primary_token[:10] + "...",
-            "backend_bots": len(self.response_bots),
+            "backend_bots": len(self.all_tokens),
+            "backend_bots_created": len(self.response_bots),
             "total_capacity_per_second": len(self.all_tokens) * 30,
             "load_balancing": "user_id % tokens",
             "webhook_endpoint": "single (/webhook)",
             "user_experience": "single_bot_interface",
+            "webhook_reply": settings.webhook_reply_enabled,
             "backend_distribution": f"{len(self.all_tokens)} tokens"
         }
     
@@ -205,30 +231,46 @@ class SingleInterfaceBotManager:
             "total_healthy": 0
         }
         
+        # Check the main bot and the backend bots created so far concurrently, a bounded
+        # number at a time; creating the others here would undo their lazy creation
+        semaphore = asyncio.Semaphore(max(1, settings.bot_init_concurrency))
+        
+        async def get_me(bot: Bot):
+            async with semaphore:
+                return await bot.get_me()
+        
+        tokens = list(dict.fromkeys(self.all_tokens))
+        created = [(i, self.response_bots[token]) for i, token in enumerate(tokens) if token in self.response_bots]
+        main_result, *backend_results = await asyncio.gather(
+            get_me(self.main_application.bot),
+            *(get_me(bot) for _, bot in created),
+            return_exceptions=True
+        )
+        
         # Check main bot
-        try:
-            me = await self.main_application.bot.get_me()
+        if isinstance(main_result, Exception):
+            health["main_bot"] = f"error: {str(main_result)}"
+        else:
             health["main_bot"] = "healthy"
             health["main_bot_info"] = {
-                "username": me.username,
-                "first_name": me.first_name,
-                "id": me.id
+                "username": main_result.username,
+                "first_name": main_result.first_name,
+                "id": main_result.id
             }
-        except Exception as e:
-            health["main_bot"] = f"error: {str(e)}"
         
         # Check backend bots
         healthy_count = 0
-        for i, (token, bot) in enumerate(self.response_bots.items()):
-            try:
-                await bot.get_me()
+        for i in range(len(tokens)):
+            health["backend_bots"][f"bot_{i}"] = "not created"
+        for (i, _), result in zip(created, backend_results):
+            if isinstance(result, Exception):
+                health["backend_bots"][f"bot_{i}"] = f"error: {str(result)}"
+            else:
                 health["backend_bots"][f"bot_{i}"] = "healthy"
                 healthy_count += 1
-            except Exception as e:
-                health["backend_bots"][f"bot_{i}"] = f"error: {str(e)}"
         
         health["total_healthy"] = healthy_count
-        health["health_percentage"] = (healthy_count / len(self.response_bots)) * 100
+        health["health_percentage"] = (healthy_count / len(created)) * 100 if created else 100.0
         
         return health
     
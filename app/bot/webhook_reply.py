@@ -0,0 +1,109 @@
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Dict, Any, Tuple
+from telegram.request import RequestData
+from app.bot.deadline_request import DeadlineRequest
+
+logger = logging.getLogger(__name__)
+
+# Bot API methods whose result handlers never need, so they can be answered
+# through the webhook response body instead of a separate HTTPS request
+WEBHOOK_REPLY_METHODS = frozenset({"sendMessage", "editMessageText", "answerCallbackQuery"})
+
+
+class WebhookReplySlot:
+    """
+    Holds the single Bot API call that may ride on the webhook response.
+    
+    Telegram executes a method returned in the webhook response body after
+    the response is received, and never reports its result or errors.
+    """
+    
+    def __init__(self):
+        self.pending: Optional[Tuple[str, str, RequestData]] = None  # (method, url, data)
+        self.used = False
+        self.bypass = False
+        self.closed = False
+    
+    def to_payload(self) -> Optional[Dict[str, Any]]:
+        """Build the webhook response body for the deferred call"""
+        if not self.pending:
+            return None
+        
+        method, _, request_data = self.pending
+        return {"method": method, **request_data.parameters}
+
+
+_current_slot: ContextVar[Optional[WebhookReplySlot]] = ContextVar("webhook_reply_slot", default=None)
+
+
+@contextmanager
+def webhook_reply_scope():
+    """Open a reply slot for the update being processed in this context"""
+    slot = WebhookReplySlot()
+    token = _current_slot.set(slot)
+    try:
+        yield slot
+    finally:
+        # Tasks spawned by handlers keep a copy of the context; they must not
+        # touch the slot once the webhook response has been built
+        slot.closed = True
+        _current_slot.reset(token)
+
+
+@contextmanager
+def direct_send():
+    """Send calls immediately inside this block (use when the returned Message is needed)"""
+    slot = _current_slot.get()
+    if slot is None:
+        yield
+        return
+    
+    previous = slot.bypass
+    slot.bypass = True
+    try:
+        yield
+    finally:
+        slot.bypass = previous
+
+
+class WebhookReplyRequest(DeadlineRequest):
+    """
+    Request backend that defers the first eligible outgoing call of an update
+    into the webhook response. Later calls go out normally; a deferred message
+    is flushed first so users still see messages in order.
+    """
+    
+    async def post(self, url: str, request_data: Optional[RequestData] = None, **kwargs):
+        slot = _current_slot.get()
+        if slot is None or slot.closed:
+            return await super().post(url, request_data, **kwargs)
+        
+        # Only an answered callback may safely arrive after later actions
+        if slot.pending and slot.pending[0] != "answerCallbackQuery":
+            await self._flush(slot)
+        
+        method = url.rsplit("/", 1)[-1]
+        if (
+            not slot.used
+            and not slot.bypass
+            and method in WEBHOOK_REPLY_METHODS
+            and request_data is not None
+            and not request_data.contains_files
+        ):
+            slot.used = True
+            slot.pending = (method, url, request_data)
+            logger.debug(f"📨 Deferred {method} to webhook response")
+            return True
+        
+        return await super().post(url, request_data, **kwargs)
+    
+    async def _flush(self, slot: WebhookReplySlot) -> None:
+        """Send the deferred call now instead of in the webhook response"""
+        method, url, request_data = slot.pending
+        slot.pending = None
+        try:
+            await super().post(url, request_data)
+        except Exception as e:
+            logger.error(f"❌ Failed to flush deferred {method}: {e}")
@@ -32,19 +32,103 @@ class Settings(BaseSettings):
     
     webhook_url: str = os.getenv("WEBHOOK_URL", "")
     
+    # Bot API endpoint (point at tests/fake_services.py for offline benchmarks)
+    telegram_api_base_url: str = os.getenv("TELEGRAM_API_BASE_URL", "https://api.telegram.org/bot")
+    # Bots started (multi_bot shards) or checked (health checks) at the same time
+    bot_init_concurrency: int = int(os.getenv("BOT_INIT_CONCURRENCY", "8"))
+    
+    # Return the first reply of each update in the webhook response body (single_interface mode)
+    webhook_reply_enabled: bool = os.getenv("WEBHOOK_REPLY_ENABLED", "false").lower() == "true"
+    
     # Supabase
     supabase_url: str = os.getenv("SUPABASE_URL", "")
     supabase_key: str = os.getenv("SUPABASE_KEY", "")
     
+    # Direct Postgres connection (bulk loading with COPY)
+    database_url: str = os.getenv("DATABASE_URL", "")
+    
     # Redis
     redis_url: str = os.getenv("REDIS_URL", "redis://localhost:6379")
+    redis_max_connections: int = int(os.getenv("REDIS_MAX_CONNECTIONS", "100"))
     
     # External API
     najah_api_base_url: str = os.getenv("NAJAH_API_BASE_URL", "https://serapi3.najah.iq")
     
+    # Circuit breaker for the external API (state shared through Redis)
+    najah_breaker_failure_ratio: float = float(os.getenv("NAJAH_BREAKER_FAILURE_RATIO", "0.5"))
+    najah_breaker_min_calls: int = int(os.getenv("NAJAH_BREAKER_MIN_CALLS", "10"))
+    najah_breaker_window_seconds: int = int(os.getenv("NAJAH_BREAKER_WINDOW_SECONDS", "30"))
+    najah_breaker_open_seconds: int = int(os.getenv("NAJAH_BREAKER_OPEN_SECONDS", "30"))
+    stale_result_ttl_seconds: int = int(os.getenv("STALE_RESULT_TTL_SECONDS", str(7 * 24 * 3600)))
+    
+    # Adaptive (AIMD) concurrency limit for external API calls
+    najah_concurrency_initial: int = int(os.getenv("NAJAH_CONCURRENCY_INITIAL", "20"))
+    najah_concurrency_min: int = int(os.getenv("NAJAH_CONCURRENCY_MIN", "2"))
+    najah_concurrency_max: int = int(os.getenv("NAJAH_CONCURRENCY_MAX", "200"))
+    najah_target_latency_seconds: float = float(os.getenv("NAJAH_TARGET_LATENCY_SECONDS", "2.0"))
+    najah_max_queue: int = int(os.getenv("NAJAH_MAX_QUEUE", "500"))
+    # Send a second request after the observed p95 latency and take the first answer
+    najah_hedge_enabled: bool = os.getenv("NAJAH_HEDGE_ENABLED", "false").lower() == "true"
+    
+    # Retries to any outbound dependency are capped at this fraction of its requests
+    retry_budget_ratio: float = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))
+    
+    # Time budget for answering one update, shared by all downstream calls
+    update_deadline_seconds: float = float(os.getenv("UPDATE_DEADLINE_SECONDS", "15"))
+    
     # Rate Limiting
     max_requests_per_minute: int = int(os.getenv("MAX_REQUESTS_PER_MINUTE", "6"))
     cache_ttl_seconds: int = int(os.getenv("CACHE_TTL_SECONDS", "3600"))
+    # After the TTL, entries are served stale for this long while one background refresh runs
+    cache_stale_ttl_seconds: int = int(os.getenv("CACHE_STALE_TTL_SECONDS", "21600"))
+    # Early refresh aggressiveness (XFetch beta) and +/- fraction of random TTL jitter
+    cache_xfetch_beta: float = float(os.getenv("CACHE_XFETCH_BETA", "1.0"))
+    cache_ttl_jitter: float = float(os.getenv("CACHE_TTL_JITTER", "0.1"))
+    
+    # Cache storage layout: string (one key per entry) or compact (hash buckets by exam-number prefix)
+    cache_layout: str = os.getenv("CACHE_LAYOUT", "string")
+    cache_compression: bool = os.getenv("CACHE_COMPRESSION", "true").lower() == "true"
+    cache_compact_prefixes: str = os.getenv("CACHE_COMPACT_PREFIXES", "exam_result,result_render")
+    
+    # In-process near cache in front of Redis (invalidated across workers over pub/sub)
+    near_cache_enabled: bool = os.getenv("NEAR_CACHE_ENABLED", "true").lower() == "true"
+    near_cache_prefixes: str = os.getenv("NEAR_CACHE_PREFIXES", "exam_result,result_render,channel_sub")
+    near_cache_max_entries: int = int(os.getenv("NEAR_CACHE_MAX_ENTRIES", "10000"))
+    near_cache_max_bytes: int = int(os.getenv("NEAR_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    near_cache_ttl_seconds: int = int(os.getenv("NEAR_CACHE_TTL_SECONDS", "30"))
+    channel_check_cache_ttl: int = int(os.getenv("CHANNEL_CHECK_CACHE_TTL", "300"))
+    
+    # Write-behind analytics buffer (bulk inserts into the analytics table)
+    analytics_enabled: bool = os.getenv("ANALYTICS_ENABLED", "true").lower() == "true"
+    analytics_batch_size: int = int(os.getenv("ANALYTICS_BATCH_SIZE", "500"))
+    analytics_flush_interval_seconds: float = float(os.getenv("ANALYTICS_FLUSH_INTERVAL_SECONDS", "5"))
+    analytics_max_buffered: int = int(os.getenv("ANALYTICS_MAX_BUFFERED", "50000"))
+    # Batches the database rejects are appended here and replayed once it recovers
+    analytics_spill_dir: str = os.getenv("ANALYTICS_SPILL_DIR", "analytics_spill")
+    analytics_max_spill_bytes: int = int(os.getenv("ANALYTICS_MAX_SPILL_BYTES", str(100 * 1024 * 1024)))
+    
+    # Per-minute/per-hour usage rollups in Redis, flushed from each worker at this interval
+    rollup_flush_interval_seconds: float = float(os.getenv("ROLLUP_FLUSH_INTERVAL_SECONDS", "10"))
+    # Unique users (all-time, day, hour) counted in Redis HyperLogLogs
+    user_activity_flush_interval_seconds: float = float(os.getenv("USER_ACTIVITY_FLUSH_INTERVAL_SECONDS", "5"))
+    
+    # Event-loop lag probe; a watchdog thread logs the stack of callbacks blocking longer than the threshold
+    loop_monitor_enabled: bool = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() == "true"
+    loop_monitor_interval_seconds: float = float(os.getenv("LOOP_MONITOR_INTERVAL_SECONDS", "0.1"))
+    loop_slow_callback_ms: float = float(os.getenv("LOOP_SLOW_CALLBACK_MS", "100"))
+    
+    # Opt-in capture of incoming webhook updates for replay (tests/replay_traffic.py).
+    # User IDs and names are anonymized; message text keeps its shape (commands, exam number lengths,
+    # name word lengths) with keyed fake exam numbers and names; contacts and locations are redacted.
+    traffic_capture_enabled: bool = os.getenv("TRAFFIC_CAPTURE_ENABLED", "false").lower() == "true"
+    traffic_capture_dir: str = os.getenv("TRAFFIC_CAPTURE_DIR", "traffic_capture")
+    # Shared by all workers so the same user maps to the same anonymous ID everywhere
+    traffic_capture_salt: str = os.getenv("TRAFFIC_CAPTURE_SALT", "")
+    traffic_capture_sample_rate: float = float(os.getenv("TRAFFIC_CAPTURE_SAMPLE_RATE", "1.0"))
+    traffic_capture_max_bytes: int = int(os.getenv("TRAFFIC_CAPTURE_MAX_BYTES", str(1024 * 1024 * 1024)))
+    
+    # Published results snapshot (memory-mapped, see app/jobs/export_snapshot.py)
+    results_snapshot_path: str = os.getenv("RESULTS_SNAPSHOT_PATH", "")
     
     # Mandatory Channel Subscription
     required_channel_id: str = os.getenv("REQUIRED_CHANNEL_ID", "-1001639586241")
@@ -56,6 +140,28 @@ class Settings(BaseSettings):
         int(os.getenv("ADMIN_USER_1", "1310526240")),
         int(os.getenv("ADMIN_USER_2", "5368597099")),
     ]
+    # Bearer token for the /admin/* HTTP endpoints; they are disabled while empty
+    admin_api_token: str = os.getenv("ADMIN_API_TOKEN", "")
+    # On-demand profiler (/admin/profile, /admin/memory and /admin_profile)
+    profiler_interval_ms: float = float(os.getenv("PROFILER_INTERVAL_MS", "5"))
+    profiler_max_seconds: float = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+    
+    # Server processes started by `python -m app.serve` (0 = one per CPU this process may run on);
+    # each runs its own lifespan. Set it to the CPUs of the instance, not of the host
+    web_concurrency: int = int(os.getenv("WEB_CONCURRENCY", "1"))
+    graceful_shutdown_seconds: float = float(os.getenv("GRACEFUL_SHUTDOWN_SECONDS", "30"))
+    # Redelivered webhook updates are dropped across workers for this long (0 disables;
+    # set 0 when benchmarking with generated or replayed updates)
+    update_dedup_ttl_seconds: int = int(os.getenv("UPDATE_DEDUP_TTL_SECONDS", "120"))
+    # Server runtime profile: "default" (uvicorn defaults) or "performance"
+    server_profile: str = os.getenv("SERVER_PROFILE", "default")
+    # Performance profile: listen backlog, keep-alive (above the proxy's idle timeout),
+    # connections+requests per worker before uvicorn answers 503 (0 = unlimited)
+    server_backlog: int = int(os.getenv("SERVER_BACKLOG", "2048"))
+    server_keepalive_seconds: int = int(os.getenv("SERVER_KEEPALIVE_SECONDS", "75"))
+    server_limit_concurrency: int = int(os.getenv("SERVER_LIMIT_CONCURRENCY", "1000"))
+    # Share of access log lines kept in the performance profile (5xx other than 503 are always logged, 0 disables)
+    access_log_sample_rate: float = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "0.01"))
     
     # Environment
     environment: str = os.getenv("ENVIRONMENT", "development")
@@ -0,0 +1,282 @@
+import asyncio
+import glob
+import logging
+import os
+from collections import deque
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, Deque, List
+from app.config import settings
+from app.database.models import AnalyticsEvent
+from app.database.supabase_client import supabase_client
+
+logger = logging.getLogger(__name__)
+
+
+def _process_alive(pid: int) -> bool:
+    """Check if a process with this pid is running"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class AnalyticsBuffer:
+    """
+    Write-behind buffer for the analytics table.
+    
+    Handlers call `emit`, which only appends to an in-memory queue. A
+    background task writes the queue in bulk inserts when `batch_size` events
+    are waiting or every `flush_interval` seconds. Batches the database
+    rejects are appended to a spill file and replayed after the next
+    successful write. When the queue or the spill file is full, new events
+    are dropped and counted instead of slowing the bot down.
+    """
+    
+    def __init__(
+        self,
+        batch_size: int = 500,
+        flush_interval: float = 5.0,
+        max_buffered: int = 50000,
+        spill_dir: str = "",
+        max_spill_bytes: int = 100 * 1024 * 1024,
+        enabled: bool = True
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self.spill_dir = spill_dir
+        self.max_spill_bytes = max_spill_bytes
+        self.enabled = enabled
+        
+        self._events: Deque[AnalyticsEvent] = deque()
+        self._flush_needed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        
+        self.emitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.failed_flushes = 0
+    
+    @property
+    def spill_path(self) -> str:
+        """Spill file of this worker; files of other (or earlier) workers are replayed too"""
+        return os.path.join(self.spill_dir, f"analytics-{os.getpid()}.jsonl")
+    
+    def emit(self, event: AnalyticsEvent) -> bool:
+        """Queue an event without waiting; returns False if it was dropped"""
+        if not self.enabled:
+            return False
+        
+        if len(self._events) >= self.max_buffered:
+            self.dropped += 1
+            return False
+        
+        if event.created_at is None:
+            event.created_at = datetime.now(timezone.utc)
+        self._events.append(event)
+        self.emitted += 1
+        
+        if len(self._events) >= self.batch_size:
+            self._flush_needed.set()
+        return True
+    
+    async def start(self):
+        """Start the background flush task"""
+        if not self.enabled or self._task:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"📊 Analytics buffer started (batch {self.batch_size}, every {self.flush_interval}s)")
+    
+    async def stop(self):
+        """Stop the flush task and write (or spill) everything still queued"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        
+        await self.flush()
+        if self._events:
+            await self._spill(list(self._events))
+            self._events.clear()
+    
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_needed.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_needed.clear()
+            
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing analytics events: {e}")
+    
+    async def flush(self) -> int:
+        """Write queued events in batches; returns the number written"""
+        async with self._flush_lock:
+            written = 0
+            while self._events:
+                batch = [self._events.popleft() for _ in range(min(self.batch_size, len(self._events)))]
+                if not await self._write(batch):
+                    # Database is down: move the queue to disk until it recovers
+                    self.failed_flushes += 1
+                    batch.extend(self._events)
+                    self._events.clear()
+                    await self._spill(batch)
+                    return written
+                written += len(batch)
+            
+            # Also the recovery probe when nothing was queued
+            await self._replay_spills()
+            return written
+    
+    async def _write(self, batch: List[AnalyticsEvent]) -> bool:
+        if await asyncio.to_thread(supabase_client.insert_analytics_events, batch):
+            self.written += len(batch)
+            return True
+        return False
+    
+    def _spill_files(self) -> List[str]:
+        """Spill files, including ones a crashed worker was replaying"""
+        if not self.spill_dir:
+            return []
+        pattern = os.path.join(self.spill_dir, "analytics-*.jsonl")
+        return sorted(glob.glob(pattern) + glob.glob(f"{pattern}.replaying-*"))
+    
+    async def _spill(self, batch: List[AnalyticsEvent]):
+        """Append a batch to this worker's spill file, or drop it when there is no room"""
+        if not self.spill_dir:
+            self.dropped += len(batch)
+            return
+        
+        try:
+            if await asyncio.to_thread(self._append_events, batch):
+                self.spilled += len(batch)
+                logger.warning(f"⚠️ Spilled {len(batch)} analytics events to {self.spill_path}")
+            else:
+                self.dropped += len(batch)
+                logger.warning(f"⚠️ Analytics spill file full, dropped {len(batch)} events")
+        except Exception as e:
+            self.dropped += len(batch)
+            logger.error(f"Error spilling analytics events: {e}")
+    
+    def _append_events(self, batch: List[AnalyticsEvent], rest: str = "") -> bool:
+        """Serialize events (plus already serialized lines) into this worker's spill file"""
+        return self._append_spill("".join(event.model_dump_json() + "\n" for event in batch) + rest)
+    
+    def _append_spill(self, lines: str) -> bool:
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path = self.spill_path
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size + len(lines) > self.max_spill_bytes:
+            return False
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(lines)
+        return True
+    
+    def _claim(self, path: str) -> Optional[str]:
+        """
+        Rename a spill file so only this worker replays it; None if another
+        worker has it. A file left `.replaying-<pid>` by a worker that is no
+        longer running (on this host) is claimed again.
+        """
+        base, _, owner = path.partition(".replaying-")
+        claimed = f"{base}.replaying-{os.getpid()}"
+        if path == claimed:
+            # Left by an earlier process with our pid; flushes never overlap in this one
+            return claimed
+        if owner.isdigit() and _process_alive(int(owner)):
+            return None
+        
+        try:
+            os.rename(path, claimed)
+        except OSError:
+            return None
+        return claimed
+    
+    async def _replay_spills(self):
+        """Write spilled events back once the database accepts inserts again (file work runs in threads)"""
+        for path in await asyncio.to_thread(self._spill_files):
+            claimed = await asyncio.to_thread(self._claim, path)
+            if not claimed:
+                continue
+            
+            replayed = 0
+            failures = self.failed_flushes
+            f = await asyncio.to_thread(open, claimed, encoding="utf-8")
+            try:
+                while True:
+                    batch = await asyncio.to_thread(self._read_batch, f)
+                    if not batch:
+                        break
+                    if await self._write(batch):
+                        replayed += len(batch)
+                        self.replayed += len(batch)
+                        continue
+                    
+                    self.failed_flushes += 1
+                    if replayed:
+                        # Keep the unwritten tail for the next attempt
+                        if not await asyncio.to_thread(lambda: self._append_events(batch, f.read())):
+                            logger.warning(f"⚠️ Analytics spill file full, dropped the rest of {path}")
+                    break
+            finally:
+                await asyncio.to_thread(f.close)
+            
+            if self.failed_flushes > failures and not replayed:
+                await asyncio.to_thread(os.rename, claimed, path)
+                return
+            
+            await asyncio.to_thread(os.remove, claimed)
+            logger.info(f"✅ Replayed {replayed} spilled analytics events from {path}")
+            if self.failed_flushes > failures:
+                return
+    
+    def _read_batch(self, f) -> List[AnalyticsEvent]:
+        """Next batch of events from a spill file; empty at the end"""
+        batch = []
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                batch.append(AnalyticsEvent.model_validate_json(line))
+            except ValueError:
+                self.dropped += 1
+                continue
+            if len(batch) >= self.batch_size:
+                break
+        return batch
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get buffer depth and event counters for this worker"""
+        return {
+            "enabled": self.enabled,
+            "buffered": len(self._events),
+            "emitted": self.emitted,
+            "written": self.written,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "failed_flushes": self.failed_flushes
+        }
+
+
+# Global analytics buffer instance
+analytics_buffer = AnalyticsBuffer(
+    batch_size=settings.analytics_batch_size,
+    flush_interval=settings.analytics_flush_interval_seconds,
+    max_buffered=settings.analytics_max_buffered,
+    spill_dir=settings.analytics_spill_dir,
+    max_spill_bytes=settings.analytics_max_spill_bytes,
+    enabled=settings.analytics_enabled
+)
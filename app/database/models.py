@@ -2,6 +2,9 @@ from typing import Optional, Dict, Any, List
 from pydantic import BaseModel
 from datetime import datetime
 
+# (name, score) attribute pairs of the nine subject columns
+SUBJECT_FIELDS = tuple((f"sub{i}_name", f"sub{i}_score") for i in range(1, 10))
+
 
 class Student(BaseModel):
     id: Optional[int] = None
@@ -56,14 +59,11 @@ class ExamResult(BaseModel):
     sub9_name: Optional[str] = None
     sub9_score: Optional[str] = None
     sub9_cscore: Optional[str] = None
-
+    
     def get_subjects_dict(self) -> Dict[str, str]:
         """Get subjects as a dictionary for easy formatting"""
         subjects = {}
-        for i in range(1, 10):
-            name_attr = f"sub{i}_name"
-            score_attr = f"sub{i}_score"
-            
+        for name_attr, score_attr in SUBJECT_FIELDS:
             name = getattr(self, name_attr)
             score = getattr(self, score_attr)
             
@@ -102,4 +102,16 @@ class SearchResult(BaseModel):
 class ExamResultResponse(BaseModel):
     success: bool
     data: Optional[Dict[str, Any]] = None
-    error: Optional[str] = None
\ No newline at end of file
+    error: Optional[str] = None
+    stale: bool = False
+
+
+class AnalyticsEvent(BaseModel):
+    user_id: int
+    action: str
+    search_type: Optional[str] = None
+    search_term: Optional[str] = None
+    success: bool = True
+    response_time_ms: Optional[int] = None
+    shard_id: Optional[int] = None
+    created_at: Optional[datetime] = None
\ No newline at end of file
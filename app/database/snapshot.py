@@ -0,0 +1,233 @@
+import json
+import logging
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import time
+from typing import Optional, Dict, Any, Iterable, Tuple
+from array import array
+from app.config import settings
+from app.database.models import Student, ExamResult
+
+logger = logging.getLogger(__name__)
+
+# File layout (little endian):
+#   header:  magic(4) version(u16) reserved(u16) count(u64) keys_off(u64) offsets_off(u64) data_off(u64)
+#   keys:    count x u64, exam numbers sorted ascending
+#   offsets: (count + 1) x u64, record boundaries relative to data_off
+#   data:    compact JSON records {"student": {...}, "exam_result": {...} | null}
+SNAPSHOT_MAGIC = b"EXRS"
+SNAPSHOT_VERSION = 1
+HEADER = struct.Struct("<4sHHQQQQ")
+# Keys are exam numbers of exactly this many digits ("0042" and "42" would share a key)
+EXAM_NUMBER_DIGITS = 15
+
+
+def write_snapshot(path: str, records: Iterable[Tuple[str, Dict[str, Any], Optional[Dict[str, Any]]]]) -> int:
+    """
+    Write a snapshot from (examno, student, exam_result) records sorted by examno.
+    
+    The file is built next to the target and renamed over it, so readers
+    always see either the old or the new snapshot.
+    """
+    keys = array("Q")
+    offsets = array("Q", [0])
+    directory = os.path.dirname(os.path.abspath(path))
+    
+    with tempfile.TemporaryFile(dir=directory) as data_file:
+        for examno, student, exam_result in records:
+            key = int(examno)
+            if keys and key <= keys[-1]:
+                logger.warning(f"Skipping out-of-order or duplicate exam number: {examno}")
+                continue
+            
+            record = json.dumps(
+                {"student": student, "exam_result": exam_result},
+                ensure_ascii=False,
+                separators=(",", ":")
+            ).encode("utf-8")
+            data_file.write(record)
+            keys.append(key)
+            offsets.append(offsets[-1] + len(record))
+        
+        if sys.byteorder != "little":
+            keys.byteswap()
+            offsets.byteswap()
+        
+        count = len(keys)
+        keys_off = HEADER.size
+        offsets_off = keys_off + 8 * count
+        data_off = offsets_off + 8 * (count + 1)
+        
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".snapshot-")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                out.write(HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0, count, keys_off, offsets_off, data_off))
+                keys.tofile(out)
+                offsets.tofile(out)
+                data_file.seek(0)
+                shutil.copyfileobj(data_file, out)
+                out.flush()
+                os.fsync(out.fileno())
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    
+    return count
+
+
+class _LittleEndianView:
+    """Sequence of u64 values for big-endian hosts, where memoryview.cast would misread"""
+    
+    def __init__(self, buffer, count: int):
+        self.buffer = buffer
+        self.count = count
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def __getitem__(self, index: int) -> int:
+        return struct.unpack_from("<Q", self.buffer, index * 8)[0]
+
+
+class ResultsSnapshot:
+    """Read-only, memory-mapped results snapshot answering lookups by binary search"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, _, count, keys_off, offsets_off, data_off = HEADER.unpack_from(self._mmap, 0)
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                raise ValueError(f"Not a results snapshot (version {SNAPSHOT_VERSION}): {path}")
+        except Exception:
+            self._file.close()
+            raise
+        
+        self.count = count
+        self._data_off = data_off
+        self._view = memoryview(self._mmap)
+        if sys.byteorder == "little":
+            self._keys = self._view[keys_off:offsets_off].cast("Q")
+            self._offsets = self._view[offsets_off:data_off].cast("Q")
+        else:
+            self._keys = _LittleEndianView(self._view[keys_off:offsets_off], count)
+            self._offsets = _LittleEndianView(self._view[offsets_off:data_off], count + 1)
+    
+    def _find(self, key: int) -> int:
+        """Index of key in the sorted key array, or -1"""
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) // 2
+            if self._keys[mid] < key:
+                low = mid + 1
+            else:
+                high = mid
+        return low if low < self.count and self._keys[low] == key else -1
+    
+    def get_record(self, examno: str) -> Optional[Dict[str, Any]]:
+        """Get the raw record for an exam number"""
+        if not examno or len(examno) != EXAM_NUMBER_DIGITS or not examno.isascii() or not examno.isdigit():
+            return None
+        
+        index = self._find(int(examno))
+        if index < 0:
+            return None
+        
+        start = self._data_off + self._offsets[index]
+        end = self._data_off + self._offsets[index + 1]
+        return json.loads(self._mmap[start:end])
+    
+    def get_student_with_result(self, examno: str) -> Optional[Dict[str, Any]]:
+        """Get student information along with exam results (same shape as SupabaseClient)"""
+        record = self.get_record(examno)
+        if not record:
+            return None
+        
+        return {
+            "student": Student(**record["student"]),
+            "exam_result": ExamResult(**record["exam_result"]) if record["exam_result"] else None
+        }
+    
+    def close(self) -> None:
+        """Release the mapping"""
+        for view in (self._keys, self._offsets):
+            if isinstance(view, memoryview):
+                view.release()
+        self._view.release()
+        self._mmap.close()
+        self._file.close()
+
+
+class ResultsSnapshotStore:
+    """
+    Serves lookups from the current snapshot file and swaps to a newly
+    published one (replaced by rename) without a restart.
+    """
+    
+    RELOAD_CHECK_SECONDS = 5.0
+    
+    def __init__(self, path: Optional[str] = None):
+        self.path = path if path is not None else settings.results_snapshot_path
+        self._snapshot: Optional[ResultsSnapshot] = None
+        self._file_id: Optional[tuple] = None
+        self._checked_at = 0.0
+    
+    def _refresh(self) -> None:
+        """Open the snapshot file if it changed since the last check"""
+        now = time.monotonic()
+        if now - self._checked_at < self.RELOAD_CHECK_SECONDS:
+            return
+        self._checked_at = now
+        
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        
+        file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if file_id == self._file_id:
+            return
+        
+        try:
+            snapshot = ResultsSnapshot(self.path)
+        except Exception as e:
+            logger.error(f"Failed to open results snapshot {self.path}: {e}")
+            return
+        
+        previous, self._snapshot, self._file_id = self._snapshot, snapshot, file_id
+        if previous:
+            previous.close()
+        logger.info(f"Loaded results snapshot {self.path} ({snapshot.count} records)")
+    
+    def get_student_with_result(self, examno: str) -> Optional[Dict[str, Any]]:
+        """Look up a student in the snapshot; None if disabled or not found"""
+        if not self.path:
+            return None
+        
+        try:
+            self._refresh()
+            if not self._snapshot:
+                return None
+            return self._snapshot.get_student_with_result(examno)
+        except Exception as e:
+            logger.error(f"Error reading results snapshot for {examno}: {e}")
+            return None
+    
+    def close(self) -> None:
+        """Close the current snapshot"""
+        if self._snapshot:
+            self._snapshot.close()
+            self._snapshot = None
+            self._file_id = None
+
+
+# Global instance
+results_snapshot = ResultsSnapshotStore()
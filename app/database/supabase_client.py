@@ -1,8 +1,9 @@
 import asyncio
 from typing import List, Optional, Dict, Any
 from supabase import create_client, Client
+from postgrest import ReturnMethod
 from app.config import settings
-from app.database.models import Student, SearchResult, UserSession, RateLimit
+from app.database.models import Student, SearchResult, UserSession, RateLimit, AnalyticsEvent
 import logging
 
 logger = logging.getLogger(__name__)
@@ -104,6 +105,17 @@ class SupabaseClient:
             logger.error(f"Error saving user session: {e}")
             return False
 
+    def insert_analytics_events(self, events: List[AnalyticsEvent]) -> bool:
+        """Bulk insert analytics events in one request"""
+        try:
+            rows = [event.model_dump(mode="json", exclude_none=True) for event in events]
+            self.client.table("analytics").insert(rows, returning=ReturnMethod.minimal).execute()
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error inserting {len(events)} analytics events: {e}")
+            return False
+    
     def get_user_session(self, user_id: int) -> Optional[UserSession]:
         """Get user session by user ID"""
         try:
@@ -161,6 +173,70 @@ class SupabaseClient:
             logger.error(f"Error getting exam result: {e}")
             return None
 
+    def get_exam_numbers_page(
+        self,
+        table: str = "students",
+        after: Optional[str] = None,
+        limit: int = 1000,
+        strict: bool = False
+    ) -> List[str]:
+        """Get a page of exam numbers ordered by examno (keyset pagination); strict raises errors instead of returning []"""
+        try:
+            query = self.client.table(table).select("examno").order("examno").limit(limit)
+            
+            if after:
+                query = query.gt("examno", after)
+            
+            result = query.execute()
+            return [row["examno"] for row in result.data] if result.data else []
+            
+        except Exception as e:
+            logger.error(f"Error getting exam numbers from {table}: {e}")
+            if strict:
+                raise
+            return []
+
+    def get_user_ids_page(self, after: Optional[int] = None, limit: int = 1000, strict: bool = False) -> List[int]:
+        """Get a page of user ids from user_sessions ordered by user_id (keyset pagination); strict raises errors instead of returning []"""
+        try:
+            query = self.client.table("user_sessions").select("user_id").order("user_id").limit(limit)
+            
+            if after is not None:
+                query = query.gt("user_id", after)
+            
+            result = query.execute()
+            return [row["user_id"] for row in result.data] if result.data else []
+            
+        except Exception as e:
+            logger.error(f"Error getting user ids: {e}")
+            if strict:
+                raise
+            return []
+
+    def get_students_with_results(self, examnos: List[str], strict: bool = False) -> Dict[str, Dict[str, Any]]:
+        """Get students with their exam results for many exam numbers (two queries); strict raises errors instead of returning {}"""
+        try:
+            from app.database.models import ExamResult
+            
+            students_result = self.client.table("students").select("*").in_("examno", examnos).execute()
+            results_result = self.client.table("exam_results").select("*").in_("examno", examnos).execute()
+            
+            exam_results = {row["examno"]: ExamResult(**row) for row in results_result.data or []}
+            
+            return {
+                row["examno"]: {
+                    "student": Student(**row),
+                    "exam_result": exam_results.get(row["examno"])
+                }
+                for row in students_result.data or []
+            }
+            
+        except Exception as e:
+            logger.error(f"Error getting students with results for {len(examnos)} exam numbers: {e}")
+            if strict:
+                raise
+            return {}
+
     def get_student_with_result(self, examno: str) -> Optional[Dict[str, Any]]:
         """Get student information along with exam results"""
         try:
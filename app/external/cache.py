@@ -1,42 +1,273 @@
+import asyncio
 import json
 import logging
-from typing import Optional, Dict, Any
+import math
+import random
+import sys
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, List, Tuple, Union, Callable, Awaitable, Set
 import redis.asyncio as redis
 from app.config import settings
+from app.external.compact_cache import CompactHashLayout
+from app.utils.deadline import no_deadline
 
 logger = logging.getLogger(__name__)
 
 
+def make_entry(value: Dict[str, Any], ttl: int = None, compute_time: float = 0.0) -> Tuple[Dict[str, Any], int]:
+    """
+    Wrap a value with its soft expiry for stale-while-revalidate reads.
+    
+    Returns (entry, Redis TTL): the entry is fresh for `ttl` seconds (with
+    random jitter so entries written together do not expire together) and
+    kept stale for another `cache_stale_ttl_seconds` before Redis drops it.
+    `compute_time` is how long the value took to produce, used for early refresh.
+    """
+    ttl = ttl or settings.cache_ttl_seconds
+    jitter = settings.cache_ttl_jitter
+    ttl = max(1, int(ttl * random.uniform(1 - jitter, 1 + jitter)))
+    entry = {"_v": value, "_soft": time.time() + ttl, "_delta": round(compute_time, 4)}
+    return entry, ttl + settings.cache_stale_ttl_seconds
+
+
+def read_entry(cached: Optional[Dict[str, Any]]) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """
+    Unwrap a cached entry; returns (value, refresh due). Plain values are treated as fresh.
+    
+    Refresh is due at the soft expiry, or earlier with a probability that grows
+    as it approaches and with the value's compute time (XFetch), so hot keys
+    are refreshed by one reader ahead of time instead of by a miss storm.
+    """
+    if not cached or "_soft" not in cached:
+        return cached, False
+    
+    delta = cached.get("_delta", 0.0)
+    early = -delta * settings.cache_xfetch_beta * math.log(1.0 - random.random()) if delta else 0.0
+    return cached["_v"], time.time() + early >= cached["_soft"]
+
+
+class NearCache:
+    """Bounded in-process TTL/LRU cache of serialized values"""
+    
+    def __init__(self, max_entries: int, max_bytes: int, ttl: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (serialized value, monotonic expiry, accounted size)
+        self._entries: "OrderedDict[str, Tuple[str, float, int]]" = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+    
+    def get(self, key: str) -> Optional[str]:
+        """Get a fresh entry and mark it recently used"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        if entry[1] <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+    
+    def set(self, key: str, raw: str, ttl: int = None) -> None:
+        """Store an entry, evicting least recently used entries over the limits"""
+        ttl = min(ttl or self.ttl, self.ttl)
+        size = sys.getsizeof(key) + sys.getsizeof(raw)
+        self._remove(key)
+        if size > self.max_bytes:
+            return
+        
+        self._entries[key] = (raw, time.monotonic() + ttl, size)
+        self.size_bytes += size
+        
+        while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self.size_bytes -= evicted_size
+            self.evictions += 1
+    
+    def invalidate(self, key: str) -> None:
+        """Drop an entry changed elsewhere"""
+        if self._remove(key):
+            self.invalidations += 1
+    
+    def clear(self) -> None:
+        """Drop all entries"""
+        self._entries.clear()
+        self.size_bytes = 0
+    
+    def _remove(self, key: str) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self.size_bytes -= entry[2]
+        return True
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get near cache counters"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations
+        }
+
+
 class RedisCache:
+    INVALIDATION_CHANNEL = "cache_invalidate"
+    
     def __init__(self):
         self.redis: Optional[redis.Redis] = None
+        # Binary client for the compact layout (values are not UTF-8)
+        self.redis_raw: Optional[redis.Redis] = None
+        self.compact: Optional[CompactHashLayout] = None
+        self.compact_prefixes = {prefix.strip() for prefix in settings.cache_compact_prefixes.split(",") if prefix.strip()}
+        if settings.cache_layout == "compact":
+            self.compact = CompactHashLayout(compress=settings.cache_compression)
+        
+        # In-process tier for hot keys; other workers' writes arrive over pub/sub
+        self.near: Optional[NearCache] = None
+        self.near_prefixes = {prefix.strip() for prefix in settings.near_cache_prefixes.split(",") if prefix.strip()}
+        if settings.near_cache_enabled:
+            self.near = NearCache(settings.near_cache_max_entries, settings.near_cache_max_bytes, settings.near_cache_ttl_seconds)
+        self.node_id = uuid.uuid4().hex[:12]
+        self._invalidation_task: Optional[asyncio.Task] = None
+        self._refreshing: Set[str] = set()
+        self._refresh_tasks: Set[asyncio.Task] = set()
+        self.background_refreshes = 0
+        self.redis_hits = 0
+        self.redis_misses = 0
+        self.redis_errors = 0
     
     async def connect(self):
         """Connect to Redis"""
         try:
-            self.redis = redis.from_url(settings.redis_url, decode_responses=True)
+            self.redis = redis.from_url(
+                settings.redis_url, decode_responses=True, max_connections=settings.redis_max_connections
+            )
             await self.redis.ping()
+            if self.compact:
+                self.redis_raw = redis.from_url(
+                    settings.redis_url, decode_responses=False, max_connections=settings.redis_max_connections
+                )
+                logger.info(f"Compact cache layout enabled for: {', '.join(sorted(self.compact_prefixes))}")
+            if self.near:
+                self._invalidation_task = asyncio.create_task(self._listen_invalidations())
             logger.info("Connected to Redis successfully")
         except Exception as e:
             logger.error(f"Failed to connect to Redis: {e}")
             self.redis = None
+            self.redis_raw = None
     
     async def disconnect(self):
         """Disconnect from Redis"""
+        if self._invalidation_task:
+            self._invalidation_task.cancel()
+            try:
+                await self._invalidation_task
+            except asyncio.CancelledError:
+                pass
+            self._invalidation_task = None
         if self.redis:
             await self.redis.close()
+        if self.redis_raw:
+            await self.redis_raw.close()
+    
+    def _is_compact(self, key: str) -> bool:
+        """Check if key is stored in the compact hash layout"""
+        return bool(
+            self.compact
+            and self.redis_raw
+            and key.partition(":")[0] in self.compact_prefixes
+            and self.compact.bucket_for(key)
+        )
+    
+    def _is_near(self, key: str) -> bool:
+        """Check if key is kept in the in-process tier"""
+        return bool(self.near and key.partition(":")[0] in self.near_prefixes)
+    
+    async def _listen_invalidations(self):
+        """Drop near cache entries written or deleted by other workers"""
+        while self.redis:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.INVALIDATION_CHANNEL)
+                # Writes made while we were not subscribed were missed
+                self.near.clear()
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    node_id, _, key = message["data"].partition(" ")
+                    if node_id != self.node_id:
+                        self.near.invalidate(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Cache invalidation listener error: {e}")
+                self.near.clear()
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.close()
+    
+    async def _publish_invalidations(self, keys: List[str]):
+        """Tell other workers to drop their near cache copies"""
+        keys = [key for key in keys if self._is_near(key)]
+        if not keys:
+            return
+        
+        try:
+            async with self.pipeline() as pipe:
+                for key in keys:
+                    pipe.publish(self.INVALIDATION_CHANNEL, f"{self.node_id} {key}")
+        except Exception as e:
+            logger.error(f"Error publishing cache invalidation for {len(keys)} keys: {e}")
     
     async def get(self, key: str) -> Optional[Dict[str, Any]]:
         """Get cached data"""
+        near = self._is_near(key)
+        if near:
+            raw = self.near.get(key)
+            if raw is not None:
+                return json.loads(raw)
+        
         if not self.redis:
             return None
         
         try:
-            cached_data = await self.redis.get(key)
-            if cached_data:
-                return json.loads(cached_data)
-            return None
+            if self._is_compact(key):
+                value = await self.compact.get(self.redis_raw, key)
+                cached_data = json.dumps(value, ensure_ascii=False) if value is not None and near else None
+            else:
+                cached_data = await self.redis.get(key)
+                value = json.loads(cached_data) if cached_data else None
+            
+            if value is None:
+                self.redis_misses += 1
+                return None
+            
+            self.redis_hits += 1
+            if near:
+                self.near.set(key, cached_data)
+            return value
         except Exception as e:
+            self.redis_errors += 1
             logger.error(f"Error getting cache for key {key}: {e}")
             return None
     
@@ -47,9 +278,18 @@ class RedisCache:
         
         try:
             ttl = ttl or settings.cache_ttl_seconds
-            await self.redis.setex(key, ttl, json.dumps(value, ensure_ascii=False))
+            raw = json.dumps(value, ensure_ascii=False)
+            if self._is_compact(key):
+                await self.compact.set(self.redis_raw, key, value, ttl)
+            else:
+                await self.redis.setex(key, ttl, raw)
+            
+            if self._is_near(key):
+                self.near.set(key, raw, ttl)
+                await self._publish_invalidations([key])
             return True
         except Exception as e:
+            self.redis_errors += 1
             logger.error(f"Error setting cache for key {key}: {e}")
             return False
     
@@ -59,7 +299,14 @@ class RedisCache:
             return False
         
         try:
-            await self.redis.delete(key)
+            if self._is_compact(key):
+                await self.compact.delete(self.redis_raw, key)
+            else:
+                await self.redis.delete(key)
+            
+            if self._is_near(key):
+                self.near.invalidate(key)
+                await self._publish_invalidations([key])
             return True
         except Exception as e:
             logger.error(f"Error deleting cache for key {key}: {e}")
@@ -71,11 +318,136 @@ class RedisCache:
             return False
         
         try:
+            if self._is_compact(key):
+                return await self.compact.get(self.redis_raw, key) is not None
             return bool(await self.redis.exists(key))
         except Exception as e:
             logger.error(f"Error checking cache existence for key {key}: {e}")
             return False
     
+    @asynccontextmanager
+    async def pipeline(self, transaction: bool = False, raw: bool = False):
+        """Queue commands and send them in one round trip when the block exits"""
+        client = self.redis_raw if raw else self.redis
+        if not client:
+            raise ConnectionError("Redis is not connected")
+        
+        async with client.pipeline(transaction=transaction) as pipe:
+            yield pipe
+            await pipe.execute()
+    
+    async def get_many(self, keys: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Get many cached entries in one pipelined round trip (None for misses)"""
+        found: Dict[str, Optional[Dict[str, Any]]] = {}
+        for key in keys:
+            if self._is_near(key):
+                raw = self.near.get(key)
+                if raw is not None:
+                    found[key] = json.loads(raw)
+        
+        pending = [key for key in dict.fromkeys(keys) if key not in found]
+        if not self.redis or not pending:
+            return [found.get(key) for key in keys]
+        
+        try:
+            compact_keys = [key for key in pending if self._is_compact(key)]
+            compact_set = set(compact_keys)
+            string_keys = [key for key in pending if key not in compact_set]
+            
+            # A single MGET, plus one pipeline for compact buckets
+            if string_keys:
+                for key, raw in zip(string_keys, await self.redis.mget(string_keys)):
+                    found[key] = json.loads(raw) if raw else None
+                    if raw and self._is_near(key):
+                        self.near.set(key, raw)
+            
+            if compact_keys:
+                async with self.redis_raw.pipeline(transaction=False) as pipe:
+                    for key in compact_keys:
+                        pipe.hget(*self.compact.bucket_for(key))
+                    results = await pipe.execute()
+                expired = []
+                for key, raw in zip(compact_keys, results):
+                    value = self.compact.decode(raw)
+                    found[key] = value
+                    if raw and value is None:
+                        expired.append(key)
+                    if value is not None and self._is_near(key):
+                        self.near.set(key, json.dumps(value, ensure_ascii=False))
+                await self.compact.reap(self.redis_raw, expired)
+            
+            hits = sum(1 for key in pending if found.get(key) is not None)
+            self.redis_hits += hits
+            self.redis_misses += len(pending) - hits
+            return [found.get(key) for key in keys]
+        except Exception as e:
+            self.redis_errors += 1
+            logger.error(f"Error getting {len(keys)} cache entries: {e}")
+            return [found.get(key) for key in keys]
+    
+    async def set_many(self, items: Dict[str, Dict[str, Any]], ttl: Union[int, Dict[str, int]] = None) -> bool:
+        """Set many cached entries in one pipelined round trip (ttl may be given per key)"""
+        if not self.redis or not items:
+            return False
+        
+        try:
+            ttls = ttl if isinstance(ttl, dict) else {}
+            default_ttl = (ttl if not isinstance(ttl, dict) else None) or settings.cache_ttl_seconds
+            compact_items = {key: value for key, value in items.items() if self._is_compact(key)}
+            
+            async with self.pipeline() as pipe:
+                for key, value in items.items():
+                    if key not in compact_items:
+                        pipe.setex(key, ttls.get(key) or default_ttl, json.dumps(value, ensure_ascii=False))
+            
+            if compact_items:
+                async with self.pipeline(raw=True) as pipe:
+                    for key, value in compact_items.items():
+                        self.compact.queue_set(pipe, key, value, ttls.get(key) or default_ttl)
+            
+            # Bulk writes (cache warming) only invalidate; hot keys refill on read
+            if self.near:
+                for key in items:
+                    self.near.invalidate(key)
+                await self._publish_invalidations(list(items))
+            return True
+        except Exception as e:
+            logger.error(f"Error setting {len(items)} cache entries: {e}")
+            return False
+    
+    async def exists_many(self, keys: List[str]) -> List[bool]:
+        """Check which keys exist in one pipelined round trip"""
+        if not self.redis or not keys:
+            return [False] * len(keys)
+        
+        try:
+            compact_keys = [key for key in keys if self._is_compact(key)]
+            compact_set = set(compact_keys)
+            string_keys = [key for key in keys if key not in compact_set]
+            found = {}
+            
+            if string_keys:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for key in string_keys:
+                        pipe.exists(key)
+                    results = await pipe.execute()
+                found.update({key: bool(result) for key, result in zip(string_keys, results)})
+            
+            if compact_keys:
+                async with self.redis_raw.pipeline(transaction=False) as pipe:
+                    for key in compact_keys:
+                        pipe.hget(*self.compact.bucket_for(key))
+                    results = await pipe.execute()
+                values = [self.compact.decode(raw) for raw in results]
+                found.update({key: value is not None for key, value in zip(compact_keys, values)})
+                expired = [key for key, raw, value in zip(compact_keys, results, values) if raw and value is None]
+                await self.compact.reap(self.redis_raw, expired)
+            
+            return [found[key] for key in keys]
+        except Exception as e:
+            logger.error(f"Error checking existence of {len(keys)} cache keys: {e}")
+            return [False] * len(keys)
+    
     async def get_rate_limit_count(self, user_id: int) -> int:
         """Get current rate limit count for user"""
         if not self.redis:
@@ -125,9 +497,90 @@ class RedisCache:
             logger.error(f"Error resetting rate limit for user {user_id}: {e}")
             return False
     
+    async def claim_update(self, scope: str, update_id: Optional[int], ttl: int = 120) -> bool:
+        """
+        Mark an incoming update as taken; False if it was already seen.
+        
+        Telegram redelivers updates it got no 200 for, and with several
+        workers the retry can land on a different process, so the marker has
+        to live in Redis. Without Redis (or an update_id) every update is processed.
+        """
+        if not self.redis or update_id is None or ttl <= 0:
+            return True
+        
+        try:
+            return bool(await self.redis.set(f"update_seen:{scope}:{update_id}", 1, nx=True, ex=ttl))
+        except Exception as e:
+            logger.error(f"Error claiming update {update_id}: {e}")
+            return True
+    
+    async def release_update(self, scope: str, update_id: Optional[int]) -> None:
+        """Forget a claimed update that failed, so Telegram's retry is processed"""
+        if not self.redis or update_id is None:
+            return
+        
+        try:
+            await self.redis.delete(f"update_seen:{scope}:{update_id}")
+        except Exception as e:
+            logger.error(f"Error releasing update {update_id}: {e}")
+    
+    def refresh_in_background(self, key: str, refresh: Callable[[], Awaitable[Any]]) -> bool:
+        """
+        Run `refresh` for a stale key unless a refresh is already running.
+        
+        The refresh callable stores the new value itself. A Redis lock keeps it
+        to a single refresh across workers; returns True if one was started.
+        """
+        if key in self._refreshing:
+            return False
+        
+        self._refreshing.add(key)
+        # The refresh outlives the update that noticed the stale entry
+        with no_deadline():
+            task = asyncio.create_task(self._run_refresh(key, refresh))
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+        return True
+    
+    async def _run_refresh(self, key: str, refresh: Callable[[], Awaitable[Any]]):
+        lock_key = f"refresh_lock:{key}"
+        locked = False
+        try:
+            if self.redis:
+                locked = bool(await self.redis.set(lock_key, self.node_id, nx=True, ex=60))
+                if not locked:
+                    return
+            
+            await refresh()
+            self.background_refreshes += 1
+        except Exception as e:
+            logger.error(f"Error refreshing cache for key {key}: {e}")
+        finally:
+            self._refreshing.discard(key)
+            if locked:
+                try:
+                    await self.redis.delete(lock_key)
+                except Exception as e:
+                    logger.error(f"Error releasing refresh lock for key {key}: {e}")
+    
     def get_cache_key(self, prefix: str, identifier: str) -> str:
         """Generate cache key"""
         return f"{prefix}:{identifier}"
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters for each cache tier"""
+        lookups = self.redis_hits + self.redis_misses
+        return {
+            "near": self.near.stats() if self.near else {"enabled": False},
+            "redis": {
+                "connected": bool(self.redis),
+                "hits": self.redis_hits,
+                "misses": self.redis_misses,
+                "hit_ratio": round(self.redis_hits / lookups, 4) if lookups else 0.0,
+                "errors": self.redis_errors,
+                "background_refreshes": self.background_refreshes
+            }
+        }
 
 
 # Global cache instance
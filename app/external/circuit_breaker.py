@@ -0,0 +1,203 @@
+import logging
+import time
+from typing import Dict, Any, List, Tuple
+from app.external.cache import redis_cache
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for an upstream service, shared by all workers through Redis.
+    
+    Closed: calls pass and their outcomes are counted in time buckets over a
+    rolling window. When enough calls fail the circuit opens for
+    `open_seconds` and calls are rejected without touching the upstream.
+    After that a single worker gets a half-open probe: its success closes the
+    circuit, its failure opens it again. Without Redis each worker keeps the
+    same state in process.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(
+        self,
+        name: str,
+        failure_ratio: float = 0.5,
+        min_calls: int = 10,
+        window_seconds: int = 30,
+        open_seconds: int = 30,
+        bucket_seconds: int = 5
+    ):
+        self.name = name
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.bucket_seconds = bucket_seconds
+        self.key = f"circuit:{name}"
+        
+        # Local view of the open period, also the state when Redis is unavailable
+        self._open_until = 0.0
+        self._tripped = False
+        self._probe_pending = False
+        self._buckets: Dict[int, List[int]] = {}
+        self.rejected = 0
+    
+    async def allow_request(self) -> bool:
+        """Check if a call may go to the upstream"""
+        if time.monotonic() < self._open_until:
+            self.rejected += 1
+            return False
+        
+        state = await self.get_state()
+        if state == self.CLOSED:
+            return True
+        
+        if state == self.HALF_OPEN and await self._acquire_probe():
+            self._probe_pending = True
+            logger.info(f"🟡 Circuit {self.name} half-open, sending probe request")
+            return True
+        
+        self.rejected += 1
+        return False
+    
+    async def get_state(self) -> str:
+        """Get current circuit state"""
+        if redis_cache.redis:
+            try:
+                async with redis_cache.redis.pipeline(transaction=False) as pipe:
+                    pipe.pttl(f"{self.key}:open")
+                    pipe.exists(f"{self.key}:tripped")
+                    open_ms, tripped = await pipe.execute()
+                
+                if open_ms > 0:
+                    self._open_until = time.monotonic() + open_ms / 1000
+                    return self.OPEN
+                return self.HALF_OPEN if tripped else self.CLOSED
+            except Exception as e:
+                logger.error(f"Error reading circuit {self.name} state: {e}")
+        
+        if time.monotonic() < self._open_until:
+            return self.OPEN
+        return self.HALF_OPEN if self._tripped else self.CLOSED
+    
+    async def record_success(self):
+        """Record a call the upstream answered"""
+        if self._probe_pending:
+            self._probe_pending = False
+            await self._close()
+            return
+        
+        await self._count(failed=False)
+    
+    async def record_failure(self):
+        """Record a failed call and open the circuit if the window is over the threshold"""
+        if self._probe_pending:
+            self._probe_pending = False
+            await self._open()
+            return
+        
+        calls, failures = await self._count(failed=True)
+        if calls >= self.min_calls and failures / calls >= self.failure_ratio:
+            await self._open()
+    
+    async def release_probe(self):
+        """Give back a half-open probe that ended without an outcome (shed or cancelled)"""
+        if not self._probe_pending:
+            return
+        
+        self._probe_pending = False
+        if redis_cache.redis:
+            try:
+                await redis_cache.redis.delete(f"{self.key}:probe")
+            except Exception as e:
+                logger.error(f"Error releasing circuit {self.name} probe: {e}")
+    
+    def _window_buckets(self) -> List[int]:
+        current = int(time.time()) // self.bucket_seconds
+        count = max(1, self.window_seconds // self.bucket_seconds)
+        return list(range(current - count + 1, current + 1))
+    
+    async def _count(self, failed: bool) -> Tuple[int, int]:
+        """Add an outcome to the current bucket; returns window totals for failures"""
+        buckets = self._window_buckets()
+        
+        if redis_cache.redis:
+            try:
+                bucket_key = f"{self.key}:w:{buckets[-1]}"
+                async with redis_cache.redis.pipeline(transaction=False) as pipe:
+                    pipe.hincrby(bucket_key, "calls", 1)
+                    if failed:
+                        pipe.hincrby(bucket_key, "failures", 1)
+                    pipe.expire(bucket_key, self.window_seconds + self.bucket_seconds)
+                    if failed:
+                        for bucket in buckets:
+                            pipe.hmget(f"{self.key}:w:{bucket}", "calls", "failures")
+                    results = await pipe.execute()
+                
+                if not failed:
+                    return 0, 0
+                counts = results[3:]
+                calls = sum(int(bucket_calls or 0) for bucket_calls, _ in counts)
+                failures = sum(int(bucket_failures or 0) for _, bucket_failures in counts)
+                return calls, failures
+            except Exception as e:
+                logger.error(f"Error recording circuit {self.name} outcome: {e}")
+        
+        # Drop buckets that left the window
+        for bucket in [bucket for bucket in self._buckets if bucket < buckets[0]]:
+            del self._buckets[bucket]
+        counts = self._buckets.setdefault(buckets[-1], [0, 0])
+        counts[0] += 1
+        counts[1] += int(failed)
+        return sum(c[0] for c in self._buckets.values()), sum(c[1] for c in self._buckets.values())
+    
+    async def _acquire_probe(self) -> bool:
+        """Let one caller across all workers probe a half-open circuit"""
+        if redis_cache.redis:
+            try:
+                return bool(await redis_cache.redis.set(f"{self.key}:probe", 1, nx=True, ex=self.open_seconds))
+            except Exception as e:
+                logger.error(f"Error acquiring circuit {self.name} probe: {e}")
+        return not self._probe_pending
+    
+    async def _open(self):
+        """Reject calls for the open period"""
+        self._open_until = time.monotonic() + self.open_seconds
+        self._tripped = True
+        logger.warning(f"🔴 Circuit {self.name} opened for {self.open_seconds}s")
+        
+        if redis_cache.redis:
+            try:
+                async with redis_cache.redis.pipeline(transaction=False) as pipe:
+                    pipe.set(f"{self.key}:open", 1, ex=self.open_seconds)
+                    # Half-open marker outlives the open period, cleared by a successful probe
+                    pipe.set(f"{self.key}:tripped", 1, ex=self.open_seconds * 20)
+                    pipe.delete(f"{self.key}:probe")
+                    await pipe.execute()
+            except Exception as e:
+                logger.error(f"Error opening circuit {self.name}: {e}")
+    
+    async def _close(self):
+        """Resume normal calls with an empty failure window"""
+        self._open_until = 0.0
+        self._tripped = False
+        self._buckets.clear()
+        logger.info(f"🟢 Circuit {self.name} closed")
+        
+        if redis_cache.redis:
+            try:
+                window_keys = [f"{self.key}:w:{bucket}" for bucket in self._window_buckets()]
+                await redis_cache.redis.delete(f"{self.key}:open", f"{self.key}:tripped", f"{self.key}:probe", *window_keys)
+            except Exception as e:
+                logger.error(f"Error closing circuit {self.name}: {e}")
+    
+    async def get_stats(self) -> Dict[str, Any]:
+        """Get circuit state and rejected call count for this worker"""
+        return {
+            "state": await self.get_state(),
+            "rejected": self.rejected
+        }
@@ -0,0 +1,116 @@
+import json
+import logging
+import struct
+import time
+import zlib
+from typing import Optional, Dict, Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CompactHashLayout:
+    """
+    Memory-compact storage for per-exam-number cache entries.
+    
+    Instead of one string key per entry (`exam_result:<15 digits>`), entries
+    are grouped into hashes keyed by exam-number prefix
+    (`exam_result:h:<13 digits>` -> field `<2 digits>`). Small hashes use
+    Redis' listpack encoding, which drops the per-key overhead (dict entry,
+    key object, expiry entry) that dominates small values.
+    
+    Listpack is only kept while a hash has at most `hash-max-listpack-entries`
+    fields (default 128) of at most `hash-max-listpack-value` bytes (default 64).
+    Rendered results are larger than 64 bytes, so raise that limit (e.g. 1024)
+    to get the full saving; hashtable buckets still save the per-key overhead.
+    
+    Values are compact JSON, zlib-compressed when that makes them smaller, and
+    prefixed with a 5-byte header: encoding flag + uint32 expiry timestamp.
+    Redis cannot expire single hash fields on older servers, so expiry is
+    checked on read, expired fields found by a read are deleted, and the
+    bucket key expires with its longest-lived entry (EXPIRE NX/GT, Redis 7+).
+    A bucket holds at most 10^suffix_digits fields, so fields that expire
+    unread cannot grow it without bound.
+    """
+    
+    PLAIN = b"j"
+    COMPRESSED = b"z"
+    HEADER = struct.Struct("<cI")
+    
+    def __init__(self, suffix_digits: int = 2, compress: bool = True, compress_min_bytes: int = 64):
+        self.suffix_digits = suffix_digits
+        self.compress = compress
+        self.compress_min_bytes = compress_min_bytes
+    
+    def bucket_for(self, key: str) -> Optional[Tuple[str, str]]:
+        """Map `prefix:<digits>` to (bucket key, field); None for keys this layout does not handle"""
+        prefix, _, identifier = key.partition(":")
+        if not identifier.isdigit() or len(identifier) <= self.suffix_digits:
+            return None
+        
+        split = len(identifier) - self.suffix_digits
+        return f"{prefix}:h:{identifier[:split]}", identifier[split:]
+    
+    def encode(self, value: Dict[str, Any], ttl: int) -> bytes:
+        """Encode a value with its expiry timestamp"""
+        payload = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        flag = self.PLAIN
+        
+        if self.compress and len(payload) >= self.compress_min_bytes:
+            compressed = zlib.compress(payload, 6)
+            if len(compressed) < len(payload):
+                payload, flag = compressed, self.COMPRESSED
+        
+        return self.HEADER.pack(flag, int(time.time()) + ttl) + payload
+    
+    def decode(self, raw: Optional[bytes]) -> Optional[Dict[str, Any]]:
+        """Decode a stored value; None if missing or expired"""
+        if not raw:
+            return None
+        
+        flag, expires_at = self.HEADER.unpack_from(raw)
+        if expires_at <= time.time():
+            return None
+        
+        payload = raw[self.HEADER.size:]
+        if flag == self.COMPRESSED:
+            payload = zlib.decompress(payload)
+        return json.loads(payload)
+    
+    async def get(self, client, key: str) -> Optional[Dict[str, Any]]:
+        """Get a cached value from its bucket (deleting it if expired)"""
+        bucket, field = self.bucket_for(key)
+        raw = await client.hget(bucket, field)
+        value = self.decode(raw)
+        if raw and value is None:
+            await client.hdel(bucket, field)
+        return value
+    
+    async def set(self, client, key: str, value: Dict[str, Any], ttl: int) -> None:
+        """Store a value in its bucket"""
+        async with client.pipeline(transaction=False) as pipe:
+            self.queue_set(pipe, key, value, ttl)
+            await pipe.execute()
+    
+    def queue_set(self, pipe, key: str, value: Dict[str, Any], ttl: int) -> None:
+        """Queue a store on a pipeline (bucket lives as long as its longest-lived entry)"""
+        bucket, field = self.bucket_for(key)
+        pipe.hset(bucket, field, self.encode(value, ttl))
+        # Set a TTL on new buckets and only ever extend it, so a short-lived
+        # write cannot cut the lifetime of entries already in the bucket
+        pipe.expire(bucket, ttl, nx=True)
+        pipe.expire(bucket, ttl, gt=True)
+    
+    async def reap(self, client, expired: List[str]) -> None:
+        """Delete the fields of keys whose stored values were read back expired"""
+        if not expired:
+            return
+        
+        async with client.pipeline(transaction=False) as pipe:
+            for key in expired:
+                pipe.hdel(*self.bucket_for(key))
+            await pipe.execute()
+    
+    async def delete(self, client, key: str) -> None:
+        """Remove a value from its bucket"""
+        bucket, field = self.bucket_for(key)
+        await client.hdel(bucket, field)
@@ -1,50 +1,229 @@
 import asyncio
 import logging
-from typing import Optional, Dict, Any
+import time
+from collections import deque
+from typing import Optional, Dict, Any, Deque
 import httpx
 from app.config import settings
-from app.external.cache import redis_cache
+from app.external.cache import redis_cache, make_entry, read_entry
+from app.external.circuit_breaker import CircuitBreaker
+from app.external.retry_policy import retry_policies, parse_retry_after
 from app.database.models import ExamResultResponse
+from app.utils.deadline import time_remaining
 
 logger = logging.getLogger(__name__)
 
 
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD concurrency limit for an upstream service.
+    
+    A call that completes within `target_latency` raises the limit by 1/limit
+    (about +1 per limit's worth of calls); an error or slow call cuts it by
+    `decrease_factor`, at most once per `target_latency` so a burst of failures
+    counts as one signal. Callers over the limit wait in a bounded FIFO queue
+    and are rejected at once when it is full.
+    """
+    
+    def __init__(
+        self,
+        initial_limit: int = 20,
+        min_limit: int = 2,
+        max_limit: int = 200,
+        target_latency: float = 2.0,
+        decrease_factor: float = 0.7,
+        max_queue: int = 500
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+        
+        # Queue metrics
+        self.queued = 0
+        self.rejected = 0
+        self.queue_time_total = 0.0
+        self.queue_time_max = 0.0
+    
+    async def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Wait for a slot; False if the queue is full or `timeout` passes"""
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return True
+        
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            return False
+        
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        queue_start = time.monotonic()
+        
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            return False
+        except asyncio.CancelledError:
+            # Slot granted just as the caller was cancelled
+            if waiter.done() and not waiter.cancelled():
+                self.in_flight -= 1
+                self._wake()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            queue_time = time.monotonic() - queue_start
+            self.queue_time_total += queue_time
+            self.queue_time_max = max(self.queue_time_max, queue_time)
+        
+        return True
+    
+    def release(self, latency: float, success: bool) -> None:
+        """Free a slot and adjust the limit from the call's outcome"""
+        self.in_flight -= 1
+        
+        if success and latency <= self.target_latency:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        else:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.target_latency:
+                self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                self._last_decrease = now
+                logger.warning(f"Upstream concurrency limit cut to {int(self.limit)} (latency {latency:.2f}s, success={success})")
+        
+        self._wake()
+    
+    def _wake(self) -> None:
+        """Hand free slots to queued callers in order"""
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(True)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get limit, queue and queue-time metrics"""
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "queue_length": len(self._waiters),
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "avg_queue_time_ms": round(self.queue_time_total / self.queued * 1000, 1) if self.queued else 0.0,
+            "max_queue_time_ms": round(self.queue_time_max * 1000, 1)
+        }
+
+
 class NajahAPIClient:
     def __init__(self):
         self.base_url = settings.najah_api_base_url
         self.timeout = 30.0
         self.max_retries = 3
+        self.breaker = CircuitBreaker(
+            "najah_api",
+            failure_ratio=settings.najah_breaker_failure_ratio,
+            min_calls=settings.najah_breaker_min_calls,
+            window_seconds=settings.najah_breaker_window_seconds,
+            open_seconds=settings.najah_breaker_open_seconds
+        )
+        self.limiter = AdaptiveConcurrencyLimiter(
+            initial_limit=settings.najah_concurrency_initial,
+            min_limit=settings.najah_concurrency_min,
+            max_limit=settings.najah_concurrency_max,
+            target_latency=settings.najah_target_latency_seconds,
+            max_queue=settings.najah_max_queue
+        )
+        
+        self.retry_policy = retry_policies["najah_api"]
+        
+        # Recent upstream latencies, for the hedging delay
+        self._latencies: Deque[float] = deque(maxlen=500)
+        self.hedged_requests = 0
         
     async def get_exam_result(self, exam_id: str) -> ExamResultResponse:
         """Get exam result from external API with caching"""
         
         # Check cache first
         cache_key = redis_cache.get_cache_key("exam_result", exam_id)
-        cached_result = await redis_cache.get(cache_key)
+        cached_result, refresh_due = read_entry(await redis_cache.get(cache_key))
         
         if cached_result:
             logger.info(f"Cache hit for exam result: {exam_id}")
+            if refresh_due:
+                # Serve the stale result now; a single background fetch replaces it
+                redis_cache.refresh_in_background(cache_key, lambda: self._fetch_exam_result(exam_id, cache_key))
             return ExamResultResponse(success=True, data=cached_result)
         
-        # Fetch from API
+        return await self._fetch_exam_result(exam_id, cache_key)
+    
+    async def _fetch_exam_result(self, exam_id: str, cache_key: str) -> ExamResultResponse:
+        """Fetch exam result from the API with retries and cache it"""
         logger.info(f"Fetching exam result from API: {exam_id}")
+        fetch_start = time.monotonic()
+        self.retry_policy.record_request()
+        delay = self.retry_policy.base_delay
+        error = "فشل في الحصول على النتيجة بعد عدة محاولات"
         
         for attempt in range(self.max_retries):
+            # The update's budget is spent: stop instead of starting another attempt
+            remaining = time_remaining()
+            if remaining is not None and remaining <= 0:
+                logger.warning(f"Deadline exceeded before attempt {attempt + 1}: {exam_id}")
+                return ExamResultResponse(
+                    success=False,
+                    error="انتهت مهلة الاتصال بخدمة النتائج"
+                )
+            
+            # Upstream is failing: answer from the stale copy instead of waiting on timeouts
+            if not await self.breaker.allow_request():
+                return await self._get_stale_result(exam_id)
+            
+            # Over the adaptive limit with a full queue: shed load instead of piling on.
+            # A half-open probe that never reaches the upstream is given back
+            try:
+                acquired = await self.limiter.acquire(timeout=remaining)
+            except asyncio.CancelledError:
+                await self.breaker.release_probe()
+                raise
+            if not acquired:
+                await self.breaker.release_probe()
+                return await self._get_stale_result(exam_id)
+            
+            request_start = time.monotonic()
+            upstream_ok = False
+            retry_after = None
             try:
+                # Each attempt gets what is left of the budget, at most the client timeout
+                remaining = time_remaining()
+                timeout = self.timeout if remaining is None else max(min(self.timeout, remaining), 0.001)
+                
                 async with httpx.AsyncClient(timeout=self.timeout) as client:
                     url = f"{self.base_url}/exam-result/{exam_id}"
-                    response = await client.get(url)
+                    response = await self._get(client, url, timeout)
+                    upstream_ok = response.status_code in (200, 404)
+                    if upstream_ok:
+                        self._latencies.append(time.monotonic() - request_start)
                     
                     if response.status_code == 200:
                         result_data = response.json()
+                        await self.breaker.record_success()
                         
                         # Cache the successful result
-                        await redis_cache.set(cache_key, result_data)
+                        await redis_cache.set(cache_key, *make_entry(result_data, compute_time=time.monotonic() - fetch_start))
+                        await self._save_stale_copy(exam_id, result_data)
                         
                         logger.info(f"Successfully fetched exam result: {exam_id}")
                         return ExamResultResponse(success=True, data=result_data)
                     
                     elif response.status_code == 404:
+                        await self.breaker.record_success()
                         logger.warning(f"Exam result not found: {exam_id}")
                         return ExamResultResponse(
                             success=False, 
@@ -52,46 +231,119 @@ class NajahAPIClient:
                         )
                     
                     else:
+                        await self.breaker.record_failure()
                         logger.error(f"API returned status {response.status_code} for exam_id: {exam_id}")
-                        if attempt == self.max_retries - 1:
-                            return ExamResultResponse(
-                                success=False,
-                                error="خطأ في خدمة النتائج"
-                            )
+                        error = "خطأ في خدمة النتائج"
+                        # 429/503 may say when to come back
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"))
                         
             except httpx.TimeoutException:
+                await self.breaker.record_failure()
                 logger.error(f"Timeout fetching exam result (attempt {attempt + 1}): {exam_id}")
-                if attempt == self.max_retries - 1:
-                    return ExamResultResponse(
-                        success=False,
-                        error="انتهت مهلة الاتصال بخدمة النتائج"
-                    )
+                error = "انتهت مهلة الاتصال بخدمة النتائج"
             
             except httpx.RequestError as e:
+                await self.breaker.record_failure()
                 logger.error(f"Request error fetching exam result (attempt {attempt + 1}): {exam_id}, error: {e}")
-                if attempt == self.max_retries - 1:
-                    return ExamResultResponse(
-                        success=False,
-                        error="خطأ في الاتصال بخدمة النتائج"
-                    )
+                error = "خطأ في الاتصال بخدمة النتائج"
             
             except Exception as e:
+                # Also releases a half-open probe, which would otherwise block every worker
+                await self.breaker.record_failure()
                 logger.error(f"Unexpected error fetching exam result (attempt {attempt + 1}): {exam_id}, error: {e}")
-                if attempt == self.max_retries - 1:
-                    return ExamResultResponse(
-                        success=False,
-                        error="حدث خطأ غير متوقع"
-                    )
+                error = "حدث خطأ غير متوقع"
+            
+            finally:
+                self.limiter.release(time.monotonic() - request_start, upstream_ok)
+                # No-op once an outcome was recorded; frees the probe if the caller was cancelled
+                await self.breaker.release_probe()
+            
+            if attempt == self.max_retries - 1:
+                break
+            
+            # Jittered wait before retry, unless the shared retry budget or the deadline says no
+            delay = await self.retry_policy.backoff(delay, retry_after)
+            if delay is None:
+                logger.warning(f"Not retrying exam result: {exam_id}")
+                break
+        
+        return ExamResultResponse(
+            success=False,
+            error=error
+        )
+    
+    async def _get(self, client: httpx.AsyncClient, url: str, timeout: float) -> httpx.Response:
+        """GET, hedged with a second request after the p95 latency when enabled"""
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is None or hedge_delay >= timeout:
+            return await client.get(url, timeout=timeout)
+        
+        primary = asyncio.create_task(client.get(url, timeout=timeout))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+            if done:
+                return primary.result()
             
-            # Wait before retry
-            if attempt < self.max_retries - 1:
-                await asyncio.sleep(2 ** attempt)  # Exponential backoff
+            # Only hedge with spare upstream capacity; a hedge spends retry budget
+            if self.limiter.in_flight >= int(self.limiter.limit) or not self.retry_policy.allow_retry():
+                return await primary
+            
+            self.hedged_requests += 1
+            hedge = asyncio.create_task(client.get(url, timeout=timeout - hedge_delay))
+            tasks.append(hedge)
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if not task.exception():
+                        return task.result()
+            # Both failed: report the original request's error
+            return primary.result()
+        finally:
+            # Also runs when the caller is cancelled, so no request outlives it
+            for task in tasks:
+                task.cancel()
+    
+    def _hedge_delay(self) -> Optional[float]:
+        """Observed p95 upstream latency, once there are enough samples"""
+        if not settings.najah_hedge_enabled or len(self._latencies) < 20:
+            return None
+        latencies = sorted(self._latencies)
+        return max(latencies[int(len(latencies) * 0.95) - 1], 0.05)
+    
+    async def _save_stale_copy(self, exam_id: str, result_data: Dict[str, Any]) -> None:
+        """Keep a long-lived copy to answer from while the circuit is open"""
+        try:
+            stale_key = redis_cache.get_cache_key("exam_result_stale", exam_id)
+            await redis_cache.set_many({stale_key: result_data}, settings.stale_result_ttl_seconds)
+        except Exception as e:
+            logger.error(f"Error saving stale copy for exam result {exam_id}: {e}")
+    
+    async def _get_stale_result(self, exam_id: str) -> ExamResultResponse:
+        """Answer from the stale copy, or fail fast while the upstream is down or saturated"""
+        stale_key = redis_cache.get_cache_key("exam_result_stale", exam_id)
+        stale_result = await redis_cache.get(stale_key)
         
+        if stale_result:
+            logger.info(f"Upstream unavailable, serving stale exam result: {exam_id}")
+            return ExamResultResponse(success=True, data=stale_result, stale=True)
+        
+        logger.warning(f"Upstream unavailable, no stale copy for exam result: {exam_id}")
         return ExamResultResponse(
             success=False,
-            error="فشل في الحصول على النتيجة بعد عدة محاولات"
+            error="خدمة النتائج مشغولة حالياً، يرجى المحاولة بعد قليل"
         )
     
+    async def get_stats(self) -> Dict[str, Any]:
+        """Get circuit and concurrency limiter stats"""
+        return {
+            "circuit": await self.breaker.get_stats(),
+            "concurrency": self.limiter.get_stats(),
+            "hedged_requests": self.hedged_requests,
+            "retries": self.retry_policy.get_stats()
+        }
+    
     async def health_check(self) -> bool:
         """Check if the API is healthy"""
         try:
@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from datetime import timedelta
+from typing import Optional, Dict, Any, Deque, List
+from app.config import settings
+from app.utils.deadline import time_remaining
+
+logger = logging.getLogger(__name__)
+
+
+class RetryPolicy:
+    """
+    Shared retry policy for one outbound dependency.
+    
+    Retries are limited by a budget: over a rolling window they may not exceed
+    `budget_ratio` of the original requests (plus a small per-second reserve so
+    low traffic can still retry). During an outage callers give up after one
+    try instead of multiplying traffic. Delays use decorrelated jitter, and a
+    server's retry-after hint is honoured when it fits in the deadline.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        budget_ratio: float = 0.2,
+        min_retries_per_second: float = 1.0,
+        window_seconds: int = 10,
+        max_retry_after: float = 30.0
+    ):
+        self.name = name
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget_ratio = budget_ratio
+        self.min_retries_per_second = min_retries_per_second
+        self.window_seconds = window_seconds
+        self.max_retry_after = max_retry_after
+        
+        # [second, requests, retries] for the last `window_seconds` seconds
+        self._buckets: Deque[List[int]] = deque()
+        self.requests = 0
+        self.retries = 0
+        self.budget_exhausted = 0
+    
+    def _bucket(self) -> List[int]:
+        now = int(time.monotonic())
+        while self._buckets and self._buckets[0][0] <= now - self.window_seconds:
+            self._buckets.popleft()
+        if not self._buckets or self._buckets[-1][0] != now:
+            self._buckets.append([now, 0, 0])
+        return self._buckets[-1]
+    
+    def record_request(self) -> None:
+        """Count an original (non-retry) request toward the budget"""
+        self._bucket()[1] += 1
+        self.requests += 1
+    
+    def allow_retry(self) -> bool:
+        """Take one retry from the budget if there is room"""
+        bucket = self._bucket()
+        requests = sum(b[1] for b in self._buckets)
+        retries = sum(b[2] for b in self._buckets)
+        allowed = self.budget_ratio * requests + self.min_retries_per_second * self.window_seconds
+        if retries >= allowed:
+            self.budget_exhausted += 1
+            return False
+        
+        bucket[2] += 1
+        self.retries += 1
+        return True
+    
+    def next_delay(self, previous_delay: float) -> float:
+        """Decorrelated jitter: random between the base delay and three times the previous one"""
+        return min(self.max_delay, random.uniform(self.base_delay, max(self.base_delay, previous_delay) * 3))
+    
+    async def backoff(self, previous_delay: float, retry_after: Optional[float] = None) -> Optional[float]:
+        """
+        Wait before a retry; returns the delay used, or None if the call should
+        not be retried (budget spent, retry-after too long or past the deadline).
+        """
+        delay = retry_after if retry_after is not None else self.next_delay(previous_delay)
+        if retry_after is not None and retry_after > self.max_retry_after:
+            logger.warning(f"{self.name}: retry-after {retry_after:.0f}s too long, not retrying")
+            return None
+        
+        remaining = time_remaining()
+        if remaining is not None and delay >= remaining:
+            return None
+        
+        if not self.allow_retry():
+            logger.warning(f"{self.name}: retry budget exhausted, not retrying")
+            return None
+        
+        await asyncio.sleep(delay)
+        return delay
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get request, retry and budget counters"""
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "retry_ratio": round(self.retries / self.requests, 4) if self.requests else 0.0,
+            "budget_exhausted": self.budget_exhausted
+        }
+
+
+def parse_retry_after(value: Any) -> Optional[float]:
+    """Seconds from a Retry-After header or Telegram retry_after value"""
+    if value is None:
+        return None
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+# Global retry policies, one per outbound dependency
+retry_policies: Dict[str, RetryPolicy] = {
+    "najah_api": RetryPolicy("najah_api", budget_ratio=settings.retry_budget_ratio),
+    "telegram": RetryPolicy("telegram", budget_ratio=settings.retry_budget_ratio)
+}
@@ -0,0 +1,243 @@
+import asyncio
+import logging
+import math
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List, Set
+from app.config import settings
+from app.database.models import AnalyticsEvent
+from app.external.cache import redis_cache
+
+logger = logging.getLogger(__name__)
+
+# Latency histogram resolution: 8 buckets per doubling (about 9% relative error)
+HISTOGRAM_SUB_BUCKETS = 8
+
+
+def latency_bucket(ms: float) -> int:
+    """Histogram bucket for a latency; buckets are fixed so histograms merge by adding counts"""
+    return int(math.log2(max(ms, 0) + 1) * HISTOGRAM_SUB_BUCKETS)
+
+
+def bucket_value(bucket: int) -> float:
+    """Representative latency (ms) of a histogram bucket"""
+    return 2 ** ((bucket + 0.5) / HISTOGRAM_SUB_BUCKETS) - 1
+
+
+def histogram_percentile(histogram: Dict[int, int], percentile: float) -> Optional[float]:
+    """Latency at a percentile (0-100) of a bucket -> count histogram"""
+    total = sum(histogram.values())
+    if not total:
+        return None
+    
+    rank = math.ceil(total * percentile / 100)
+    seen = 0
+    for bucket in sorted(histogram):
+        seen += histogram[bucket]
+        if seen >= rank:
+            return round(bucket_value(bucket), 1)
+    return round(bucket_value(max(histogram)), 1)
+
+
+class RollupStore:
+    """
+    Per-minute and per-hour usage rollups in Redis.
+    
+    Events are counted in process and added to Redis every `flush_interval`
+    seconds, so each worker costs one pipeline per interval instead of a
+    round trip per update. Each bucket is a hash of request and failure
+    counts by action, latency histogram counts and cache hits/misses, plus a
+    HyperLogLog of the users seen. All parts merge by addition, so workers
+    share buckets and any range of buckets can be summarised.
+    """
+    
+    RESOLUTIONS = {
+        "m": ("%Y%m%d%H%M", 60),
+        "h": ("%Y%m%d%H", 3600)
+    }
+    
+    def __init__(self, flush_interval: float = 10.0, minute_ttl: int = 48 * 3600, hour_ttl: int = 30 * 24 * 3600):
+        self.flush_interval = flush_interval
+        self.ttls = {"m": minute_ttl, "h": hour_ttl}
+        
+        # Pending deltas: bucket key -> field -> count, and bucket key -> user ids
+        self._counts: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._users: Dict[str, Set[int]] = defaultdict(set)
+        self._cache_seen = (0, 0)
+        self._task: Optional[asyncio.Task] = None
+        
+        self.flushes = 0
+        self.failed_flushes = 0
+    
+    @classmethod
+    def bucket_key(cls, resolution: str, timestamp: float) -> str:
+        fmt, _ = cls.RESOLUTIONS[resolution]
+        return f"rollup:{resolution}:{datetime.fromtimestamp(timestamp, timezone.utc).strftime(fmt)}"
+    
+    def record(self, event: AnalyticsEvent):
+        """Count an event in the current minute and hour buckets"""
+        timestamp = event.created_at.timestamp() if event.created_at else time.time()
+        for resolution in self.RESOLUTIONS:
+            key = self.bucket_key(resolution, timestamp)
+            counts = self._counts[key]
+            counts[f"count:{event.action}"] += 1
+            if not event.success:
+                counts[f"fail:{event.action}"] += 1
+            if event.response_time_ms is not None:
+                counts[f"h:{latency_bucket(event.response_time_ms)}"] += 1
+            self._users[key].add(event.user_id)
+    
+    def record_loop_lag(self, lag_ms: float, slow: bool = False):
+        """Count an event-loop lag sample (and a blocked-loop incident) in the current buckets"""
+        now = time.time()
+        for resolution in self.RESOLUTIONS:
+            counts = self._counts[self.bucket_key(resolution, now)]
+            counts[f"lag:{latency_bucket(lag_ms)}"] += 1
+            if slow:
+                counts["slow_callbacks"] += 1
+    
+    def _record_cache(self):
+        """Add cache hits and misses since the last flush to the current buckets"""
+        hits = redis_cache.redis_hits + (redis_cache.near.hits if redis_cache.near else 0)
+        misses = redis_cache.redis_misses
+        new_hits, new_misses = hits - self._cache_seen[0], misses - self._cache_seen[1]
+        self._cache_seen = (hits, misses)
+        
+        now = time.time()
+        for resolution in self.RESOLUTIONS:
+            counts = self._counts[self.bucket_key(resolution, now)]
+            counts["cache_hits"] += new_hits
+            counts["cache_misses"] += new_misses
+    
+    async def start(self):
+        """Start the background flush task"""
+        if self._task:
+            return
+        self._cache_seen = (redis_cache.redis_hits + (redis_cache.near.hits if redis_cache.near else 0), redis_cache.redis_misses)
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop the flush task and push the last deltas"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+    
+    async def flush(self) -> bool:
+        """Add pending deltas to the Redis buckets in one pipeline"""
+        self._record_cache()
+        counts, users = self._counts, self._users
+        self._counts = defaultdict(lambda: defaultdict(int))
+        self._users = defaultdict(set)
+        
+        if not redis_cache.redis:
+            # Without Redis the rollups lose this interval rather than growing in memory
+            self.failed_flushes += 1
+            return False
+        
+        try:
+            async with redis_cache.redis.pipeline(transaction=False) as pipe:
+                for key, fields in counts.items():
+                    for field, value in fields.items():
+                        if value:
+                            pipe.hincrby(key, field, value)
+                    if key in users:
+                        pipe.pfadd(f"{key}:users", *users[key])
+                    ttl = self.ttls[key.split(":")[1]]
+                    pipe.expire(key, ttl)
+                    pipe.expire(f"{key}:users", ttl)
+                await pipe.execute()
+            
+            self.flushes += 1
+            return True
+        except Exception as e:
+            self.failed_flushes += 1
+            logger.error(f"Error flushing usage rollups: {e}")
+            return False
+    
+    def _bucket_keys(self, resolution: str, count: int) -> List[str]:
+        _, seconds = self.RESOLUTIONS[resolution]
+        now = time.time()
+        return [self.bucket_key(resolution, now - i * seconds) for i in range(count)]
+    
+    async def summary(self, resolution: str = "m", count: int = 60) -> Dict[str, Any]:
+        """Merge the last `count` buckets (including the current one) into one summary"""
+        keys = self._bucket_keys(resolution, count)
+        if not redis_cache.redis:
+            return {"error": "redis unavailable"}
+        
+        try:
+            async with redis_cache.redis.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.hgetall(key)
+                pipe.pfcount(*[f"{key}:users" for key in keys])
+                *buckets, unique_users = await pipe.execute()
+        except Exception as e:
+            logger.error(f"Error reading usage rollups: {e}")
+            return {"error": str(e)}
+        
+        actions: Dict[str, int] = defaultdict(int)
+        failures: Dict[str, int] = defaultdict(int)
+        histogram: Dict[int, int] = defaultdict(int)
+        lag_histogram: Dict[int, int] = defaultdict(int)
+        cache = {"cache_hits": 0, "cache_misses": 0}
+        slow_callbacks = 0
+        for bucket in buckets:
+            for field, value in bucket.items():
+                field = field.decode() if isinstance(field, bytes) else field
+                value = int(value)
+                kind, _, name = field.partition(":")
+                if kind == "count":
+                    actions[name] += value
+                elif kind == "fail":
+                    failures[name] += value
+                elif kind == "h":
+                    histogram[int(name)] += value
+                elif kind == "lag":
+                    lag_histogram[int(name)] += value
+                elif field == "slow_callbacks":
+                    slow_callbacks += value
+                elif field in cache:
+                    cache[field] += value
+        
+        lookups = cache["cache_hits"] + cache["cache_misses"]
+        return {
+            "requests": sum(actions.values()),
+            "failures": sum(failures.values()),
+            "by_action": dict(sorted(actions.items(), key=lambda item: -item[1])),
+            "latency_ms": {
+                "p50": histogram_percentile(histogram, 50),
+                "p95": histogram_percentile(histogram, 95),
+                "p99": histogram_percentile(histogram, 99)
+            },
+            "loop_lag_ms": {
+                "p50": histogram_percentile(lag_histogram, 50),
+                "p99": histogram_percentile(lag_histogram, 99),
+                "max": histogram_percentile(lag_histogram, 100)
+            },
+            "slow_callbacks": slow_callbacks,
+            "cache_hit_ratio": round(cache["cache_hits"] / lookups, 4) if lookups else None,
+            "unique_users": unique_users
+        }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get flush counters for this worker"""
+        return {
+            "pending_buckets": len(self._counts),
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes
+        }
+
+
+# Global rollup store instance
+usage_rollups = RollupStore(flush_interval=settings.rollup_flush_interval_seconds)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Backfill the all-time unique-user HyperLogLog from user_sessions
+
+Admin stats count users from Redis HyperLogLogs that only see users active
+since they were introduced. Run this once per Redis instance so the
+all-time count includes everyone who already has a session. Re-running it
+is harmless: adding a user twice does not change the count. A database
+error stops the run with a non-zero exit code.
+
+Usage:
+    python -m app.jobs.backfill_user_activity --batch-size 1000
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from dataclasses import dataclass
+from app.config import settings
+from app.database.supabase_client import supabase_client
+from app.external.cache import redis_cache
+from app.external.user_activity import user_activity
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BackfillReport:
+    """User activity backfill metrics"""
+    users: int = 0
+    batches: int = 0
+    failed_batches: int = 0
+    unique_users: int = 0
+    duration: float = 0.0
+    
+    def summary(self) -> str:
+        """One-line report for logs and CLI output"""
+        return (
+            f"users={self.users} batches={self.batches} failed_batches={self.failed_batches} "
+            f"all_time_unique={self.unique_users} duration={self.duration:.1f}s"
+        )
+
+
+async def backfill_user_activity(batch_size: int = 1000) -> BackfillReport:
+    """Add every user_sessions user to the all-time HyperLogLog; database errors propagate"""
+    report = BackfillReport()
+    start_time = time.time()
+    after = None
+    
+    while True:
+        user_ids = await asyncio.to_thread(supabase_client.get_user_ids_page, after, batch_size, strict=True)
+        if not user_ids:
+            break
+        
+        report.users += len(user_ids)
+        report.batches += 1
+        if not await user_activity.add_all_time(user_ids):
+            report.failed_batches += 1
+        
+        after = user_ids[-1]
+        if report.batches % 100 == 0:
+            logger.info(f"Backfilled {report.users} users")
+    
+    counts = await user_activity.get_counts()
+    report.unique_users = counts.get("total", 0)
+    report.duration = time.time() - start_time
+    return report
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Backfill the all-time unique-user count from user_sessions")
+    parser.add_argument("--batch-size", type=int, default=1000, help="User ids per page")
+    
+    args = parser.parse_args()
+    
+    logging.basicConfig(
+        level=getattr(logging, settings.log_level),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    async def run() -> bool:
+        await redis_cache.connect()
+        if not redis_cache.redis:
+            logger.error("Redis is not available. Exiting.")
+            return False
+        
+        try:
+            report = await backfill_user_activity(batch_size=args.batch_size)
+            print(report.summary())
+            return report.failed_batches == 0
+        except Exception as e:
+            logger.error(f"Backfill failed: {e}")
+            return False
+        finally:
+            await redis_cache.disconnect()
+    
+    if not asyncio.run(run()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
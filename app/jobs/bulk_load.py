@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+High-throughput bulk loader for students and exam_results
+
+Streams CSV or JSON Lines input, normalizes names and validates exam numbers,
+and loads rows in parallel chunks. Completed chunks are recorded in a
+checkpoint file so an interrupted load resumes where it stopped.
+
+Backends:
+- copy:   COPY into a staging table + INSERT ... ON CONFLICT (needs DATABASE_URL)
+- upsert: batched PostgREST upserts through the Supabase client
+
+Usage:
+    python -m app.jobs.bulk_load students.csv --table students --backend copy --workers 4
+    python -m app.jobs.bulk_load results.jsonl --table exam_results --backend upsert
+
+Load students before exam_results (exam_results.examno references students).
+"""
+
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from app.config import settings
+from app.database.models import Student, ExamResult
+from app.utils.validation import ValidationUtils
+
+logger = logging.getLogger(__name__)
+
+# Loadable columns per table (id is generated by the database)
+TABLE_COLUMNS = {
+    "students": [name for name in Student.model_fields if name != "id"],
+    "exam_results": list(ExamResult.model_fields),
+}
+
+
+@dataclass
+class LoadReport:
+    """Bulk load metrics"""
+    rows_read: int = 0
+    rows_loaded: int = 0
+    rows_rejected: int = 0
+    chunks_loaded: int = 0
+    chunks_skipped: int = 0
+    chunks_failed: int = 0
+    duration: float = 0.0
+    rejected_samples: List[str] = field(default_factory=list)
+    
+    @property
+    def rows_per_second(self) -> float:
+        """Loaded rows per second"""
+        return self.rows_loaded / self.duration if self.duration else 0.0
+    
+    def summary(self) -> str:
+        """One-line report for logs and CLI output"""
+        return (
+            f"read={self.rows_read} loaded={self.rows_loaded} rejected={self.rows_rejected} "
+            f"chunks(loaded={self.chunks_loaded} skipped={self.chunks_skipped} failed={self.chunks_failed}) "
+            f"rate={self.rows_per_second:.0f} rows/s duration={self.duration:.1f}s"
+        )
+
+
+def iter_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream records from a CSV, JSON Lines or JSON array file"""
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            yield from csv.DictReader(f)
+    elif path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif path.endswith(".json"):
+        # A JSON array has to be parsed whole; prefer .jsonl for large files
+        with open(path, encoding="utf-8") as f:
+            yield from json.load(f)
+    else:
+        raise ValueError(f"Unsupported input format: {path}")
+
+
+def normalize_record(table: str, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Keep known columns, validate the exam number and normalize names; None if invalid"""
+    row = {
+        column: (str(record[column]).strip() or None) if record[column] is not None else None
+        for column in TABLE_COLUMNS[table]
+        if column in record
+    }
+    
+    examno = ValidationUtils.clean_exam_number(row.get("examno") or "")
+    if not examno:
+        return None
+    row["examno"] = examno
+    
+    if table == "students" and "aname" in row:
+        row["aname"] = ValidationUtils.normalize_arabic_name(row["aname"])
+    
+    return row
+
+
+class CopyBackend:
+    """Loads chunks with COPY into a staging table, then upserts into the target"""
+    
+    def __init__(self, database_url: str):
+        if not database_url:
+            raise ValueError("DATABASE_URL is required for the copy backend")
+        self.database_url = database_url
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+    
+    def _connection(self):
+        """One connection per worker thread"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or conn.closed:
+            import psycopg2
+            conn = psycopg2.connect(self.database_url)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+    
+    def load_chunk(self, table: str, columns: List[str], rows: List[Dict[str, Any]]) -> int:
+        """Load one chunk in a single transaction"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for rownum, row in enumerate(rows):
+            writer.writerow([rownum] + [row.get(column) for column in columns])
+        buffer.seek(0)
+        
+        # Table and column names come from TABLE_COLUMNS, never from input
+        column_list = ", ".join(columns)
+        updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in columns if column != "examno")
+        staging = f"{table}_staging"
+        
+        conn = self._connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"CREATE TEMP TABLE IF NOT EXISTS {staging} "
+                    f"(rownum integer, LIKE {table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+                )
+                cur.copy_expert(f"COPY {staging} (rownum, {column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+                # Rows repeated within a chunk would make ON CONFLICT fail; keep the last one, like UpsertBackend
+                cur.execute(
+                    f"INSERT INTO {table} ({column_list}) "
+                    f"SELECT DISTINCT ON (examno) {column_list} FROM {staging} "
+                    f"ORDER BY examno, rownum DESC "
+                    f"ON CONFLICT (examno) DO " + (f"UPDATE SET {updates}" if updates else "NOTHING")
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        
+        return len(rows)
+    
+    def close(self) -> None:
+        """Close all worker connections"""
+        for conn in self._connections:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+class UpsertBackend:
+    """Loads chunks with batched PostgREST upserts"""
+    
+    def __init__(self):
+        from app.database.supabase_client import supabase_client
+        self.client = supabase_client.client
+    
+    def load_chunk(self, table: str, columns: List[str], rows: List[Dict[str, Any]]) -> int:
+        """Upsert one chunk in a single request"""
+        # Duplicate keys inside one upsert are rejected by Postgres; keep the last one
+        unique_rows = list({row["examno"]: row for row in rows}.values())
+        self.client.table(table).upsert(unique_rows, on_conflict="examno").execute()
+        return len(rows)
+    
+    def close(self) -> None:
+        """Nothing to release; the shared Supabase client stays open"""
+
+
+class Checkpoint:
+    """Records completed chunk indexes so a load can resume"""
+    
+    def __init__(self, path: Optional[str], chunk_size: int):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.completed: Set[int] = set()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            # Chunk numbers only line up again with the same chunk size
+            if data.get("chunk_size") != chunk_size:
+                raise ValueError(
+                    f"Checkpoint {path} was written with chunk size {data.get('chunk_size')}; "
+                    f"use the same --chunk-size or --restart"
+                )
+            self.completed = set(data.get("completed_chunks", []))
+            logger.info(f"Resuming from checkpoint: {len(self.completed)} chunks already loaded")
+    
+    def mark(self, chunk_index: int) -> None:
+        """Record a loaded chunk"""
+        self.completed.add(chunk_index)
+        if not self.path:
+            return
+        
+        # Write-then-rename so a crash never leaves a truncated checkpoint
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"chunk_size": self.chunk_size, "completed_chunks": sorted(self.completed)}, f)
+        os.replace(tmp_path, self.path)
+
+
+class BulkLoader:
+    """Streams an input file into a table in parallel chunks"""
+    
+    def __init__(
+        self,
+        path: str,
+        table: str,
+        backend,
+        chunk_size: int = 5000,
+        workers: int = 4,
+        checkpoint_path: Optional[str] = None
+    ):
+        if table not in TABLE_COLUMNS:
+            raise ValueError(f"Unsupported table: {table}")
+        self.path = path
+        self.table = table
+        self.backend = backend
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.checkpoint = Checkpoint(checkpoint_path, chunk_size)
+        self.report = LoadReport()
+    
+    def _iter_chunks(self) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+        """Group valid rows into numbered chunks (numbering is stable across runs)"""
+        chunk: List[Dict[str, Any]] = []
+        chunk_index = 0
+        
+        for record in iter_records(self.path):
+            self.report.rows_read += 1
+            row = normalize_record(self.table, record)
+            if row is None:
+                self.report.rows_rejected += 1
+                if len(self.report.rejected_samples) < 10:
+                    self.report.rejected_samples.append(str(record.get("examno")))
+                continue
+            
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                yield chunk_index, chunk
+                chunk_index += 1
+                chunk = []
+        
+        if chunk:
+            yield chunk_index, chunk
+    
+    def run(self) -> LoadReport:
+        """Load the whole file; failed chunks are left for the next run"""
+        start_time = time.time()
+        in_flight = {}
+        columns: Optional[List[str]] = None
+        
+        def collect(done) -> None:
+            for future in done:
+                chunk_index, row_count = in_flight.pop(future)
+                try:
+                    self.report.rows_loaded += future.result()
+                    self.report.chunks_loaded += 1
+                    self.checkpoint.mark(chunk_index)
+                except Exception as e:
+                    self.report.chunks_failed += 1
+                    logger.error(f"Chunk {chunk_index} ({row_count} rows) failed: {e}")
+            
+            elapsed = time.time() - start_time
+            logger.info(
+                f"Loaded {self.report.rows_loaded} rows into {self.table} "
+                f"({self.report.rows_loaded / max(elapsed, 0.001):.0f} rows/s)"
+            )
+        
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for chunk_index, rows in self._iter_chunks():
+                if chunk_index in self.checkpoint.completed:
+                    self.report.chunks_skipped += 1
+                    continue
+                
+                # Column set is taken from the first row so absent columns are not overwritten
+                columns = columns or list(rows[0].keys())
+                
+                # Bound memory: never hold more than two chunks per worker
+                if len(in_flight) >= self.workers * 2:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+                
+                future = executor.submit(self.backend.load_chunk, self.table, columns, rows)
+                in_flight[future] = (chunk_index, len(rows))
+            
+            if in_flight:
+                done, _ = wait(in_flight)
+                collect(done)
+        
+        self.report.duration = time.time() - start_time
+        logger.info(f"Bulk load complete: {self.report.summary()}")
+        if self.report.rejected_samples:
+            logger.warning(f"Rejected exam numbers (sample): {self.report.rejected_samples}")
+        return self.report
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Bulk load students or exam results")
+    parser.add_argument("path", help="Input file (.csv, .jsonl or .json)")
+    parser.add_argument("--table", choices=sorted(TABLE_COLUMNS), required=True, help="Target table")
+    parser.add_argument("--backend", choices=["copy", "upsert"], default="copy", help="Load method")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Rows per chunk")
+    parser.add_argument("--workers", type=int, default=4, help="Chunks loaded in parallel")
+    parser.add_argument("--checkpoint", default=None, help="Checkpoint file (default: <path>.<table>.checkpoint)")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    
+    args = parser.parse_args()
+    
+    logging.basicConfig(
+        level=getattr(logging, settings.log_level),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    checkpoint_path = args.checkpoint or f"{args.path}.{args.table}.checkpoint"
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    
+    backend = CopyBackend(settings.database_url) if args.backend == "copy" else UpsertBackend()
+    try:
+        report = BulkLoader(
+            args.path,
+            args.table,
+            backend,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            checkpoint_path=checkpoint_path
+        ).run()
+    finally:
+        backend.close()
+    
+    print(report.summary())
+    if report.chunks_failed:
+        print(f"{report.chunks_failed} chunks failed; run again to resume")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Cache memory report: bytes per entry for the string and compact layouts
+
+Samples existing cache entries (or synthetic exam results when the cache is
+empty), writes them in both layouts under temporary keys with dense exam
+numbers, as a full season would be, and measures MEMORY USAGE.
+
+Usage:
+    python -m app.jobs.cache_memory_report --prefix result_render --sample 1000
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List
+import redis.asyncio as redis
+from app.config import settings
+from app.external.cache import redis_cache
+from app.external.compact_cache import CompactHashLayout
+
+logger = logging.getLogger(__name__)
+
+SYNTHETIC_RESULT = {
+    "name": "عبدالله أحمد حسن",
+    "examno": "272591110430082",
+    "school": "اعدادية الكوثر للبنين",
+    "governorate": "كربلاء",
+    "gender": "ذكر",
+    "subjects": {"الاسلامية": 85, "العربية": 78, "الانكليزية": 90, "الرياضيات": 88, "الفيزياء": 81, "الكيمياء": 79},
+    "total": 501,
+    "average": 83.5,
+    "status": "ناجح"
+}
+
+# Dense 15-digit exam numbers so compact buckets fill as they would in production
+REPORT_BASE_EXAMNO = 10 ** 14
+
+
+async def sample_values(prefix: str, sample: int) -> List[Dict[str, Any]]:
+    """Read up to `sample` string-layout values for a prefix"""
+    values = []
+    async for key in redis_cache.redis.scan_iter(match=f"{prefix}:*", count=500):
+        if key.startswith(f"{prefix}:h:"):
+            continue
+        raw = await redis_cache.redis.get(key)
+        if raw:
+            values.append(json.loads(raw))
+        if len(values) >= sample:
+            break
+    return values
+
+
+async def memory_usage(keys: List[str]) -> int:
+    """Total MEMORY USAGE of keys"""
+    async with redis_cache.redis.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.memory_usage(key, samples=0)
+        results = await pipe.execute()
+    return sum(result or 0 for result in results)
+
+
+async def build_report(prefix: str, sample: int, ttl: int = 600) -> Dict[str, Any]:
+    """Measure bytes per entry for both layouts"""
+    values = await sample_values(prefix, sample)
+    source = "cache"
+    if not values:
+        if prefix == "result_render":
+            from app.bot.messages import ArabicMessages
+            text = ArabicMessages.format_exam_result_from_api(SYNTHETIC_RESULT)
+            values = [{"text": text}] * sample
+        else:
+            values = [SYNTHETIC_RESULT] * sample
+        source = "synthetic"
+    
+    report_prefix = f"layout_report_{prefix}"
+    string_keys = [f"{report_prefix}_s:{REPORT_BASE_EXAMNO + i}" for i in range(len(values))]
+    compact_keys = [f"{report_prefix}:{REPORT_BASE_EXAMNO + i}" for i in range(len(values))]
+    layout = CompactHashLayout(compress=settings.cache_compression)
+    raw_client = redis_cache.redis_raw or redis.from_url(settings.redis_url, decode_responses=False)
+    buckets = sorted({layout.bucket_for(key)[0] for key in compact_keys})
+    
+    try:
+        async with redis_cache.redis.pipeline(transaction=False) as pipe:
+            for key, value in zip(string_keys, values):
+                pipe.setex(key, ttl, json.dumps(value, ensure_ascii=False))
+            await pipe.execute()
+        
+        async with raw_client.pipeline(transaction=False) as pipe:
+            for key, value in zip(compact_keys, values):
+                layout.queue_set(pipe, key, value, ttl)
+            await pipe.execute()
+        
+        string_bytes = await memory_usage(string_keys)
+        compact_bytes = await memory_usage(buckets)
+        encoding = await redis_cache.redis.object("encoding", buckets[0])
+        
+        try:
+            listpack_value = (await redis_cache.redis.config_get("hash-max-listpack-value")).get("hash-max-listpack-value")
+        except Exception:
+            listpack_value = "unknown (CONFIG not permitted)"
+        
+        return {
+            "prefix": prefix,
+            "source": source,
+            "entries": len(values),
+            "string_bytes_per_entry": string_bytes / len(values),
+            "compact_bytes_per_entry": compact_bytes / len(values),
+            "saving": 1 - compact_bytes / string_bytes if string_bytes else 0.0,
+            "bucket_encoding": encoding,
+            "hash_max_listpack_value": listpack_value,
+            "compression": settings.cache_compression
+        }
+    finally:
+        await redis_cache.redis.delete(*string_keys, *buckets)
+        if raw_client is not redis_cache.redis_raw:
+            await raw_client.close()
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Compare cache memory per entry for string and compact layouts")
+    parser.add_argument("--prefix", default="result_render", help="Cache key prefix to sample")
+    parser.add_argument("--sample", type=int, default=1000, help="Entries to sample")
+    
+    args = parser.parse_args()
+    
+    logging.basicConfig(
+        level=getattr(logging, settings.log_level),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    async def run():
+        await redis_cache.connect()
+        if not redis_cache.redis:
+            logger.error("Redis is not available. Exiting.")
+            return
+        
+        try:
+            report = await build_report(args.prefix, args.sample)
+        finally:
+            await redis_cache.disconnect()
+        
+        print("\n" + "=" * 60)
+        print(f"CACHE MEMORY REPORT ({report['prefix']}, {report['entries']} {report['source']} entries)")
+        print("=" * 60)
+        print(f"String layout:  {report['string_bytes_per_entry']:.0f} bytes/entry")
+        print(f"Compact layout: {report['compact_bytes_per_entry']:.0f} bytes/entry")
+        print(f"Saving: {report['saving']:.1%}")
+        print(f"Bucket encoding: {report['bucket_encoding']} (hash-max-listpack-value: {report['hash_max_listpack_value']})")
+        print(f"Compression: {report['compression']}")
+        print("=" * 60)
+    
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
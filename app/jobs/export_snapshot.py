@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Export published results to a memory-mapped snapshot
+
+Writes students and exam_results into a compact binary file (sorted uint64
+exam numbers + offset-indexed records). Point RESULTS_SNAPSHOT_PATH at the
+file and every worker answers result lookups from the shared page cache
+with no database or Redis call. Re-running the export swaps the file
+atomically; workers pick up the new snapshot within a few seconds. A
+database error aborts the export before the file is replaced, so a partial
+snapshot is never published.
+
+Usage:
+    python -m app.jobs.export_snapshot /data/results.snapshot --batch-size 1000
+"""
+
+import argparse
+import logging
+import sys
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+from app.config import settings
+from app.database.snapshot import write_snapshot
+from app.database.supabase_client import supabase_client
+from app.utils.validation import ValidationUtils
+
+logger = logging.getLogger(__name__)
+
+
+def iter_snapshot_records(
+    batch_size: int = 1000,
+    include_missing_results: bool = False
+) -> Iterator[Tuple[str, Dict[str, Any], Optional[Dict[str, Any]]]]:
+    """Stream (examno, student, exam_result) records sorted by exam number; database errors propagate"""
+    after = None
+    exported = 0
+    
+    while True:
+        examnos = supabase_client.get_exam_numbers_page("students", after, batch_size, strict=True)
+        if not examnos:
+            return
+        after = examnos[-1]
+        
+        students = supabase_client.get_students_with_results(examnos, strict=True)
+        for examno in examnos:
+            student_data = students.get(examno)
+            if not student_data or not ValidationUtils.validate_exam_number(examno):
+                continue
+            
+            exam_result = student_data["exam_result"]
+            if not exam_result and not include_missing_results:
+                continue
+            
+            yield (
+                examno,
+                student_data["student"].model_dump(exclude_none=True),
+                exam_result.model_dump(exclude_none=True) if exam_result else None
+            )
+            exported += 1
+        
+        logger.info(f"Exported {exported} records (up to {after})")
+        
+        if len(examnos) < batch_size:
+            return
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Export exam results to a memory-mapped snapshot")
+    parser.add_argument("path", nargs="?", default=settings.results_snapshot_path, help="Snapshot file (default: RESULTS_SNAPSHOT_PATH)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Students fetched per batch")
+    parser.add_argument("--include-missing-results", action="store_true", help="Also export students without a result")
+    
+    args = parser.parse_args()
+    if not args.path:
+        parser.error("snapshot path is required (argument or RESULTS_SNAPSHOT_PATH)")
+    
+    logging.basicConfig(
+        level=getattr(logging, settings.log_level),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    start_time = time.time()
+    try:
+        count = write_snapshot(args.path, iter_snapshot_records(args.batch_size, args.include_missing_results))
+    except Exception as e:
+        logger.error(f"Snapshot export failed, {args.path} left unchanged: {e}")
+        sys.exit(1)
+    print(f"Wrote {count} records to {args.path} in {time.time() - start_time:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Pre-release cache warmer for exam results
+
+Streams exam numbers from the database in batches and fills the result and
+render caches before traffic arrives, so the first lookup of every student
+on results day is a Redis hit.
+
+Usage:
+    python -m app.jobs.warm_cache --batch-size 500 --concurrency 4
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional
+from app.config import settings
+from app.bot.result_service import result_service
+from app.database.supabase_client import supabase_client
+from app.external.cache import redis_cache, make_entry
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WarmupReport:
+    """Cache warm-up metrics"""
+    total: int = 0
+    already_cached: int = 0
+    warmed: int = 0
+    not_cacheable: int = 0
+    missing: int = 0
+    failed: int = 0
+    duration: float = 0.0
+    
+    @property
+    def hit_ratio(self) -> float:
+        """Share of exam numbers that were already cached before warming"""
+        return self.already_cached / self.total if self.total else 0.0
+    
+    @property
+    def rate(self) -> float:
+        """Exam numbers processed per second"""
+        return self.total / self.duration if self.duration else 0.0
+    
+    def summary(self) -> str:
+        """One-line report for logs and CLI output"""
+        return (
+            f"total={self.total} warmed={self.warmed} already_cached={self.already_cached} "
+            f"no_result={self.not_cacheable} missing={self.missing} failed={self.failed} "
+            f"hit_ratio={self.hit_ratio:.1%} rate={self.rate:.0f}/s duration={self.duration:.1f}s"
+        )
+
+
+class CacheWarmer:
+    """Fills exam result caches from the database with bounded concurrency"""
+    
+    # Attempts per page of exam numbers before the run is failed
+    PAGE_ATTEMPTS = 3
+    RETRY_DELAY_SECONDS = 2.0
+    
+    def __init__(
+        self,
+        batch_size: int = 500,
+        concurrency: int = 4,
+        api_concurrency: int = 10,
+        source: str = "students",
+        ttl: Optional[int] = None,
+        limit: Optional[int] = None,
+        force: bool = False
+    ):
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.source = source
+        self.ttl = ttl or settings.cache_ttl_seconds
+        self.limit = limit
+        self.force = force
+        self.report = WarmupReport()
+        self._api_semaphore = asyncio.Semaphore(api_concurrency)
+    
+    async def run(self) -> WarmupReport:
+        """Run the warm-up over all exam numbers; raises if the exam numbers cannot be read"""
+        start_time = time.time()
+        logger.info(f"Starting cache warm-up from '{self.source}' (batch={self.batch_size}, concurrency={self.concurrency})")
+        
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        workers = [asyncio.create_task(self._worker(queue, start_time)) for _ in range(self.concurrency)]
+        
+        try:
+            async for batch in self._iter_batches():
+                await queue.put(batch)
+        finally:
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        
+        self.report.duration = time.time() - start_time
+        logger.info(f"Cache warm-up complete: {self.report.summary()}")
+        return self.report
+    
+    async def _iter_batches(self) -> AsyncIterator[List[str]]:
+        """Stream exam numbers from the database using keyset pagination"""
+        after = None
+        produced = 0
+        
+        while True:
+            page_size = self.batch_size
+            if self.limit is not None:
+                page_size = min(page_size, self.limit - produced)
+                if page_size <= 0:
+                    return
+            
+            batch = await self._get_page(after, page_size)
+            if not batch:
+                return
+            
+            produced += len(batch)
+            after = batch[-1]
+            yield batch
+            
+            if len(batch) < page_size:
+                return
+    
+    async def _get_page(self, after: Optional[str], page_size: int) -> List[str]:
+        """Read one page of exam numbers, retrying database errors before giving up"""
+        for attempt in range(1, self.PAGE_ATTEMPTS + 1):
+            try:
+                return await asyncio.to_thread(
+                    supabase_client.get_exam_numbers_page, self.source, after, page_size, strict=True
+                )
+            except Exception as e:
+                if attempt == self.PAGE_ATTEMPTS:
+                    raise
+                logger.warning(f"⚠️ Reading exam numbers after {after} failed (attempt {attempt}/{self.PAGE_ATTEMPTS}): {e}")
+                await asyncio.sleep(self.RETRY_DELAY_SECONDS * attempt)
+    
+    async def _worker(self, queue: asyncio.Queue, start_time: float) -> None:
+        """Warm batches until the producer is done"""
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                return
+            
+            try:
+                await self._warm_batch(batch)
+            except Exception as e:
+                logger.error(f"Error warming batch starting at {batch[0]}: {e}")
+            
+            elapsed = time.time() - start_time
+            logger.info(
+                f"Warm-up progress: {self.report.total} processed, "
+                f"hit ratio {self.report.hit_ratio:.1%}, {self.report.total / max(elapsed, 0.001):.0f}/s"
+            )
+    
+    async def _warm_batch(self, examnos: List[str]) -> None:
+        """Render one batch of results and write them in a single pipeline"""
+        keys = [result_service.get_render_cache_key(examno) for examno in examnos]
+        cached = await redis_cache.exists_many(keys)
+        
+        self.report.total += len(examnos)
+        self.report.already_cached += sum(cached)
+        
+        pending = examnos if self.force else [n for n, hit in zip(examnos, cached) if not hit]
+        if not pending:
+            return
+        
+        try:
+            students = await asyncio.to_thread(supabase_client.get_students_with_results, pending, strict=True)
+        except Exception:
+            # A database error is not a missing student: count the batch as failed
+            self.report.failed += len(pending)
+            raise
+        self.report.missing += len(pending) - len(students)
+        
+        async def render(examno: str, student_data: dict) -> Optional[tuple]:
+            # Students without a DB result go through the (cached) external API
+            async with self._api_semaphore:
+                render_start = time.monotonic()
+                text, cacheable = await result_service.render_result(student_data)
+            return (examno, text, time.monotonic() - render_start) if cacheable else None
+        
+        rendered = await asyncio.gather(*(render(n, data) for n, data in students.items()))
+        
+        entries, ttls = {}, {}
+        for examno, text, compute_time in filter(None, rendered):
+            key = result_service.get_render_cache_key(examno)
+            # Jittered TTLs keep a warm-up's entries from expiring in one burst
+            entries[key], ttls[key] = make_entry({"text": text}, self.ttl, compute_time)
+        self.report.not_cacheable += len(students) - len(entries)
+        
+        if entries and await redis_cache.set_many(entries, ttls):
+            self.report.warmed += len(entries)
+
+
+async def warm_cache(**kwargs) -> WarmupReport:
+    """Run a cache warm-up with the given CacheWarmer options"""
+    return await CacheWarmer(**kwargs).run()
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Warm exam result caches before release")
+    parser.add_argument("--batch-size", type=int, default=500, help="Exam numbers per batch")
+    parser.add_argument("--concurrency", type=int, default=4, help="Batches processed in parallel")
+    parser.add_argument("--api-concurrency", type=int, default=10, help="Concurrent external API lookups")
+    parser.add_argument("--source", choices=["students", "exam_results"], default="students", help="Table to stream exam numbers from")
+    parser.add_argument("--ttl", type=int, default=None, help="Cache TTL in seconds (default: CACHE_TTL_SECONDS)")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many exam numbers")
+    parser.add_argument("--force", action="store_true", help="Re-render entries that are already cached")
+    
+    args = parser.parse_args()
+    
+    logging.basicConfig(
+        level=getattr(logging, settings.log_level),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    async def run():
+        await redis_cache.connect()
+        if not redis_cache.redis:
+            logger.error("Redis is not available. Exiting.")
+            return False
+        
+        try:
+            report = await warm_cache(
+                batch_size=args.batch_size,
+                concurrency=args.concurrency,
+                api_concurrency=args.api_concurrency,
+                source=args.source,
+                ttl=args.ttl,
+                limit=args.limit,
+                force=args.force
+            )
+            print(report.summary())
+            return not report.failed
+        except Exception as e:
+            logger.error(f"Cache warm-up failed: {e}")
+            return False
+        finally:
+            await redis_cache.disconnect()
+    
+    if not asyncio.run(run()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
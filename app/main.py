@@ -1,14 +1,26 @@
 import logging
 import asyncio
+import hmac
+import os
+import time
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Request, HTTPException, Header, Depends
+from fastapi.responses import JSONResponse, PlainTextResponse
 import uvicorn
 from app.config import settings
 from app.bot.handlers import TelegramBotManager
 from app.bot.single_interface_manager import SingleInterfaceBotManager
 from app.external.cache import redis_cache
+from app.external.najah_api import najah_api
+from app.external.retry_policy import retry_policies
 from app.database.supabase_client import supabase_client
+from app.database.snapshot import results_snapshot
+from app.database.analytics import analytics_buffer
+from app.external.rollups import usage_rollups
+from app.external.user_activity import user_activity
+from app.utils.traffic_capture import traffic_recorder
+from app.utils.loop_monitor import loop_monitor
+from app.utils.profiler import runtime_profiler, ProfilerBusy
 
 # Configure logging
 logging.basicConfig(
@@ -21,10 +33,11 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
-    logger.info("Starting Arabic Telegram Bot application...")
+    logger.info(f"Starting Arabic Telegram Bot application (pid {os.getpid()})...")
+    started = time.monotonic()
     
-    # Initialize Redis connection
-    await redis_cache.connect()
+    # Measure event-loop lag and report blocking calls from the start
+    await loop_monitor.start()
     
     # Initialize bot manager based on mode
     if settings.bot_mode == "single_interface":
@@ -34,19 +47,36 @@ async def lifespan(app: FastAPI):
         logger.info("🚀 Starting in MULTI-BOT mode")
         bot_manager = TelegramBotManager()
     
-    await bot_manager.initialize()
+    # Connect to Redis while the main bot starts; both mostly wait on the network
+    await asyncio.gather(redis_cache.connect(), bot_manager.initialize())
+    
+    # Start write-behind analytics, usage rollups and unique-user counts
+    await analytics_buffer.start()
+    await usage_rollups.start()
+    await user_activity.start()
+    
+    # Opt-in capture of webhook updates for replay tests
+    await traffic_recorder.start()
     
     # Store bot manager in app state
     app.state.bot_manager = bot_manager
     
-    logger.info("Application startup complete")
+    logger.info(f"Application startup complete in {time.monotonic() - started:.2f}s")
     
     yield
     
     # Cleanup
     logger.info("Shutting down application...")
-    await redis_cache.disconnect()
     await bot_manager.shutdown()
+    await loop_monitor.stop()
+    await traffic_recorder.stop()
+    
+    # Final flushes write through Redis, so disconnect only after them
+    await analytics_buffer.stop()
+    await usage_rollups.stop()
+    await user_activity.stop()
+    await redis_cache.disconnect()
+    results_snapshot.close()
     logger.info("Application shutdown complete")
 
 
@@ -113,13 +143,19 @@ async def health_check():
 @app.post("/webhook/{shard_id}")
 async def webhook_handler(shard_id: int, request: Request):
     """Handle incoming webhook requests"""
+    update_data = None
     try:
         if not hasattr(app.state, 'bot_manager'):
             raise HTTPException(status_code=503, detail="Bot manager not initialized")
         
         # Get request body
+        traffic_recorder.record(await request.body(), request.url.path)
         update_data = await request.json()
         
+        # A redelivered update may arrive at another worker
+        if not await redis_cache.claim_update(f"shard{shard_id}", update_data.get("update_id"), settings.update_dedup_ttl_seconds):
+            return {"status": "duplicate"}
+        
         # Process update through bot manager
         # In single bot mode, all webhooks route to the primary bot
         await app.state.bot_manager.process_update(shard_id, update_data)
@@ -128,23 +164,35 @@ async def webhook_handler(shard_id: int, request: Request):
     
     except Exception as e:
         logger.error(f"Error processing webhook for shard {shard_id}: {e}")
+        if isinstance(update_data, dict):
+            await redis_cache.release_update(f"shard{shard_id}", update_data.get("update_id"))
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
 @app.post("/webhook")
 async def webhook_handler_single(request: Request):
     """Handle incoming webhook requests for single interface mode"""
+    update_data = None
     try:
         if not hasattr(app.state, 'bot_manager'):
             raise HTTPException(status_code=503, detail="Bot manager not initialized")
         
         # Get request body
+        traffic_recorder.record(await request.body(), request.url.path)
         update_data = await request.json()
         
+        # A redelivered update may arrive at another worker
+        if not await redis_cache.claim_update("main", update_data.get("update_id"), settings.update_dedup_ttl_seconds):
+            return {"status": "duplicate"}
+        
         # Check if we're in single interface mode
-        if hasattr(app.state.bot_manager, 'process_update'):
+        if isinstance(app.state.bot_manager, SingleInterfaceBotManager):
             # Single interface mode - direct processing
-            await app.state.bot_manager.process_update(update_data)
+            webhook_reply = await app.state.bot_manager.process_update(update_data)
+            
+            # Telegram executes a Bot API call returned in the response body
+            if webhook_reply:
+                return webhook_reply
         else:
             # Fallback to traditional mode
             await app.state.bot_manager.process_update(0, update_data)
@@ -153,6 +201,8 @@ async def webhook_handler_single(request: Request):
     
     except Exception as e:
         logger.error(f"Error processing webhook: {e}")
+        if isinstance(update_data, dict):
+            await redis_cache.release_update("main", update_data.get("update_id"))
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
@@ -164,6 +214,18 @@ async def get_stats():
             return {"error": "Bot manager not initialized"}
         
         stats = await app.state.bot_manager.get_stats()
+        stats["cache"] = redis_cache.get_stats()
+        stats["najah_api"] = await najah_api.get_stats()
+        stats["telegram_retries"] = retry_policies["telegram"].get_stats()
+        stats["analytics"] = analytics_buffer.get_stats()
+        stats["traffic_capture"] = traffic_recorder.get_stats()
+        stats["event_loop"] = loop_monitor.get_stats()
+        stats["unique_users"] = await user_activity.get_counts()
+        stats["usage"] = {
+            "last_5_minutes": await usage_rollups.summary("m", 5),
+            "last_hour": await usage_rollups.summary("m", 60),
+            "last_24_hours": await usage_rollups.summary("h", 24)
+        }
         return stats
     
     except Exception as e:
@@ -171,6 +233,46 @@ async def get_stats():
         return {"error": str(e)}
 
 
+def require_admin_token(authorization: str = Header(default="")):
+    """Allow /admin requests carrying the ADMIN_API_TOKEN bearer token"""
+    if not settings.admin_api_token:
+        raise HTTPException(status_code=404, detail="Not found")
+    token = authorization.removeprefix("Bearer ").strip()
+    if not hmac.compare_digest(token.encode(), settings.admin_api_token.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+@app.get("/admin/profile", dependencies=[Depends(require_admin_token)])
+async def admin_profile(seconds: float = 10, interval_ms: float = settings.profiler_interval_ms, format: str = "collapsed"):
+    """Sample this worker for a while; collapsed loop stacks, await chains ("async") or a JSON summary"""
+    if format not in ("collapsed", "async", "json"):
+        raise HTTPException(status_code=400, detail="format must be collapsed, async or json")
+    
+    try:
+        result = await runtime_profiler.cpu(seconds, interval_ms / 1000)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    if format == "json":
+        return {"pid": os.getpid(), **result.to_dict()}
+    
+    stacks = result.stacks if format == "collapsed" else result.async_stacks
+    filename = f"profile-{format}-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}.folded"
+    return PlainTextResponse(
+        result.folded(stacks),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@app.get("/admin/memory", dependencies=[Depends(require_admin_token)])
+async def admin_memory(seconds: float = 30, top: int = 25, frames: int = 1):
+    """Allocation sites that grew the most in this worker during the window (seconds, top and frames are capped)"""
+    try:
+        return {"pid": os.getpid(), **await runtime_profiler.memory(seconds, top, frames)}
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Global exception handler"""
@@ -182,10 +284,14 @@ async def global_exception_handler(request: Request, exc: Exception):
 
 
 if __name__ == "__main__":
+    from app.serve import configure_access_log, server_options
+    
+    configure_access_log(settings.server_profile)
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
         port=8000,
         log_level=settings.log_level.lower(),
-        reload=settings.environment == "development"
+        reload=settings.environment == "development",
+        **server_options(settings.server_profile)
     )
\ No newline at end of file
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Multi-process server for the bot
+
+Pre-forks uvicorn workers so update processing (PTB, JSON, pydantic,
+formatting) uses every core. Each worker binds its own listening socket with
+SO_REUSEPORT and the kernel spreads new connections across them; where that
+option is missing, the supervisor binds one socket before forking and the
+workers share it. Nothing is connected before the fork: every worker runs
+the app's lifespan itself (Redis, bot managers, HTTP pools, background
+tasks). State shared between workers lives in Redis and the database only.
+
+The supervisor restarts workers that die and, on SIGTERM/SIGINT, asks them
+to shut down gracefully so they flush analytics and rollups before exiting.
+
+Runtime profiles (--profile or SERVER_PROFILE):
+    default      uvicorn defaults
+    performance  uvloop + httptools pinned, SERVER_BACKLOG listen backlog,
+                 SERVER_KEEPALIVE_SECONDS keep-alive, a fast 503 once a worker
+                 holds SERVER_LIMIT_CONCURRENCY connections/requests, and
+                 only ACCESS_LOG_SAMPLE_RATE of the access log (plus 5xx
+                 other than the 503s of load shedding)
+
+Usage:
+    python -m app.serve --workers 4 --port 8000
+    WEB_CONCURRENCY=8 python -m app.serve --profile performance
+    python -m app.serve --workers 0    # one worker per CPU in the affinity mask
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import time
+from typing import Any, Dict, Optional
+import uvicorn
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# A worker that exits sooner than this after starting counts as a crash loop
+MIN_WORKER_UPTIME = 10.0
+
+SERVER_PROFILES = ("default", "performance")
+
+
+class SampledAccessLog(logging.Filter):
+    """Keeps a random share of uvicorn access log lines and every 5xx except load-shedding 503s"""
+    
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        # uvicorn passes (client, method, path, http_version, status) as args
+        status = record.args[-1] if isinstance(record.args, tuple) and record.args else 0
+        return (isinstance(status, int) and status >= 500 and status != 503) or random.random() < self.rate
+
+
+def server_options(profile: str) -> Dict[str, Any]:
+    """uvicorn settings of a runtime profile"""
+    if profile == "default":
+        return {}
+    if profile == "performance":
+        return {
+            "loop": "uvloop",
+            "http": "httptools",
+            "backlog": settings.server_backlog,
+            "timeout_keep_alive": settings.server_keepalive_seconds,
+            "limit_concurrency": settings.server_limit_concurrency or None,
+            "access_log": settings.access_log_sample_rate > 0
+        }
+    raise ValueError(f"Unknown server profile: {profile}")
+
+
+def configure_access_log(profile: str):
+    """Sample the access log in the performance profile (filters survive uvicorn's logging setup)"""
+    rate = settings.access_log_sample_rate
+    if profile == "performance" and 0 < rate < 1:
+        logging.getLogger("uvicorn.access").addFilter(SampledAccessLog(rate))
+
+
+def available_cpus() -> int:
+    """CPUs this process may run on (the affinity mask, not every CPU of the host)"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def bind_socket(host: str, port: int, reuse_port: bool) -> socket.socket:
+    """Listening socket, optionally with SO_REUSEPORT"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(index: int, host: str, port: int, shared_socket: Optional[socket.socket], profile: str, options: Dict):
+    """Worker process: bind (or inherit) the socket and serve the app"""
+    os.environ["WORKER_INDEX"] = str(index)
+    # The supervisor handles Ctrl+C for the whole group; workers stop on its SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    
+    sock = shared_socket or bind_socket(host, port, reuse_port=True)
+    config = uvicorn.Config(
+        "app.main:app",
+        host=host,
+        port=port,
+        log_level=settings.log_level.lower(),
+        timeout_graceful_shutdown=int(settings.graceful_shutdown_seconds),
+        **server_options(profile),
+        **options
+    )
+    configure_access_log(profile)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Supervisor:
+    """Starts, restarts and stops the worker processes"""
+    
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        workers: int,
+        reuse_port: bool,
+        profile: str = "default",
+        options: Optional[Dict] = None
+    ):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.reuse_port = reuse_port
+        self.profile = profile
+        self.options = options or {}
+        
+        self._context = multiprocessing.get_context("fork")
+        self._processes: Dict[int, multiprocessing.Process] = {}
+        self._started_at: Dict[int, float] = {}
+        self._shared_socket: Optional[socket.socket] = None
+        self._should_exit = False
+        self.restarts = 0
+    
+    def _spawn(self, index: int):
+        process = self._context.Process(
+            target=run_worker,
+            args=(index, self.host, self.port, self._shared_socket, self.profile, self.options),
+            name=f"worker-{index}"
+        )
+        process.start()
+        self._processes[index] = process
+        self._started_at[index] = time.monotonic()
+        logger.info(f"👷 Worker {index} started (pid {process.pid})")
+    
+    def _handle_exit(self, signum, frame):
+        self._should_exit = True
+    
+    def run(self):
+        """Serve until SIGTERM/SIGINT"""
+        if not self.reuse_port:
+            self._shared_socket = bind_socket(self.host, self.port, reuse_port=False)
+        
+        signal.signal(signal.SIGTERM, self._handle_exit)
+        signal.signal(signal.SIGINT, self._handle_exit)
+        
+        mode = "SO_REUSEPORT" if self.reuse_port else "shared socket"
+        logger.info(f"🚀 Starting {self.workers} workers on {self.host}:{self.port} ({mode}, {self.profile} profile, supervisor pid {os.getpid()})")
+        for index in range(self.workers):
+            self._spawn(index)
+        
+        try:
+            while not self._should_exit:
+                time.sleep(0.5)
+                self._restart_dead_workers()
+        finally:
+            self.shutdown()
+    
+    def _restart_dead_workers(self):
+        for index, process in list(self._processes.items()):
+            if process.is_alive() or self._should_exit:
+                continue
+            
+            uptime = time.monotonic() - self._started_at[index]
+            logger.error(f"❌ Worker {index} (pid {process.pid}) exited with code {process.exitcode} after {uptime:.0f}s")
+            if uptime < MIN_WORKER_UPTIME:
+                # Crash loop (bad config, Redis URL, token...): slow down instead of spinning
+                time.sleep(MIN_WORKER_UPTIME - uptime)
+            self.restarts += 1
+            self._spawn(index)
+    
+    def shutdown(self):
+        """Ask workers to stop, then kill the ones that outlive the grace period"""
+        logger.info("Stopping workers...")
+        for process in self._processes.values():
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+        
+        deadline = time.monotonic() + settings.graceful_shutdown_seconds + 5
+        for process in self._processes.values():
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning(f"Worker pid {process.pid} did not stop in time; killing it")
+                process.kill()
+                process.join()
+        
+        if self._shared_socket:
+            self._shared_socket.close()
+        logger.info("All workers stopped")
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Run the bot with several worker processes")
+    parser.add_argument("--host", default="0.0.0.0", help="Bind address")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")), help="Bind port (default: $PORT or 8000)")
+    parser.add_argument("--workers", type=int, default=settings.web_concurrency, help="Worker processes (default: WEB_CONCURRENCY or 1, 0 = one per available CPU)")
+    parser.add_argument("--profile", choices=SERVER_PROFILES, default=settings.server_profile, help="Runtime profile (default: SERVER_PROFILE)")
+    parser.add_argument("--no-reuse-port", action="store_true", help="Share one socket instead of SO_REUSEPORT")
+    parser.add_argument("--proxy-headers", action="store_true", help="Trust X-Forwarded-* headers")
+    
+    args = parser.parse_args()
+    
+    logging.basicConfig(
+        level=getattr(logging, settings.log_level),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    workers = args.workers or available_cpus()
+    reuse_port = hasattr(socket, "SO_REUSEPORT") and not args.no_reuse_port
+    options = {"proxy_headers": args.proxy_headers}
+    
+    Supervisor(args.host, args.port, workers, reuse_port, args.profile, options).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Awaitable, TypeVar
+
+T = TypeVar("T")
+
+# Monotonic time by which the current update must be answered
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """The update's time budget ran out before a downstream call"""
+
+
+@contextmanager
+def deadline_scope(seconds: float):
+    """Give the enclosed work a time budget; nested scopes keep the earlier deadline"""
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def no_deadline():
+    """Run background work started from an update without the update's budget"""
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def time_remaining() -> Optional[float]:
+    """Seconds left in the current budget, or None when there is no deadline"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+async def run_with_deadline(awaitable: Awaitable[T]) -> T:
+    """Await within the remaining budget"""
+    remaining = time_remaining()
+    if remaining is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, max(remaining, 0))
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded("Update deadline exceeded")
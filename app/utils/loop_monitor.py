@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Optional, Dict, Any, Deque
+from app.config import settings
+from app.external.rollups import usage_rollups
+
+logger = logging.getLogger(__name__)
+
+
+class LoopMonitor:
+    """
+    Event-loop lag probe and slow-callback detector.
+    
+    A task sleeps for `interval` seconds in a loop; how much later than
+    planned it wakes up is the loop lag, i.e. how long ready callbacks had
+    to wait. Samples go to the usage rollups and a short in-process window.
+    A watchdog thread checks whether the probe is overdue by more than
+    `slow_threshold`; if so the loop is blocked right now, and the loop
+    thread's current stack is logged once per incident. Cost is one timer
+    per interval plus a thread waking every half threshold.
+    """
+    
+    def __init__(self, interval: float = 0.1, slow_threshold: float = 0.1, window: int = 600, enabled: bool = True):
+        self.interval = interval
+        self.slow_threshold = slow_threshold
+        self.enabled = enabled
+        
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        
+        # Written by the probe, read by the watchdog (plain attribute access is atomic)
+        self._expected_wakeup = 0.0
+        self._tick = 0
+        self._reported_tick = -1
+        
+        self.max_lag = 0.0
+        self.slow_callbacks = 0
+        self.last_slow: Optional[Dict[str, Any]] = None
+    
+    async def start(self):
+        """Start the probe task and the watchdog thread"""
+        if not self.enabled or self._task:
+            return
+        
+        self._loop_thread_id = threading.get_ident()
+        self._expected_wakeup = time.monotonic() + self.interval
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._probe())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(f"⏱️ Event loop monitor started (every {self.interval * 1000:.0f}ms, slow ≥ {self.slow_threshold * 1000:.0f}ms)")
+    
+    async def stop(self):
+        """Stop the probe and the watchdog"""
+        self._stopping.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog:
+            await asyncio.to_thread(self._watchdog.join, 1.0)
+            self._watchdog = None
+    
+    async def _probe(self):
+        while True:
+            self._expected_wakeup = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - self._expected_wakeup)
+            self._tick += 1
+            
+            self._samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            usage_rollups.record_loop_lag(lag * 1000, slow=lag >= self.slow_threshold)
+    
+    def _watch(self):
+        while not self._stopping.wait(self.slow_threshold / 2):
+            tick = self._tick
+            overdue = time.monotonic() - self._expected_wakeup
+            if overdue < self.slow_threshold or tick == self._reported_tick:
+                continue
+            
+            self._reported_tick = tick
+            self._report_blocked(overdue)
+    
+    def _report_blocked(self, overdue: float):
+        """Log what the loop thread is running while it is blocked"""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame else "(stack unavailable)"
+        
+        self.slow_callbacks += 1
+        self.last_slow = {
+            "blocked_ms": round(overdue * 1000, 1),
+            "at": time.time(),
+            "stack": stack[-4000:]
+        }
+        logger.warning(f"⚠️ Event loop blocked for {overdue * 1000:.0f}ms+ in pid {os.getpid()}; loop thread stack:\n{stack}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Lag over the recent window and blocked-loop incidents"""
+        samples = sorted(self._samples)
+        
+        def percentile(p: float) -> Optional[float]:
+            if not samples:
+                return None
+            return round(samples[min(len(samples) - 1, int(len(samples) * p / 100))] * 1000, 2)
+        
+        return {
+            "enabled": self.enabled,
+            "samples": len(samples),
+            "lag_ms": {"p50": percentile(50), "p99": percentile(99), "max": percentile(100)},
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+            "slow_callbacks": self.slow_callbacks,
+            "last_slow": self.last_slow
+        }
+
+
+# Global event loop monitor instance
+loop_monitor = LoopMonitor(
+    interval=settings.loop_monitor_interval_seconds,
+    slow_threshold=settings.loop_slow_callback_ms / 1000,
+    enabled=settings.loop_monitor_enabled
+)
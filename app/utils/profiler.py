@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilerBusy(RuntimeError):
+    """Another profile is already running in this worker"""
+
+
+def _code_label(code) -> str:
+    """Function name plus the last two path components of its file"""
+    path = code.co_filename.replace(os.sep, "/").rsplit("/", 2)[-2:]
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({'/'.join(path)})"
+
+
+def _fold_frame(frame) -> str:
+    """Stack of a frame, outermost first, as one collapsed-stack line"""
+    labels = []
+    while frame is not None:
+        labels.append(_code_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+def _await_chain(task: asyncio.Task) -> List[str]:
+    """Coroutines a task is suspended in, outermost first"""
+    chain = []
+    awaitable = task.get_coro()
+    while awaitable is not None and len(chain) < 100:
+        code = getattr(awaitable, "cr_code", None) or getattr(awaitable, "gi_code", None) or getattr(awaitable, "ag_code", None)
+        if code is None:
+            break
+        chain.append(_code_label(code))
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None) or getattr(awaitable, "ag_await", None)
+    return chain
+
+
+@dataclass
+class ProfileResult:
+    """Samples of the loop thread's stack and of every task's await chain"""
+    duration: float = 0.0
+    samples: int = 0
+    stacks: Counter = field(default_factory=Counter)
+    async_stacks: Counter = field(default_factory=Counter)
+    coroutines: Counter = field(default_factory=Counter)
+    
+    @property
+    def sample_seconds(self) -> float:
+        """Wall time one sample stands for"""
+        return self.duration / self.samples if self.samples else 0.0
+    
+    @staticmethod
+    def folded(stacks: Counter) -> str:
+        """Collapsed-stack text (flamegraph.pl, speedscope, inferno)"""
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+    
+    def top_coroutines(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Coroutines by task-seconds spent in them (including awaiting callees), and average tasks inside"""
+        return [
+            {
+                "coroutine": name,
+                "wall_seconds": round(count * self.sample_seconds, 3),
+                "avg_tasks": round(count / self.samples, 2)
+            }
+            for name, count in self.coroutines.most_common(limit)
+        ]
+    
+    def to_dict(self, limit: int = 20) -> Dict[str, Any]:
+        return {
+            "duration": round(self.duration, 3),
+            "samples": self.samples,
+            "top_stacks": [{"stack": stack, "samples": count} for stack, count in self.stacks.most_common(limit)],
+            "coroutines": self.top_coroutines(limit)
+        }
+
+
+class RuntimeProfiler:
+    """
+    On-demand sampling profiler and allocation diff for one worker.
+    
+    `cpu` instruments nothing. A SIGPROF timer samples the loop thread's
+    stack every `interval` seconds of CPU time; the handler runs in the loop
+    thread itself, so samples land on the code that is executing rather
+    than where it happens to release the GIL. A helper thread reads the
+    await chain of every pending task at the same rate, which gives wall
+    time per coroutine including time spent waiting on I/O. Off the main
+    thread (no signals), the helper thread samples the loop stack too.
+    
+    `memory` runs tracemalloc only for the requested window and returns the
+    allocation sites that grew the most. Only one profile runs at a time.
+    """
+    
+    # Bounds for memory reports: a deep traceback makes every allocation slower while tracing
+    MAX_TOP = 100
+    MAX_FRAMES = 25
+    
+    def __init__(self, interval: float = 0.005, max_seconds: float = 60.0):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self._running = False
+        self.profiles = 0
+    
+    def _claim(self, seconds: float) -> float:
+        if self._running:
+            raise ProfilerBusy("A profile is already running")
+        self._running = True
+        self.profiles += 1
+        return max(0.1, min(seconds, self.max_seconds))
+    
+    async def cpu(self, seconds: float, interval: Optional[float] = None) -> ProfileResult:
+        """Sample the event loop for `seconds`"""
+        seconds = self._claim(seconds)
+        interval = interval or self.interval
+        result = ProfileResult()
+        use_signal = threading.current_thread() is threading.main_thread() and hasattr(signal, "setitimer")
+        
+        def on_sample(signum, frame):
+            result.stacks[_fold_frame(frame)] += 1
+        
+        previous = None
+        try:
+            if use_signal:
+                previous = signal.signal(signal.SIGPROF, on_sample)
+                signal.setitimer(signal.ITIMER_PROF, interval, interval)
+            
+            loop = asyncio.get_running_loop()
+            logger.info(f"🔬 Sampling profiler running for {seconds:.0f}s")
+            await asyncio.to_thread(self._sample, result, loop, threading.get_ident(), seconds, interval, not use_signal)
+            return result
+        finally:
+            if use_signal:
+                signal.setitimer(signal.ITIMER_PROF, 0)
+                signal.signal(signal.SIGPROF, previous)
+            self._running = False
+    
+    def _sample(
+        self,
+        result: ProfileResult,
+        loop: asyncio.AbstractEventLoop,
+        thread_id: int,
+        seconds: float,
+        interval: float,
+        sample_stacks: bool
+    ):
+        started = time.monotonic()
+        deadline = started + seconds
+        
+        while time.monotonic() < deadline:
+            if sample_stacks:
+                frame = sys._current_frames().get(thread_id)
+                if frame is not None:
+                    result.stacks[_fold_frame(frame)] += 1
+                del frame
+            
+            try:
+                tasks = asyncio.all_tasks(loop)
+            except RuntimeError:
+                tasks = set()
+            for task in tasks:
+                chain = _await_chain(task)
+                if chain:
+                    result.async_stacks[";".join(chain)] += 1
+                    result.coroutines.update(set(chain))
+            
+            result.samples += 1
+            time.sleep(interval)
+        
+        result.duration = time.monotonic() - started
+    
+    async def memory(self, seconds: float, limit: int = 25, frames: int = 1) -> Dict[str, Any]:
+        """Allocation sites that grew the most during `seconds`"""
+        limit = max(1, min(limit, self.MAX_TOP))
+        frames = max(1, min(frames, self.MAX_FRAMES))
+        seconds = self._claim(seconds)
+        started_here = not tracemalloc.is_tracing()
+        try:
+            if started_here:
+                tracemalloc.start(frames)
+            logger.info(f"🔬 Tracing allocations for {seconds:.0f}s")
+            
+            before = await asyncio.to_thread(tracemalloc.take_snapshot)
+            await asyncio.sleep(seconds)
+            after = await asyncio.to_thread(tracemalloc.take_snapshot)
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            if started_here:
+                tracemalloc.stop()
+            self._running = False
+        
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>")]
+        key = "lineno" if frames == 1 else "traceback"
+        stats = await asyncio.to_thread(lambda: after.filter_traces(ignore).compare_to(before.filter_traces(ignore), key))
+        
+        return {
+            "duration": seconds,
+            "traced_kb": round(current / 1024, 1),
+            "peak_kb": round(peak / 1024, 1),
+            "top": [
+                {
+                    "location": "\n".join(stat.traceback.format()) if frames > 1 else f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                    "size_diff_kb": round(stat.size_diff / 1024, 1),
+                    "size_kb": round(stat.size / 1024, 1),
+                    "count_diff": stat.count_diff
+                }
+                for stat in stats[:limit]
+            ]
+        }
+
+
+# Global runtime profiler instance
+runtime_profiler = RuntimeProfiler(
+    interval=settings.profiler_interval_ms / 1000,
+    max_seconds=settings.profiler_max_seconds
+)
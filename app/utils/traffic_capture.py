@@ -0,0 +1,265 @@
+import asyncio
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import secrets
+import time
+from collections import deque
+from typing import Optional, Dict, Any, Deque, List, Tuple
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Personal fields removed from every user and chat object
+PERSONAL_FIELDS = ("first_name", "last_name", "username", "phone_number", "bio")
+
+# Free text fields whose words are replaced by keyed look-alikes
+TEXT_FIELDS = ("text", "caption")
+
+# Replies the bot matches literally (broadcast confirmation), kept as they are
+KEPT_REPLIES = ("إلغاء", "الغاء", "cancel", "تأكيد", "تاكيد", "موافق", "نعم", "confirm")
+
+ARABIC_LETTERS = "ابتثجحخدذرزسشصضطظعغفقكلمنهوي"
+LATIN_LETTERS = "abcdefghijklmnopqrstuvwxyz"
+WORD = re.compile(r"[^\W_]+")
+# Exam numbers inside callback data (share_<examno>); short numbers are pages
+LONG_NUMBER = re.compile(r"\d{6,}")
+
+
+class UpdateAnonymizer:
+    """Remaps Telegram user and chat IDs with a keyed hash, strips names and disguises message text"""
+    
+    def __init__(self, salt: str):
+        self._key = salt.encode()
+    
+    def remap_id(self, value: int) -> int:
+        """Same input and salt always give the same ID; the sign (user vs group) is kept"""
+        digest = hmac.new(self._key, str(abs(value)).encode(), hashlib.sha256).digest()
+        remapped = 1_000_000_000 + int.from_bytes(digest[:8], "big") % 9_000_000_000
+        return -remapped if value < 0 else remapped
+    
+    def _remap_text(self, value: str) -> str:
+        return hmac.new(self._key, value.encode(), hashlib.sha256).hexdigest()[:20]
+    
+    def _remap_word(self, match: re.Match) -> str:
+        """Keyed look-alike of a word: same length, digits stay digits, Arabic stays Arabic"""
+        word = match.group()
+        digest = hmac.new(self._key, word.encode(), hashlib.sha512).digest()
+        chars = []
+        for char, byte in zip(word, digest * (len(word) // len(digest) + 1)):
+            if char.isdigit():
+                chars.append(str(byte % 10))
+            elif "\u0600" <= char <= "\u06ff":
+                chars.append(ARABIC_LETTERS[byte % len(ARABIC_LETTERS)])
+            else:
+                chars.append(LATIN_LETTERS[byte % len(LATIN_LETTERS)])
+        return "".join(chars)
+    
+    def remap_message_text(self, text: str) -> str:
+        """
+        Disguise free text but keep the shape the handlers react to: commands
+        and confirmation replies stay, an exam number becomes a fake one of the
+        same length (the same number always maps to the same fake), and names
+        keep their word count, word lengths and script.
+        """
+        if text.strip() in KEPT_REPLIES:
+            return text
+        
+        command, separator, rest = text.partition(" ") if text.startswith("/") else ("", "", text)
+        return command + separator + WORD.sub(self._remap_word, rest)
+    
+    def anonymize(self, data: Any) -> Any:
+        """Anonymized copy of an update (or any part of one)"""
+        if isinstance(data, list):
+            return [self.anonymize(item) for item in data]
+        if not isinstance(data, dict):
+            return data
+        
+        # Users have is_bot, chats have type; bots are not personal and keep their IDs
+        is_person = ("is_bot" in data and not data["is_bot"]) or "type" in data
+        result = {}
+        for key, value in data.items():
+            if is_person and key in PERSONAL_FIELDS:
+                continue
+            if is_person and key == "id" and isinstance(value, int):
+                result[key] = self.remap_id(value)
+            elif key == "chat_instance" and isinstance(value, str):
+                result[key] = self._remap_text(value)
+            elif key in TEXT_FIELDS and isinstance(value, str):
+                result[key] = self.remap_message_text(value)
+            elif key in ("data", "callback_data") and isinstance(value, str):
+                # Callback data of the query and of the buttons echoed in its message
+                result[key] = LONG_NUMBER.sub(self._remap_word, value)
+            elif key == "contact" and isinstance(value, dict):
+                # Keep the contact (the filters route on it) without the person behind it
+                result[key] = {"phone_number": WORD.sub(self._remap_word, value.get("phone_number", "")), "first_name": ""}
+                if isinstance(value.get("user_id"), int):
+                    result[key]["user_id"] = self.remap_id(value["user_id"])
+            elif key in ("location", "venue") and isinstance(value, dict):
+                result[key] = {"latitude": 0.0, "longitude": 0.0}
+                if key == "venue":
+                    result[key] = {"location": result[key], "title": "", "address": ""}
+            else:
+                result[key] = self.anonymize(value)
+        return result
+
+
+def update_user_id(update: Dict[str, Any]) -> Optional[int]:
+    """ID of the user who sent an update, if any"""
+    for value in update.values():
+        if isinstance(value, dict) and isinstance(value.get("from"), dict):
+            return value["from"].get("id")
+    return None
+
+
+class TrafficRecorder:
+    """
+    Opt-in recorder of incoming webhook updates.
+    
+    `record` only appends the raw request body to an in-memory queue; a
+    background task anonymizes the queued updates and appends them to a
+    gzip-compressed JSONL file in a worker thread. Each line holds the
+    arrival time, the webhook path and the anonymized update. Users are
+    sampled by anonymous ID, so a sampled user's whole conversation is kept.
+    """
+    
+    def __init__(
+        self,
+        capture_dir: str = "traffic_capture",
+        salt: str = "",
+        sample_rate: float = 1.0,
+        max_bytes: int = 1024 * 1024 * 1024,
+        flush_interval: float = 1.0,
+        max_buffered: int = 50000,
+        enabled: bool = False
+    ):
+        self.capture_dir = capture_dir
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self.enabled = enabled
+        
+        if enabled and not salt:
+            logger.warning("TRAFFIC_CAPTURE_SALT is not set; user IDs will not match across workers or restarts")
+        self.anonymizer = UpdateAnonymizer(salt or secrets.token_hex(16))
+        
+        self.path: Optional[str] = None
+        self._file = None
+        self._pending: Deque[Tuple[float, str, bytes]] = deque()
+        self._task: Optional[asyncio.Task] = None
+        
+        self.recorded = 0
+        self.written = 0
+        self.sampled_out = 0
+        self.dropped = 0
+        self.bytes_written = 0
+    
+    def record(self, body: bytes, path: str) -> bool:
+        """Queue a raw webhook body; returns False if it was dropped"""
+        if not self.enabled or self.bytes_written >= self.max_bytes:
+            return False
+        if len(self._pending) >= self.max_buffered:
+            self.dropped += 1
+            return False
+        
+        self._pending.append((time.time(), path, body))
+        self.recorded += 1
+        return True
+    
+    async def start(self):
+        """Open a new capture file and start the writer task"""
+        if not self.enabled or self._task:
+            return
+        
+        os.makedirs(self.capture_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        self.path = os.path.join(self.capture_dir, f"updates-{stamp}-{os.getpid()}.jsonl.gz")
+        self._file = gzip.open(self.path, "at", encoding="utf-8")
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"🎥 Recording webhook traffic to {self.path} (sample rate {self.sample_rate})")
+    
+    async def stop(self):
+        """Stop the writer, write what is still queued and close the file"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        
+        if self._file:
+            await self.flush()
+            await asyncio.to_thread(self._file.close)
+            self._file = None
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error writing captured traffic: {e}")
+    
+    async def flush(self) -> int:
+        """Write queued updates; returns the number written"""
+        if not self._pending or not self._file:
+            return 0
+        batch = list(self._pending)
+        self._pending.clear()
+        return await asyncio.to_thread(self._write, batch)
+    
+    def _write(self, batch: List[Tuple[float, str, bytes]]) -> int:
+        written = 0
+        for ts, path, body in batch:
+            if self.bytes_written >= self.max_bytes:
+                self.dropped += 1
+                continue
+            try:
+                update = json.loads(body)
+            except ValueError:
+                continue
+            
+            update = self.anonymizer.anonymize(update)
+            user_id = update_user_id(update)
+            # Anonymous IDs are uniformly distributed, so this keeps whole users
+            if user_id is not None and self.sample_rate < 1 and (user_id % 10000) >= self.sample_rate * 10000:
+                self.sampled_out += 1
+                continue
+            
+            line = json.dumps({"ts": round(ts, 6), "path": path, "update": update}, ensure_ascii=False) + "\n"
+            self._file.write(line)
+            self.bytes_written += len(line)
+            written += 1
+        
+        self._file.flush()
+        self.written += written
+        return written
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Recorder counters"""
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "recorded": self.recorded,
+            "written": self.written,
+            "sampled_out": self.sampled_out,
+            "dropped": self.dropped,
+            "bytes_written": self.bytes_written,
+            "pending": len(self._pending)
+        }
+
+
+# Global traffic recorder instance
+traffic_recorder = TrafficRecorder(
+    capture_dir=settings.traffic_capture_dir,
+    salt=settings.traffic_capture_salt,
+    sample_rate=settings.traffic_capture_sample_rate,
+    max_bytes=settings.traffic_capture_max_bytes,
+    enabled=settings.traffic_capture_enabled
+)
@@ -4,6 +4,14 @@ from typing import Optional
 
 logger = logging.getLogger(__name__)
 
+# Compiled once at import; these run on every incoming message
+NON_DIGIT_PATTERN = re.compile(r'\D')
+DIGIT_PATTERN = re.compile(r'\d')
+ARABIC_NAME_PATTERN = re.compile(r'[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\s]+')
+DIACRITICS_PATTERN = re.compile(r'[\u064B-\u065F\u0670\u0640]')
+REPEATED_CHAR_PATTERN = re.compile(r'(.)\1{5,}')
+HTML_TAG_PATTERN = re.compile(r'<[^>]+>')
+
 
 class ValidationUtils:
     """Validation utilities for user inputs"""
@@ -34,7 +42,7 @@ class ValidationUtils:
             return None
         
         # Remove all non-digit characters
-        cleaned = re.sub(r'\D', '', examno.strip())
+        cleaned = NON_DIGIT_PATTERN.sub('', examno.strip())
         
         if ValidationUtils.validate_exam_number(cleaned):
             return cleaned
@@ -50,9 +58,7 @@ class ValidationUtils:
         name = name.strip()
         
         # Check if name contains Arabic characters
-        arabic_pattern = re.compile(r'[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\s]+')
-        
-        if not arabic_pattern.match(name):
+        if not ARABIC_NAME_PATTERN.match(name):
             return False
         
         # Name should be between 2 and 50 characters
@@ -75,6 +81,18 @@ class ValidationUtils:
         
         return None
     
+    @staticmethod
+    def normalize_arabic_name(name: str) -> Optional[str]:
+        """Normalize Arabic name for storage (drop diacritics and tatweel, collapse whitespace)"""
+        if not name:
+            return None
+        
+        # Remove tashkeel (harakat, tanween, shadda, sukun, dagger alef) and tatweel
+        normalized = DIACRITICS_PATTERN.sub('', name)
+        normalized = ' '.join(normalized.split())
+        
+        return normalized or None
+    
     @staticmethod
     def validate_governorate(gov_name: str, valid_governorates: list) -> bool:
         """Validate governorate selection"""
@@ -92,7 +110,7 @@ class ValidationUtils:
         text = text.strip()
         
         # Check for repeated characters (more than 5 in a row)
-        if re.search(r'(.)\1{5,}', text):
+        if REPEATED_CHAR_PATTERN.search(text):
             return True
         
         # Check for excessive length
@@ -100,7 +118,7 @@ class ValidationUtils:
             return True
         
         # Check for too many numbers in a name search
-        if len(re.findall(r'\d', text)) > len(text) * 0.7:
+        if len(DIGIT_PATTERN.findall(text)) > len(text) * 0.7:
             return True
         
         return False
@@ -113,7 +131,7 @@ class ValidationUtils:
         
         # Remove potentially harmful characters but keep Arabic
         # Remove HTML/XML tags
-        text = re.sub(r'<[^>]+>', '', text)
+        text = HTML_TAG_PATTERN.sub('', text)
         
         # Remove excessive whitespace
         text = ' '.join(text.split())
@@ -0,0 +1,149 @@
+"""
+Minimal microbenchmark harness
+
+Each benchmark is warmed up, calibrated to a loop count that runs for at least
+`min_time` seconds, then timed `repeat` times with the garbage collector off
+(as timeit does). The reported figure is the median per-call time; the
+min and the spread between repeats are kept so noisy runs are easy to spot.
+"""
+
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Dict, Any, List, Optional
+
+
+@dataclass
+class BenchmarkResult:
+    """Timing of one benchmark, in nanoseconds per call"""
+    name: str
+    loops: int
+    median_ns: float
+    min_ns: float
+    stdev_ns: float
+    
+    @property
+    def spread(self) -> float:
+        """Relative standard deviation between repeats"""
+        return self.stdev_ns / self.median_ns if self.median_ns else 0.0
+
+
+@dataclass
+class Comparison:
+    """One benchmark compared with its baseline"""
+    name: str
+    baseline_ns: float
+    current_ns: float
+    
+    @property
+    def ratio(self) -> float:
+        return self.current_ns / self.baseline_ns if self.baseline_ns else 0.0
+    
+    def status(self, threshold: float) -> str:
+        if self.ratio > 1 + threshold:
+            return "SLOWER"
+        if self.ratio < 1 - threshold:
+            return "faster"
+        return "same"
+
+
+@dataclass
+class BenchmarkSuite:
+    """A named set of zero-argument callables to time"""
+    repeat: int = 7
+    warmup: float = 0.1
+    min_time: float = 0.2
+    benchmarks: Dict[str, Callable[[], Any]] = field(default_factory=dict)
+    
+    def add(self, name: str, func: Callable[[], Any]):
+        self.benchmarks[name] = func
+    
+    def _time(self, func: Callable[[], Any], loops: int) -> float:
+        """Seconds for `loops` calls"""
+        iterations = range(loops)
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            for _ in iterations:
+                func()
+            return time.perf_counter() - start
+        finally:
+            if gc_enabled:
+                gc.enable()
+    
+    def _calibrate(self, func: Callable[[], Any]) -> int:
+        """Warm up, then find a loop count that takes at least min_time"""
+        deadline = time.perf_counter() + self.warmup
+        while time.perf_counter() < deadline:
+            func()
+        
+        loops = 1
+        while True:
+            elapsed = self._time(func, loops)
+            if elapsed >= self.min_time:
+                return loops
+            # Aim slightly past min_time so the next try usually succeeds
+            loops = max(loops * 2, int(loops * self.min_time * 1.2 / max(elapsed, 1e-9)))
+    
+    def run_one(self, name: str) -> BenchmarkResult:
+        func = self.benchmarks[name]
+        loops = self._calibrate(func)
+        samples = [self._time(func, loops) / loops * 1e9 for _ in range(self.repeat)]
+        return BenchmarkResult(
+            name=name,
+            loops=loops,
+            median_ns=statistics.median(samples),
+            min_ns=min(samples),
+            stdev_ns=statistics.stdev(samples) if len(samples) > 1 else 0.0
+        )
+    
+    def run(self, names: Optional[List[str]] = None) -> List[BenchmarkResult]:
+        return [self.run_one(name) for name in (names or self.benchmarks)]
+
+
+def environment() -> Dict[str, str]:
+    """Interpreter and machine details stored next to results"""
+    return {
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "platform": platform.platform()
+    }
+
+
+def save_results(path: str, results: List[BenchmarkResult]):
+    """Write results as a JSON baseline"""
+    data = {
+        "environment": environment(),
+        "results": {result.name: asdict(result) for result in results}
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def load_baseline(path: str) -> Dict[str, float]:
+    """Median ns per benchmark from a saved baseline"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return {name: result["median_ns"] for name, result in data["results"].items()}
+
+
+def compare(baseline: Dict[str, float], results: List[BenchmarkResult]) -> List[Comparison]:
+    """Pair current results with baseline entries of the same name"""
+    return [
+        Comparison(result.name, baseline[result.name], result.median_ns)
+        for result in results if result.name in baseline
+    ]
+
+
+def format_ns(value: float) -> str:
+    for unit, scale in (("ms", 1e6), ("us", 1e3)):
+        if value >= scale:
+            return f"{value / scale:.2f} {unit}"
+    return f"{value:.0f} ns"
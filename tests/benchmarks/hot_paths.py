@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the pure code run on every update
+
+Covers input validation, result formatting, keyboard builders and parsing
+Telegram updates, using realistic Arabic inputs and payloads.
+
+Usage:
+    python -m tests.benchmarks.hot_paths                          # compare with baseline.json
+    python -m tests.benchmarks.hot_paths --save tests/benchmarks/baseline.json
+    python -m tests.benchmarks.hot_paths --filter validation --check
+"""
+
+import argparse
+import os
+import sys
+from typing import Dict, Any, Callable
+from telegram import Update
+from app.bot.keyboards import ArabicKeyboards
+from app.bot.messages import ArabicMessages
+from app.database.models import Student, ExamResult
+from app.utils.validation import ValidationUtils
+from tests.benchmarks.harness import BenchmarkSuite, save_results, load_baseline, compare, format_ns
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+STUDENT = Student(
+    examno="272591110430082",
+    aname="محمد عبد الله حسين علي",
+    gov_name="الرصافة الأولى",
+    sch_name="إعدادية المستقبل للبنين",
+    sexcode="1"
+)
+
+EXAM_RESULT = ExamResult(
+    examno="272591110430082",
+    stucases="ناجح",
+    finalgrd="612",
+    finalrate="87.43",
+    **{
+        f"sub{i}_{field}": value
+        for i, name in enumerate(
+            ["التربية الإسلامية", "اللغة العربية", "اللغة الإنكليزية", "الرياضيات", "الفيزياء", "الكيمياء", "الأحياء"], 1
+        )
+        for field, value in (("name", name), ("score", str(70 + i * 3)), ("cscore", str(70 + i * 3)))
+    }
+)
+
+SEARCH_RESULTS = [
+    STUDENT.model_copy(update={"examno": f"2725911104300{i:02d}", "sch_name": f"ثانوية النور {i}"})
+    for i in range(10)
+]
+
+
+def message_update(text: str) -> Dict[str, Any]:
+    """Update payload for a private text message"""
+    user = {"id": 123456789, "is_bot": False, "first_name": "محمد", "username": "student_1", "language_code": "ar"}
+    return {
+        "update_id": 100000001,
+        "message": {
+            "message_id": 42,
+            "from": user,
+            "chat": {"id": 123456789, "first_name": "محمد", "username": "student_1", "type": "private"},
+            "date": 1752400000,
+            "text": text
+        }
+    }
+
+
+def callback_update(data: str) -> Dict[str, Any]:
+    """Update payload for an inline button press on a bot message"""
+    user = {"id": 123456789, "is_bot": False, "first_name": "محمد", "username": "student_1", "language_code": "ar"}
+    return {
+        "update_id": 100000002,
+        "callback_query": {
+            "id": "4382bfdwdsb323b2d9",
+            "from": user,
+            "chat_instance": "-8765432101234567890",
+            "data": data,
+            "message": {
+                "message_id": 43,
+                "from": {"id": 7000000001, "is_bot": True, "first_name": "نتائج", "username": "results_bot"},
+                "chat": {"id": 123456789, "first_name": "محمد", "username": "student_1", "type": "private"},
+                "date": 1752400001,
+                "text": "اختر طريقة البحث",
+                "reply_markup": ArabicKeyboards.main_menu().to_dict()
+            }
+        }
+    }
+
+
+MESSAGE_PAYLOAD = message_update("272591110430082")
+CALLBACK_PAYLOAD = callback_update("search_examno")
+
+BENCHMARKS: Dict[str, Callable[[], Any]] = {
+    "validation.clean_exam_number": lambda: ValidationUtils.clean_exam_number(" 2725-9111-0430-082 "),
+    "validation.clean_exam_number_invalid": lambda: ValidationUtils.clean_exam_number("رقمي 12345"),
+    "validation.clean_arabic_name": lambda: ValidationUtils.clean_arabic_name("  محمد   عبد الله  حسين "),
+    "validation.is_spam_input_name": lambda: ValidationUtils.is_spam_input("محمد عبد الله حسين"),
+    "validation.is_spam_input_examno": lambda: ValidationUtils.is_spam_input("272591110430082"),
+    "models.get_subjects_dict": EXAM_RESULT.get_subjects_dict,
+    "messages.format_exam_result": lambda: ArabicMessages.format_exam_result(STUDENT, EXAM_RESULT),
+    "keyboards.main_menu": ArabicKeyboards.main_menu,
+    "keyboards.governorates": ArabicKeyboards.governorates_keyboard,
+    "keyboards.student_results_10": lambda: ArabicKeyboards.student_results_keyboard(SEARCH_RESULTS),
+    "keyboards.result_actions": lambda: ArabicKeyboards.result_actions_keyboard(STUDENT.examno),
+    "telegram.de_json_message": lambda: Update.de_json(MESSAGE_PAYLOAD, None),
+    "telegram.de_json_callback_query": lambda: Update.de_json(CALLBACK_PAYLOAD, None),
+}
+
+
+def build_suite(repeat: int = 7, min_time: float = 0.2, name_filter: str = "") -> BenchmarkSuite:
+    """Suite of the hot-path benchmarks whose names contain `name_filter`"""
+    suite = BenchmarkSuite(repeat=repeat, min_time=min_time)
+    for name, func in BENCHMARKS.items():
+        if name_filter in name:
+            suite.add(name, func)
+    return suite
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Benchmark per-update hot-path functions")
+    parser.add_argument("--filter", default="", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=7, help="Timed repeats per benchmark")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per repeat")
+    parser.add_argument("--save", metavar="PATH", help="Write results as a new baseline")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change reported as faster/slower")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero if any benchmark got slower")
+    
+    args = parser.parse_args()
+    
+    suite = build_suite(args.repeat, args.min_time, args.filter)
+    results = []
+    for name in suite.benchmarks:
+        result = suite.run_one(name)
+        results.append(result)
+        noisy = "  (noisy)" if result.spread > 0.05 else ""
+        print(f"{name:<36} {format_ns(result.median_ns):>10}  min {format_ns(result.min_ns):>10}  ±{result.spread:.1%}{noisy}")
+    
+    if args.save:
+        save_results(args.save, results)
+        print(f"\nSaved baseline to {args.save}")
+        return
+    
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save to create one")
+        return
+    
+    print(f"\nCompared with {args.baseline} (threshold {args.threshold:.0%}):")
+    regressions = 0
+    for comparison in compare(load_baseline(args.baseline), results):
+        status = comparison.status(args.threshold)
+        regressions += status == "SLOWER"
+        print(
+            f"{comparison.name:<36} {format_ns(comparison.baseline_ns):>10} -> "
+            f"{format_ns(comparison.current_ns):>10}  x{comparison.ratio:.2f}  {status}"
+        )
+    
+    if args.check and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
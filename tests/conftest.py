@@ -0,0 +1,80 @@
+import pytest
+
+
+class FakeRedis:
+    """In-memory stand-in for the Redis hash, HyperLogLog and expiry commands used by the caches and counters"""
+    
+    def __init__(self):
+        self.hashes = {}
+        self.sets = {}
+        self.expiries = {}
+    
+    async def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+    
+    async def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field] = value
+        return 1
+    
+    async def hdel(self, key, *fields):
+        bucket = self.hashes.get(key, {})
+        return sum(1 for field in fields if bucket.pop(field, None) is not None)
+    
+    async def hincrby(self, key, field, value):
+        bucket = self.hashes.setdefault(key, {})
+        bucket[field] = bucket.get(field, 0) + value
+        return bucket[field]
+    
+    async def hgetall(self, key):
+        return {field: str(value) for field, value in self.hashes.get(key, {}).items()}
+    
+    async def pfadd(self, key, *values):
+        self.sets.setdefault(key, set()).update(values)
+        return 1
+    
+    async def pfcount(self, *keys):
+        return len(set().union(*[self.sets.get(key, set()) for key in keys]))
+    
+    async def expire(self, key, ttl, nx=False, gt=False):
+        # A key without a TTL counts as infinite for GT, like Redis 7
+        current = self.expiries.get(key)
+        if (nx and current is not None) or (gt and (current is None or ttl <= current)):
+            return False
+        self.expiries[key] = ttl
+        return True
+    
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Pipeline that queues commands and runs them in order on execute"""
+    
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *args):
+        return False
+    
+    def __getattr__(self, name):
+        command = getattr(self.client, name)
+        
+        def queue(*args, **kwargs):
+            self.commands.append((command, args, kwargs))
+            return self
+        return queue
+    
+    async def execute(self):
+        results = [await command(*args, **kwargs) for command, args, kwargs in self.commands]
+        self.commands = []
+        return results
+
+
+@pytest.fixture
+def fake_redis():
+    """Shared in-memory async Redis client"""
+    return FakeRedis()
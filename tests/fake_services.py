@@ -0,0 +1,531 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for the bot's external services, for offline benchmarks
+
+- Telegram Bot API: answers the methods the bot calls, records every send
+  and returns 429 with retry_after when a bot exceeds the global or
+  per-chat message rate
+- Najah results API: serves generated results with a configurable latency
+  and error profile (changeable at runtime through POST /_profile)
+- PostgREST: an in-memory implementation of the subset of the PostgREST
+  API used by supabase-py in this project, seeded with generated students
+
+Point the app at them with:
+    TELEGRAM_API_BASE_URL=http://127.0.0.1:8081/bot
+    NAJAH_API_BASE_URL=http://127.0.0.1:8082
+    SUPABASE_URL=http://127.0.0.1:8083 SUPABASE_KEY=fake
+Each service reports what it saw on GET /_stats.
+
+Usage:
+    python tests/fake_services.py --students 100000 --najah-latency-ms 300 --najah-error-rate 0.02
+"""
+
+import asyncio
+import argparse
+import json
+import logging
+import math
+import random
+import re
+import time
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Tuple
+from aiohttp import web
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+GOVERNORATES = ["بغداد", "البصرة", "نينوى", "كربلاء", "النجف", "بابل", "ذي قار", "ديالى", "الأنبار", "واسط"]
+FIRST_NAMES = ["محمد", "علي", "حسين", "أحمد", "عبدالله", "فاطمة", "زينب", "مريم", "حسن", "خديجة", "يوسف", "نور"]
+SUBJECTS = ["التربية الإسلامية", "اللغة العربية", "اللغة الإنجليزية", "الرياضيات", "الفيزياء", "الكيمياء", "الأحياء"]
+
+
+def exam_number(index: int) -> str:
+    """Exam number of the generated student `index`"""
+    return f"27259111{index:07d}"
+
+
+def generate_dataset(count: int, seed: int = 42) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Deterministic students and exam_results rows"""
+    rng = random.Random(seed)
+    students, results = [], []
+    for index in range(count):
+        examno = exam_number(index)
+        governorate = rng.choice(GOVERNORATES)
+        name = " ".join(rng.choice(FIRST_NAMES) for _ in range(3))
+        students.append({
+            "id": index + 1,
+            "examno": examno,
+            "aname": name,
+            "gov_name": governorate,
+            "gov_code": str(GOVERNORATES.index(governorate) + 1),
+            "sch_name": f"إعدادية {rng.choice(FIRST_NAMES)} {index % 400}",
+            "sch_code": str(index % 400),
+            "sexcode": rng.choice(["M", "F"]),
+            "accname": None
+        })
+        
+        result = {"examno": examno}
+        scores = [rng.randint(40, 100) for _ in SUBJECTS]
+        for i, (subject, score) in enumerate(zip(SUBJECTS, scores), start=1):
+            result[f"sub{i}_name"] = subject
+            result[f"sub{i}_score"] = str(score)
+            result[f"sub{i}_cscore"] = str(score)
+        result["finalgrd"] = str(sum(scores))
+        result["finalrate"] = f"{sum(scores) / len(scores):.2f}"
+        result["stucases"] = "ناجح" if min(scores) >= 50 else "مكمل"
+        results.append(result)
+    return students, results
+
+
+class TokenBucket:
+    """Token bucket; `take` returns 0 when allowed or the seconds to wait"""
+    
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+    
+    def take(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class FakeTelegramAPI:
+    """Bot API stand-in: /bot<token>/<method>"""
+    
+    RATE_LIMITED_PREFIXES = ("send", "edit", "copy", "forward")
+    
+    def __init__(self, global_rate: float = 30.0, chat_rate: float = 1.0, chat_burst: float = 3.0, latency_ms: float = 0.0):
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.latency_ms = latency_ms
+        self._global: Dict[str, TokenBucket] = {}
+        self._chats: Dict[Tuple[str, str], TokenBucket] = {}
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.rate_limited = 0
+        self.sent: List[Dict[str, Any]] = []
+        self.max_recorded = 10000
+        self.message_id = 0
+    
+    @staticmethod
+    async def _params(request: web.Request) -> Dict[str, Any]:
+        if request.content_type == "application/json":
+            return await request.json()
+        return dict(await request.post())
+    
+    def _check_rate(self, token: str, chat_id: str) -> float:
+        bucket = self._global.setdefault(token, TokenBucket(self.global_rate, self.global_rate))
+        wait = bucket.take()
+        if chat_id:
+            chat_bucket = self._chats.setdefault((token, chat_id), TokenBucket(self.chat_rate, self.chat_burst))
+            wait = max(wait, chat_bucket.take())
+        return wait
+    
+    def _message(self, params: Dict[str, Any], message_id: Optional[int] = None) -> Dict[str, Any]:
+        if message_id is None:
+            self.message_id += 1
+            message_id = self.message_id
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": int(params.get("chat_id", 0)), "type": "private"},
+            "text": params.get("text", "")
+        }
+    
+    async def handle(self, request: web.Request) -> web.Response:
+        token = request.match_info["token"]
+        method = request.match_info["method"]
+        params = await self._params(request)
+        self.calls[method] += 1
+        
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        
+        if method.startswith(self.RATE_LIMITED_PREFIXES):
+            wait = self._check_rate(token, str(params.get("chat_id", "")))
+            if wait:
+                self.rate_limited += 1
+                retry_after = max(1, math.ceil(wait))
+                return web.json_response({
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {retry_after}",
+                    "parameters": {"retry_after": retry_after}
+                }, status=429)
+            if len(self.sent) < self.max_recorded:
+                self.sent.append({"token": token[:10], "method": method, "chat_id": params.get("chat_id"), "at": time.time()})
+        
+        return web.json_response({"ok": True, "result": self._result(token, method, params)})
+    
+    def _result(self, token: str, method: str, params: Dict[str, Any]) -> Any:
+        if method == "getMe":
+            bot_id = int(token.split(":")[0]) if token.split(":")[0].isdigit() else 1
+            return {"id": bot_id, "is_bot": True, "first_name": "Fake Bot", "username": f"fake_{bot_id}_bot"}
+        if method == "getChatMember":
+            user_id = int(params.get("user_id", 0))
+            return {"status": "member", "user": {"id": user_id, "is_bot": False, "first_name": "User"}}
+        if method == "getWebhookInfo":
+            return {"url": "", "has_custom_certificate": False, "pending_update_count": 0}
+        if method.startswith("edit"):
+            return self._message(params, int(params.get("message_id", 0)) or None)
+        if method.startswith(("send", "copy", "forward")):
+            return self._message(params)
+        return True
+    
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "calls": self.calls,
+            "rate_limited": self.rate_limited,
+            "recorded_sends": len(self.sent),
+            "bots": len(self._global),
+            "chats": len(self._chats)
+        })
+    
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        app.router.add_get("/bot{token}/{method}", self.handle)
+        app.router.add_get("/_stats", self.stats)
+        return app
+
+
+class FakeNajahAPI:
+    """Results API stand-in: GET /exam-result/<examno>"""
+    
+    def __init__(self, results: Dict[str, Dict[str, Any]], latency_ms: float = 200.0, latency_sigma: float = 0.5,
+                 error_rate: float = 0.0, timeout_rate: float = 0.0, seed: int = 42):
+        self.results = results
+        self.profile = {
+            "latency_ms": latency_ms,
+            "latency_sigma": latency_sigma,
+            "error_rate": error_rate,
+            "timeout_rate": timeout_rate
+        }
+        self.rng = random.Random(seed)
+        self.responses: Dict[str, int] = defaultdict(int)
+    
+    async def exam_result(self, request: web.Request) -> web.Response:
+        profile = self.profile
+        roll = self.rng.random()
+        
+        if roll < profile["timeout_rate"]:
+            self.responses["timeout"] += 1
+            await asyncio.sleep(300)
+        
+        # Lognormal latency around the configured median
+        if profile["latency_ms"]:
+            await asyncio.sleep(self.rng.lognormvariate(math.log(profile["latency_ms"]), profile["latency_sigma"]) / 1000)
+        
+        if roll < profile["timeout_rate"] + profile["error_rate"]:
+            self.responses["503"] += 1
+            return web.json_response({"error": "service unavailable"}, status=503, headers={"Retry-After": "1"})
+        
+        result = self.results.get(request.match_info["exam_id"])
+        if not result:
+            self.responses["404"] += 1
+            return web.json_response({"error": "not found"}, status=404)
+        
+        self.responses["200"] += 1
+        return web.json_response(result)
+    
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok"})
+    
+    async def set_profile(self, request: web.Request) -> web.Response:
+        """Change latency/error rates mid-run, e.g. to simulate an outage"""
+        updates = await request.json()
+        self.profile.update({key: float(value) for key, value in updates.items() if key in self.profile})
+        logger.info(f"Najah profile: {self.profile}")
+        return web.json_response(self.profile)
+    
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({"profile": self.profile, "responses": self.responses})
+    
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/exam-result/{exam_id}", self.exam_result)
+        app.router.add_get("/health", self.health)
+        app.router.add_post("/_profile", self.set_profile)
+        app.router.add_get("/_stats", self.stats)
+        return app
+
+
+class FakePostgREST:
+    """
+    In-memory PostgREST: /rest/v1/<table>
+    
+    Supports select, eq/neq/gt/gte/lt/lte/like/ilike/in filters, order,
+    limit/offset, Prefer count=exact, insert, upsert (merge-duplicates on
+    the table's key), update and delete.
+    """
+    
+    PRIMARY_KEYS = {
+        "students": "examno",
+        "exam_results": "examno",
+        "user_sessions": "user_id",
+        "rate_limits": "user_id",
+        "analytics": "id"
+    }
+    RESERVED_PARAMS = {"select", "order", "limit", "offset", "columns", "on_conflict"}
+    
+    def __init__(self, tables: Dict[str, List[Dict[str, Any]]], latency_ms: float = 0.0):
+        self.tables: Dict[str, List[Dict[str, Any]]] = defaultdict(list, tables)
+        self.latency_ms = latency_ms
+        self.requests: Dict[str, int] = defaultdict(int)
+        self._indexes: Dict[str, Dict[Any, Dict[str, Any]]] = {}
+        self._next_id: Dict[str, int] = defaultdict(lambda: 1)
+        for table in list(self.tables):
+            self._reindex(table)
+    
+    def _reindex(self, table: str):
+        key = self.PRIMARY_KEYS.get(table)
+        if key:
+            self._indexes[table] = {row.get(key): row for row in self.tables[table]}
+    
+    @staticmethod
+    def _coerce(value: str, sample: Any) -> Any:
+        if isinstance(sample, bool):
+            return value == "true"
+        if isinstance(sample, int):
+            try:
+                return int(value)
+            except ValueError:
+                return value
+        if isinstance(sample, float):
+            return float(value)
+        return value
+    
+    @staticmethod
+    def _like(pattern: str, flags=0):
+        regex = "".join(".*" if ch in "%*" else re.escape(ch) for ch in pattern)
+        return re.compile(f"^{regex}$", flags | re.DOTALL)
+    
+    def _filters(self, request: web.Request) -> List[Tuple[str, str, str]]:
+        filters = []
+        for column, expression in request.query.items():
+            if column in self.RESERVED_PARAMS:
+                continue
+            operator, _, value = expression.partition(".")
+            filters.append((column, operator, value))
+        return filters
+    
+    def _matches(self, row: Dict[str, Any], filters: List[Tuple[str, str, str]]) -> bool:
+        for column, operator, value in filters:
+            actual = row.get(column)
+            if operator == "in":
+                values = [v.strip().strip('"') for v in value.strip("()").split(",")]
+                if str(actual) not in values:
+                    return False
+                continue
+            if operator == "is":
+                if (actual is None) != (value == "null"):
+                    return False
+                continue
+            if actual is None:
+                return False
+            if operator in ("like", "ilike"):
+                if not self._like(value, re.IGNORECASE if operator == "ilike" else 0).match(str(actual)):
+                    return False
+                continue
+            
+            expected = self._coerce(value, actual)
+            comparisons = {
+                "eq": actual == expected, "neq": actual != expected,
+                "gt": actual > expected, "gte": actual >= expected,
+                "lt": actual < expected, "lte": actual <= expected
+            }
+            if operator not in comparisons:
+                raise web.HTTPBadRequest(text=f"Unsupported operator {operator}")
+            if not comparisons[operator]:
+                return False
+        return True
+    
+    def _select(self, rows: List[Dict[str, Any]], select: str) -> List[Dict[str, Any]]:
+        if select in ("", "*"):
+            return [dict(row) for row in rows]
+        if select == "count":
+            return [{"count": len(rows)}]
+        columns = [column.strip() for column in select.split(",")]
+        return [{column: row.get(column) for column in columns} for row in rows]
+    
+    async def handle(self, request: web.Request) -> web.Response:
+        table = request.match_info["table"]
+        self.requests[f"{request.method} {table}"] += 1
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        
+        prefer = request.headers.get("Prefer", "")
+        filters = self._filters(request)
+        rows = self.tables[table]
+        
+        if request.method in ("GET", "HEAD"):
+            matched = [row for row in rows if self._matches(row, filters)]
+            for order in reversed(request.query.get("order", "").split(",")):
+                if order:
+                    column, _, direction = order.partition(".")
+                    matched.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=direction.startswith("desc"))
+            
+            total = len(matched)
+            offset = int(request.query.get("offset", 0))
+            limit = request.query.get("limit")
+            matched = matched[offset:offset + int(limit)] if limit else matched[offset:]
+            
+            headers = {}
+            if "count=exact" in prefer:
+                end = offset + len(matched) - 1
+                headers["Content-Range"] = f"{offset}-{end}/{total}" if matched else f"*/{total}"
+            return web.json_response(self._select(matched, request.query.get("select", "*")), headers=headers)
+        
+        if request.method == "POST":
+            body = await request.json()
+            new_rows = body if isinstance(body, list) else [body]
+            stored = [self._upsert(table, row, merge="merge-duplicates" in prefer) for row in new_rows]
+            return self._write_response(stored, prefer, status=201)
+        
+        if request.method == "PATCH":
+            changes = await request.json()
+            updated = [row for row in rows if self._matches(row, filters)]
+            for row in updated:
+                row.update(changes)
+            self._reindex(table)
+            return self._write_response(updated, prefer)
+        
+        if request.method == "DELETE":
+            deleted = [row for row in rows if self._matches(row, filters)]
+            self.tables[table] = [row for row in rows if not self._matches(row, filters)]
+            self._reindex(table)
+            return self._write_response(deleted, prefer)
+        
+        raise web.HTTPMethodNotAllowed(request.method, ["GET", "HEAD", "POST", "PATCH", "DELETE"])
+    
+    def _upsert(self, table: str, row: Dict[str, Any], merge: bool) -> Dict[str, Any]:
+        key = self.PRIMARY_KEYS.get(table)
+        if key == "id" and row.get("id") is None:
+            row = {**row, "id": self._next_id[table]}
+            self._next_id[table] += 1
+        
+        index = self._indexes.setdefault(table, {})
+        if key and row.get(key) in index:
+            if not merge:
+                raise web.HTTPConflict(
+                    text=json.dumps({"code": "23505", "message": "duplicate key value violates unique constraint"}),
+                    content_type="application/json"
+                )
+            index[row[key]].update(row)
+            return index[row[key]]
+        
+        stored = dict(row)
+        self.tables[table].append(stored)
+        if key:
+            index[stored.get(key)] = stored
+        return stored
+    
+    @staticmethod
+    def _write_response(rows: List[Dict[str, Any]], prefer: str, status: int = 200) -> web.Response:
+        if "return=minimal" in prefer:
+            return web.Response(status=204 if status == 200 else status)
+        return web.json_response(rows, status=status)
+    
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "requests": self.requests,
+            "rows": {table: len(rows) for table, rows in self.tables.items()}
+        })
+    
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_route("*", "/rest/v1/{table}", self.handle)
+        app.router.add_get("/_stats", self.stats)
+        return app
+
+
+def api_result(student: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+    """Najah API response shape for a generated student"""
+    subjects = {result[f"sub{i}_name"]: int(result[f"sub{i}_score"]) for i in range(1, len(SUBJECTS) + 1)}
+    return {
+        "examno": student["examno"],
+        "name": student["aname"],
+        "school": student["sch_name"],
+        "governorate": student["gov_name"],
+        "gender": "ذكر" if student["sexcode"] == "M" else "أنثى",
+        "subjects": subjects,
+        "total": sum(subjects.values()),
+        "average": result["finalrate"],
+        "status": result["stucases"]
+    }
+
+
+async def run_services(args) -> None:
+    """Start all fake services and run until interrupted"""
+    students, results = generate_dataset(args.students, seed=args.seed)
+    by_examno = {student["examno"]: student for student in students}
+    # Students beyond --db-results have no row in exam_results, so the bot falls back to the Najah API
+    db_results = results[:int(len(results) * args.db_results)]
+    najah_results = {result["examno"]: api_result(by_examno[result["examno"]], result) for result in results}
+    
+    services = [
+        ("Telegram Bot API", FakeTelegramAPI(args.telegram_rate, args.telegram_chat_rate, args.telegram_chat_burst, args.telegram_latency_ms).app(), args.telegram_port),
+        ("Najah API", FakeNajahAPI(najah_results, args.najah_latency_ms, args.najah_latency_sigma, args.najah_error_rate, args.najah_timeout_rate, args.seed).app(), args.najah_port),
+        ("PostgREST", FakePostgREST({"students": students, "exam_results": db_results}, args.db_latency_ms).app(), args.postgrest_port),
+    ]
+    
+    runners = []
+    for name, app, port in services:
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, args.host, port).start()
+        runners.append(runner)
+        logger.info(f"{name} listening on http://{args.host}:{port}")
+    
+    logger.info(f"Seeded {len(students)} students ({len(db_results)} with results in the database)")
+    logger.info(
+        f"Example: TELEGRAM_API_BASE_URL=http://{args.host}:{args.telegram_port}/bot "
+        f"NAJAH_API_BASE_URL=http://{args.host}:{args.najah_port} "
+        f"SUPABASE_URL=http://{args.host}:{args.postgrest_port} SUPABASE_KEY=fake"
+    )
+    
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for runner in runners:
+            await runner.cleanup()
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Run fake Telegram, Najah and PostgREST services for offline benchmarks")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--telegram-port", type=int, default=8081)
+    parser.add_argument("--najah-port", type=int, default=8082)
+    parser.add_argument("--postgrest-port", type=int, default=8083)
+    parser.add_argument("--students", type=int, default=10000, help="Generated students (exam numbers 27259111 + 7-digit index)")
+    parser.add_argument("--db-results", type=float, default=0.9, help="Share of students with a row in exam_results")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for data and error profiles")
+    parser.add_argument("--telegram-rate", type=float, default=30.0, help="Messages per second per bot before 429")
+    parser.add_argument("--telegram-chat-rate", type=float, default=1.0, help="Messages per second per chat before 429")
+    parser.add_argument("--telegram-chat-burst", type=float, default=3.0, help="Per-chat burst allowance")
+    parser.add_argument("--telegram-latency-ms", type=float, default=0.0, help="Added latency per Bot API call")
+    parser.add_argument("--najah-latency-ms", type=float, default=200.0, help="Median Najah API latency")
+    parser.add_argument("--najah-latency-sigma", type=float, default=0.5, help="Lognormal latency spread")
+    parser.add_argument("--najah-error-rate", type=float, default=0.0, help="Share of 503 responses")
+    parser.add_argument("--najah-timeout-rate", type=float, default=0.0, help="Share of requests that hang")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0, help="Added latency per PostgREST request")
+    
+    args = parser.parse_args()
+    
+    try:
+        asyncio.run(run_services(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,20 @@
 #!/usr/bin/env python3
 """
 Load testing script for Arabic Telegram Bot
-Simulates high-traffic scenarios up to 100K concurrent users
+
+Open-loop load generator: user sessions arrive at a fixed rate whether or
+not earlier requests have been answered, so a slow server shows up as
+higher latency instead of a lower request rate. Latency is measured from
+the time each request was scheduled (correcting for coordinated omission)
+and recorded in HDR-style histograms that are merged across processes.
+
+Usage:
+    python tests/load_test.py --url http://localhost:8000 --rate 200 --duration 300 --processes 4
+    python tests/load_test.py --mix examno=0.8,name=0.1,navigation=0.1 --json-out results.json
+
+Every update gets a fresh update_id, but the server drops update_ids it saw
+in the last UPDATE_DEDUP_TTL_SECONDS; set that to 0 on the target for
+benchmarks.
 """
 
 import asyncio
@@ -10,28 +23,136 @@ import time
 import random
 import json
 import logging
-from dataclasses import dataclass
-from typing import List, Dict, Any
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Tuple
 import argparse
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+SCENARIOS = ("examno", "name", "navigation")
+PERCENTILES = (50, 90, 99, 99.9)
+
 
 @dataclass
 class TestConfig:
     """Test configuration"""
     base_url: str = "http://localhost"
-    concurrent_users: int = 1000
-    requests_per_user: int = 10
+    rate: float = 100.0  # new user sessions per second, across all processes
     test_duration: int = 300  # seconds
-    ramp_up_time: int = 60   # seconds
+    ramp_up_time: int = 60   # seconds, excluded from the latency histograms
+    processes: int = 1
+    arrivals: str = "poisson"  # poisson or uniform inter-arrival times
+    scenario_mix: Dict[str, float] = None
+    request_timeout: float = 30.0
+    max_connections: int = 1000  # per process
+    drain_timeout: float = 30.0
+    exam_numbers: List[str] = None
+    seed: Optional[int] = None
     webhook_endpoints: List[str] = None
     
     def __post_init__(self):
         if self.webhook_endpoints is None:
-            self.webhook_endpoints = [f"/webhook/{i}" for i in range(5)]
+            # Single interface mode receives every update on one endpoint
+            self.webhook_endpoints = ["/webhook"]
+        if self.scenario_mix is None:
+            self.scenario_mix = {"examno": 0.7, "name": 0.2, "navigation": 0.1}
+
+
+class LatencyHistogram:
+    """
+    HDR-style latency histogram in microseconds.
+    
+    Values below 2**SUB_BUCKET_BITS are exact; above that each power of two is
+    split into 2**(SUB_BUCKET_BITS - 1) buckets, bounding the relative error
+    at under 1% with a few thousand buckets at most. Counts are kept sparse
+    so histograms are cheap to send between processes and merge by addition.
+    """
+    
+    SUB_BUCKET_BITS = 7
+    
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.total = 0
+        self.min = None
+        self.max = 0
+        self.sum = 0
+    
+    @classmethod
+    def _index(cls, value: int) -> int:
+        sub_buckets = 1 << cls.SUB_BUCKET_BITS
+        if value < sub_buckets:
+            return value
+        shift = value.bit_length() - cls.SUB_BUCKET_BITS
+        half = sub_buckets >> 1
+        return sub_buckets + (shift - 1) * half + ((value >> shift) - half)
+    
+    @classmethod
+    def _value(cls, index: int) -> int:
+        """Midpoint of a bucket"""
+        sub_buckets = 1 << cls.SUB_BUCKET_BITS
+        if index < sub_buckets:
+            return index
+        half = sub_buckets >> 1
+        shift = (index - sub_buckets) // half + 1
+        top = (index - sub_buckets) % half + half
+        return (top << shift) + (1 << (shift - 1))
+    
+    def record(self, value_us: int):
+        value_us = max(int(value_us), 0)
+        index = self._index(value_us)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.sum += value_us
+        self.max = max(self.max, value_us)
+        self.min = value_us if self.min is None else min(self.min, value_us)
+    
+    def merge(self, other: "LatencyHistogram"):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+    
+    def percentile(self, percentile: float) -> int:
+        """Value (us) at a percentile (0-100); the max is exact"""
+        if not self.total:
+            return 0
+        if percentile >= 100:
+            return self.max
+        rank = max(1, int(self.total * percentile / 100 + 0.5))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._value(index), self.max)
+        return self.max
+    
+    @property
+    def mean(self) -> float:
+        return self.sum / self.total if self.total else 0.0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {"counts": self.counts, "total": self.total, "min": self.min, "max": self.max, "sum": self.sum}
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LatencyHistogram":
+        histogram = cls()
+        histogram.counts = {int(index): count for index, count in data["counts"].items()}
+        histogram.total = data["total"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        histogram.sum = data["sum"]
+        return histogram
+    
+    def summary_ms(self) -> Dict[str, float]:
+        summary = {f"p{p:g}": round(self.percentile(p) / 1000, 2) for p in PERCENTILES}
+        summary["max"] = round(self.max / 1000, 2)
+        summary["mean"] = round(self.mean / 1000, 2)
+        return summary
 
 
 @dataclass
@@ -40,22 +161,72 @@ class TestResult:
     total_requests: int = 0
     successful_requests: int = 0
     failed_requests: int = 0
-    avg_response_time: float = 0.0
-    max_response_time: float = 0.0
-    min_response_time: float = float('inf')
-    errors: Dict[str, int] = None
+    sessions_started: int = 0
+    sessions_unfinished: int = 0
+    duration: float = 0.0
+    errors: Dict[str, int] = field(default_factory=dict)
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+    latency_by_step: Dict[str, LatencyHistogram] = field(default_factory=dict)
+    # How late the generator sent requests; if high, the client (not the server) was saturated
+    schedule_lag: LatencyHistogram = field(default_factory=LatencyHistogram)
     
-    def __post_init__(self):
-        if self.errors is None:
-            self.errors = {}
+    @property
+    def requests_per_second(self) -> float:
+        return self.total_requests / self.duration if self.duration else 0.0
+    
+    def merge(self, other: "TestResult"):
+        self.total_requests += other.total_requests
+        self.successful_requests += other.successful_requests
+        self.failed_requests += other.failed_requests
+        self.sessions_started += other.sessions_started
+        self.sessions_unfinished += other.sessions_unfinished
+        self.duration = max(self.duration, other.duration)
+        for error, count in other.errors.items():
+            self.errors[error] = self.errors.get(error, 0) + count
+        self.latency.merge(other.latency)
+        self.schedule_lag.merge(other.schedule_lag)
+        for step, histogram in other.latency_by_step.items():
+            self.latency_by_step.setdefault(step, LatencyHistogram()).merge(histogram)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total_requests": self.total_requests,
+            "successful_requests": self.successful_requests,
+            "failed_requests": self.failed_requests,
+            "sessions_started": self.sessions_started,
+            "sessions_unfinished": self.sessions_unfinished,
+            "duration": self.duration,
+            "errors": self.errors,
+            "latency": self.latency.to_dict(),
+            "latency_by_step": {step: histogram.to_dict() for step, histogram in self.latency_by_step.items()},
+            "schedule_lag": self.schedule_lag.to_dict()
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TestResult":
+        return cls(
+            total_requests=data["total_requests"],
+            successful_requests=data["successful_requests"],
+            failed_requests=data["failed_requests"],
+            sessions_started=data["sessions_started"],
+            sessions_unfinished=data["sessions_unfinished"],
+            duration=data["duration"],
+            errors=data["errors"],
+            latency=LatencyHistogram.from_dict(data["latency"]),
+            latency_by_step={step: LatencyHistogram.from_dict(h) for step, h in data["latency_by_step"].items()},
+            schedule_lag=LatencyHistogram.from_dict(data["schedule_lag"])
+        )
 
 
 class TelegramUpdateGenerator:
     """Generate realistic Telegram update payloads"""
     
-    def __init__(self):
+    def __init__(self, exam_numbers: Optional[List[str]] = None, worker_index: int = 0, workers: int = 1):
         self.user_id_counter = 10000
         self.message_id_counter = 1000
+        # Increasing update_ids, disjoint across processes and later runs (microsecond start time)
+        self.update_id_step = workers
+        self.update_id_counter = int(time.time() * 1_000_000) * workers + worker_index
         
         self.arabic_names = [
             "عبدالله أحمد", "فاطمة الزهراء", "محمد حسن",
@@ -63,20 +234,27 @@ class TelegramUpdateGenerator:
             "حسن عبدالله", "خديجة أحمد", "يوسف علي"
         ]
         
-        self.exam_numbers = [
+        self.exam_numbers = exam_numbers or [
             "272591110430082", "272591110430083", "272591110430084",
             "272591110430085", "272591110430086", "272591110430087"
         ]
     
-    def generate_start_command(self) -> Dict[str, Any]:
+    def next_update_id(self) -> int:
+        """Next update_id of this process"""
+        update_id = self.update_id_counter
+        self.update_id_counter += self.update_id_step
+        return update_id
+    
+    def generate_start_command(self, user_id: Optional[int] = None) -> Dict[str, Any]:
         """Generate /start command update"""
-        user_id = self.user_id_counter
-        self.user_id_counter += 1
+        if user_id is None:
+            user_id = self.user_id_counter
+            self.user_id_counter += 1
         message_id = self.message_id_counter
         self.message_id_counter += 1
         
         return {
-            "update_id": random.randint(100000, 999999),
+            "update_id": self.next_update_id(),
             "message": {
                 "message_id": message_id,
                 "from": {
@@ -109,7 +287,7 @@ class TelegramUpdateGenerator:
         self.message_id_counter += 1
         
         return {
-            "update_id": random.randint(100000, 999999),
+            "update_id": self.next_update_id(),
             "message": {
                 "message_id": message_id,
                 "from": {
@@ -133,7 +311,7 @@ class TelegramUpdateGenerator:
         self.message_id_counter += 1
         
         return {
-            "update_id": random.randint(100000, 999999),
+            "update_id": self.next_update_id(),
             "message": {
                 "message_id": message_id,
                 "from": {
@@ -154,9 +332,10 @@ class TelegramUpdateGenerator:
     def generate_callback_query(self, user_id: int, callback_data: str) -> Dict[str, Any]:
         """Generate callback query update"""
         return {
-            "update_id": random.randint(100000, 999999),
+            "update_id": self.next_update_id(),
             "callback_query": {
                 "id": str(random.randint(100000000000000000, 999999999999999999)),
+                "chat_instance": str(user_id),
                 "from": {
                     "id": user_id,
                     "is_bot": False,
@@ -183,168 +362,211 @@ class TelegramUpdateGenerator:
         }
 
 
+
+
 class LoadTester:
-    """Main load testing class"""
+    """Open-loop load generator for one process"""
     
-    def __init__(self, config: TestConfig):
+    def __init__(self, config: TestConfig, worker_index: int = 0):
         self.config = config
-        self.update_generator = TelegramUpdateGenerator()
+        self.worker_index = worker_index
+        self.update_generator = TelegramUpdateGenerator(config.exam_numbers, worker_index, config.processes)
         self.results = TestResult()
-        self.response_times = []
+        self.rate = config.rate / config.processes
+        self.scenarios = list(config.scenario_mix)
+        self.weights = [config.scenario_mix[name] for name in self.scenarios]
+        # Disjoint user ids per process so sessions never share state
+        self.next_user_id = 10000 + worker_index * 100_000_000
+        self._measure_from = 0.0
+    
+    def build_session(self, scenario: str, user_id: int) -> List[Tuple[str, float, Dict[str, Any]]]:
+        """Steps of a session as (step name, think time before it, update)"""
+        gen = self.update_generator
+        steps = [("start", 0.0, gen.generate_start_command(user_id))]
         
-    async def simulate_user_session(self, session: aiohttp.ClientSession, user_id: int) -> None:
-        """Simulate a complete user session"""
+        if scenario == "examno":
+            examno = gen.generate_examno_search(user_id)
+            steps += [
+                ("callback_search_examno", random.uniform(0.5, 1.5), gen.generate_callback_query(user_id, "search_examno")),
+                ("text_examno", random.uniform(2.0, 6.0), examno),
+            ]
+            if random.random() < 0.2:
+                share = f"share_{examno['message']['text']}"
+                steps.append(("callback_share", random.uniform(1.0, 3.0), gen.generate_callback_query(user_id, share)))
+        elif scenario == "name":
+            steps += [
+                ("callback_search_name", random.uniform(0.5, 1.5), gen.generate_callback_query(user_id, "search_name")),
+                ("text_name", random.uniform(2.0, 6.0), gen.generate_name_search(user_id)),
+                ("callback_governorate", random.uniform(1.0, 2.0), gen.generate_callback_query(user_id, "gov_كربلاء")),
+                ("callback_select_student", random.uniform(1.0, 3.0), gen.generate_callback_query(
+                    user_id, f"select_student_{random.choice(gen.exam_numbers)}"
+                )),
+            ]
+        else:
+            steps += [
+                ("callback_main_menu", random.uniform(0.5, 2.0), gen.generate_callback_query(user_id, "main_menu")),
+                ("callback_check_subscription", random.uniform(0.5, 2.0), gen.generate_callback_query(user_id, "check_subscription")),
+                ("callback_main_menu", random.uniform(0.5, 2.0), gen.generate_callback_query(user_id, "main_menu")),
+            ]
+        return steps
+    
+    def _next_arrival(self, offset: float) -> float:
+        """Offset of the next session arrival; the rate ramps up linearly"""
+        ramp = self.config.ramp_up_time
+        rate = self.rate * (min(1.0, max(offset / ramp, 0.05)) if ramp else 1.0)
+        if self.config.arrivals == "uniform":
+            return offset + 1.0 / rate
+        return offset + random.expovariate(rate)
+    
+    async def simulate_user_session(self, session: aiohttp.ClientSession, user_id: int, scenario: str) -> None:
+        """Simulate a complete user session; each step waits for the previous reply"""
+        loop = asyncio.get_running_loop()
+        scheduled = loop.time()
         try:
-            # 1. Start command
-            await self.send_update(session, self.update_generator.generate_start_command())
-            await asyncio.sleep(random.uniform(0.5, 2.0))
-            
-            # 2. Random search type
-            if random.choice([True, False]):
-                # Name search flow
-                await self.send_update(session, self.update_generator.generate_callback_query(user_id, "search_name"))
-                await asyncio.sleep(random.uniform(0.5, 1.5))
-                
-                await self.send_update(session, self.update_generator.generate_name_search(user_id))
-                await asyncio.sleep(random.uniform(1.0, 3.0))
-                
-                # Select governorate
-                await self.send_update(session, self.update_generator.generate_callback_query(user_id, "gov_كربلاء"))
-                await asyncio.sleep(random.uniform(1.0, 2.0))
-            else:
-                # Exam number search flow
-                await self.send_update(session, self.update_generator.generate_callback_query(user_id, "search_examno"))
-                await asyncio.sleep(random.uniform(0.5, 1.5))
-                
-                await self.send_update(session, self.update_generator.generate_examno_search(user_id))
-                await asyncio.sleep(random.uniform(2.0, 4.0))  # Longer for API call
-            
+            for step, think_time, update in self.build_session(scenario, user_id):
+                scheduled += think_time
+                delay = scheduled - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await self.send_update(session, step, update, scheduled)
+                scheduled = loop.time()
         except Exception as e:
             logger.error(f"Error in user session {user_id}: {e}")
     
-    async def send_update(self, session: aiohttp.ClientSession, update_data: Dict[str, Any]) -> None:
-        """Send a single update to the bot"""
-        start_time = time.time()
+    async def send_update(self, session: aiohttp.ClientSession, step: str, update_data: Dict[str, Any], scheduled: float) -> None:
+        """Send a single update; latency counts from the scheduled time, not the actual send"""
+        loop = asyncio.get_running_loop()
+        measured = scheduled >= self._measure_from
+        if measured:
+            self.results.schedule_lag.record((loop.time() - scheduled) * 1_000_000)
+        
+        user_id = update_data.get("message", {}).get("from", {}).get("id") or \
+            update_data.get("callback_query", {}).get("from", {}).get("id", 0)
+        endpoint = self.config.webhook_endpoints[user_id % len(self.config.webhook_endpoints)]
+        error = None
         
         try:
-            # Choose random shard based on user ID
-            user_id = update_data.get("message", {}).get("from", {}).get("id") or \
-                     update_data.get("callback_query", {}).get("from", {}).get("id", 0)
-            
-            shard_id = user_id % len(self.config.webhook_endpoints)
-            endpoint = self.config.webhook_endpoints[shard_id]
-            url = f"{self.config.base_url}{endpoint}"
-            
             async with session.post(
-                url,
+                f"{self.config.base_url}{endpoint}",
                 json=update_data,
-                timeout=aiohttp.ClientTimeout(total=10)
+                timeout=aiohttp.ClientTimeout(total=self.config.request_timeout)
             ) as response:
-                response_time = time.time() - start_time
-                self.response_times.append(response_time)
-                
-                if response.status == 200:
-                    self.results.successful_requests += 1
-                else:
-                    self.results.failed_requests += 1
-                    error_key = f"HTTP_{response.status}"
-                    self.results.errors[error_key] = self.results.errors.get(error_key, 0) + 1
-                
-                self.results.total_requests += 1
-                
+                await response.read()
+                if response.status != 200:
+                    error = f"HTTP_{response.status}"
         except asyncio.TimeoutError:
-            response_time = time.time() - start_time
-            self.results.failed_requests += 1
-            self.results.errors["TIMEOUT"] = self.results.errors.get("TIMEOUT", 0) + 1
-            self.results.total_requests += 1
-            
+            error = "TIMEOUT"
         except Exception as e:
-            response_time = time.time() - start_time
+            error = f"ERROR_{type(e).__name__}"
+        
+        if not measured:
+            return
+        
+        latency_us = (loop.time() - scheduled) * 1_000_000
+        self.results.total_requests += 1
+        if error:
             self.results.failed_requests += 1
-            error_key = f"ERROR_{type(e).__name__}"
-            self.results.errors[error_key] = self.results.errors.get(error_key, 0) + 1
-            self.results.total_requests += 1
+            self.results.errors[error] = self.results.errors.get(error, 0) + 1
+        else:
+            self.results.successful_requests += 1
+        self.results.latency.record(latency_us)
+        self.results.latency_by_step.setdefault(step, LatencyHistogram()).record(latency_us)
     
     async def run_load_test(self) -> TestResult:
-        """Run the complete load test"""
-        logger.info(f"Starting load test with {self.config.concurrent_users} concurrent users")
-        logger.info(f"Test duration: {self.config.test_duration} seconds")
-        logger.info(f"Ramp-up time: {self.config.ramp_up_time} seconds")
-        
-        # Create connector with appropriate limits
+        """Start sessions on schedule until the test duration is over"""
+        loop = asyncio.get_running_loop()
         connector = aiohttp.TCPConnector(
-            limit=self.config.concurrent_users * 2,
-            limit_per_host=self.config.concurrent_users * 2,
+            limit=self.config.max_connections,
+            limit_per_host=self.config.max_connections,
             keepalive_timeout=30
         )
         
         async with aiohttp.ClientSession(connector=connector) as session:
-            tasks = []
+            start = loop.time()
+            self._measure_from = start + self.config.ramp_up_time
+            end = start + self.config.test_duration
+            tasks = set()
+            offset = 0.0
             
-            # Ramp up users gradually
-            users_per_interval = self.config.concurrent_users // 10
-            interval = self.config.ramp_up_time / 10
-            
-            for batch in range(10):
-                batch_start_user_id = batch * users_per_interval + 10000
-                
-                # Create tasks for this batch
-                for i in range(users_per_interval):
-                    user_id = batch_start_user_id + i
-                    task = asyncio.create_task(
-                        self.simulate_user_session(session, user_id)
-                    )
-                    tasks.append(task)
+            while start + offset < end:
+                delay = start + offset - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
                 
-                logger.info(f"Started batch {batch + 1}/10 ({len(tasks)} total users)")
-                
-                if batch < 9:  # Don't sleep after the last batch
-                    await asyncio.sleep(interval)
+                scenario = random.choices(self.scenarios, self.weights)[0]
+                task = asyncio.create_task(self.simulate_user_session(session, self.next_user_id, scenario))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                self.next_user_id += 1
+                self.results.sessions_started += 1
+                offset = self._next_arrival(offset)
             
-            # Wait for all tasks to complete or timeout
-            try:
-                await asyncio.wait_for(
-                    asyncio.gather(*tasks, return_exceptions=True),
-                    timeout=self.config.test_duration
-                )
-            except asyncio.TimeoutError:
-                logger.warning("Test timed out, cancelling remaining tasks")
-                for task in tasks:
-                    if not task.done():
-                        task.cancel()
-        
-        # Calculate final metrics
-        if self.response_times:
-            self.results.avg_response_time = sum(self.response_times) / len(self.response_times)
-            self.results.max_response_time = max(self.response_times)
-            self.results.min_response_time = min(self.response_times)
+            # Sessions still running when the schedule ends get a grace period
+            if tasks:
+                done, pending = await asyncio.wait(set(tasks), timeout=self.config.drain_timeout)
+                for task in pending:
+                    task.cancel()
+                self.results.sessions_unfinished = len(pending)
         
+        self.results.duration = max(self.config.test_duration - self.config.ramp_up_time, 0) or self.config.test_duration
         return self.results
+
+
+def _run_worker(config: TestConfig, worker_index: int) -> Dict[str, Any]:
+    """Process entry point: run one generator and return its picklable results"""
+    if config.seed is not None:
+        random.seed(config.seed + worker_index)
+    tester = LoadTester(config, worker_index)
+    return asyncio.run(tester.run_load_test()).to_dict()
+
+
+def run_distributed(config: TestConfig) -> TestResult:
+    """Split the arrival rate over processes and merge their histograms"""
+    logger.info(
+        f"Starting open-loop load test: {config.rate} sessions/s over {config.processes} process(es), "
+        f"{config.test_duration}s with {config.ramp_up_time}s ramp-up"
+    )
+    if config.processes == 1:
+        return TestResult.from_dict(_run_worker(config, 0))
     
-    def print_results(self) -> None:
-        """Print test results"""
-        print("\n" + "="*60)
-        print("LOAD TEST RESULTS")
-        print("="*60)
-        print(f"Total Requests: {self.results.total_requests}")
-        print(f"Successful Requests: {self.results.successful_requests}")
-        print(f"Failed Requests: {self.results.failed_requests}")
-        print(f"Success Rate: {(self.results.successful_requests / max(self.results.total_requests, 1)) * 100:.2f}%")
-        print(f"Average Response Time: {self.results.avg_response_time:.3f}s")
-        print(f"Max Response Time: {self.results.max_response_time:.3f}s")
-        print(f"Min Response Time: {self.results.min_response_time:.3f}s")
-        
-        if self.results.errors:
-            print("\nERRORS:")
-            for error, count in self.results.errors.items():
-                print(f"  {error}: {count}")
-        
-        # Performance metrics
-        total_time = self.config.test_duration
-        requests_per_second = self.results.total_requests / total_time
-        print(f"\nRequests per second: {requests_per_second:.2f}")
-        
-        print("="*60)
+    results = TestResult()
+    with ProcessPoolExecutor(max_workers=config.processes) as executor:
+        futures = [executor.submit(_run_worker, config, index) for index in range(config.processes)]
+        for future in futures:
+            results.merge(TestResult.from_dict(future.result()))
+    return results
+
+
+def print_results(results: TestResult) -> None:
+    """Print test results"""
+    print("\n" + "="*60)
+    print("LOAD TEST RESULTS")
+    print("="*60)
+    print(f"Sessions Started: {results.sessions_started} ({results.sessions_unfinished} unfinished)")
+    print(f"Total Requests: {results.total_requests}")
+    print(f"Successful Requests: {results.successful_requests}")
+    print(f"Failed Requests: {results.failed_requests}")
+    print(f"Success Rate: {(results.successful_requests / max(results.total_requests, 1)) * 100:.2f}%")
+    print(f"Requests per second: {results.requests_per_second:.2f}")
+    
+    header = "".join(f"{name:>10}" for name in list(results.latency.summary_ms()))
+    print(f"\n{'LATENCY (ms)':<30}{header}")
+    rows = [("all", results.latency)] + sorted(results.latency_by_step.items())
+    for name, histogram in rows:
+        values = "".join(f"{value:>10.1f}" for value in histogram.summary_ms().values())
+        print(f"  {name:<28}{values}")
+    
+    lag = results.schedule_lag.summary_ms()
+    print(f"\nGenerator schedule lag: p99 {lag['p99']:.1f}ms, max {lag['max']:.1f}ms")
+    if lag["p99"] > 50:
+        print("  WARNING: the load generator fell behind; add --processes or machines")
+    
+    if results.errors:
+        print("\nERRORS:")
+        for error, count in results.errors.items():
+            print(f"  {error}: {count}")
+    
+    print("="*60)
 
 
 async def run_health_check(base_url: str) -> bool:
@@ -364,41 +586,79 @@ async def run_health_check(base_url: str) -> bool:
         return False
 
 
+def parse_mix(value: str) -> Dict[str, float]:
+    """Parse a scenario mix like examno=0.7,name=0.2,navigation=0.1"""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"Unknown scenario {name!r}, expected one of {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
 def main():
     """Main function"""
-    parser = argparse.ArgumentParser(description="Load test Arabic Telegram Bot")
+    parser = argparse.ArgumentParser(description="Open-loop load test for Arabic Telegram Bot")
     parser.add_argument("--url", default="http://localhost", help="Base URL of the service")
-    parser.add_argument("--users", type=int, default=1000, help="Number of concurrent users")
+    parser.add_argument("--rate", type=float, default=100.0, help="New user sessions per second")
     parser.add_argument("--duration", type=int, default=300, help="Test duration in seconds")
-    parser.add_argument("--rampup", type=int, default=60, help="Ramp-up time in seconds")
+    parser.add_argument("--rampup", type=int, default=60, help="Ramp-up time in seconds (not measured)")
+    parser.add_argument("--processes", type=int, default=1, help="Generator processes")
+    parser.add_argument("--mix", type=parse_mix, default=None, help="Scenario mix, e.g. examno=0.7,name=0.2,navigation=0.1")
+    parser.add_argument("--arrivals", choices=["poisson", "uniform"], default="poisson", help="Inter-arrival distribution")
+    parser.add_argument("--shards", type=int, default=0, help="Spread updates over /webhook/0..N-1 (multi_bot mode); 0 uses /webhook")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Request timeout in seconds")
+    parser.add_argument("--connections", type=int, default=1000, help="Max connections per process")
+    parser.add_argument("--exam-numbers", help="File with one exam number per line to look up")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for reproducible runs")
+    parser.add_argument("--json-out", help="Write merged results (with histograms) to this file")
     parser.add_argument("--skip-health", action="store_true", help="Skip health check")
     
     args = parser.parse_args()
     
+    exam_numbers = None
+    if args.exam_numbers:
+        with open(args.exam_numbers, encoding="utf-8") as f:
+            exam_numbers = [line.strip() for line in f if line.strip()]
+    
     config = TestConfig(
         base_url=args.url,
-        concurrent_users=args.users,
+        rate=args.rate,
         test_duration=args.duration,
-        ramp_up_time=args.rampup
+        ramp_up_time=args.rampup,
+        processes=args.processes,
+        arrivals=args.arrivals,
+        scenario_mix=args.mix,
+        request_timeout=args.timeout,
+        max_connections=args.connections,
+        exam_numbers=exam_numbers,
+        seed=args.seed,
+        webhook_endpoints=[f"/webhook/{i}" for i in range(args.shards)] if args.shards else None
     )
     
-    async def run_test():
-        # Health check
-        if not args.skip_health:
-            logger.info("Performing health check...")
-            if not await run_health_check(config.base_url):
-                logger.error("Health check failed. Exiting.")
-                return
-            logger.info("Health check passed. Starting load test...")
-        
-        # Run load test
-        tester = LoadTester(config)
-        await tester.run_load_test()
-        tester.print_results()
+    # Health check
+    if not args.skip_health:
+        logger.info("Performing health check...")
+        if not asyncio.run(run_health_check(config.base_url)):
+            logger.error("Health check failed. Exiting.")
+            return
+        logger.info("Health check passed. Starting load test...")
     
-    # Run the test
-    asyncio.run(run_test())
+    results = run_distributed(config)
+    print_results(results)
+    
+    if args.json_out:
+        summary = {
+            "config": {k: v for k, v in vars(config).items() if k != "exam_numbers"},
+            "latency_ms": results.latency.summary_ms(),
+            "latency_by_step_ms": {step: h.summary_ms() for step, h in results.latency_by_step.items()},
+            "results": results.to_dict()
+        }
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Replay captured webhook traffic against a target
+
+Reads capture files written by the traffic recorder (TRAFFIC_CAPTURE_ENABLED)
+and sends every update to the same webhook path, keeping the recorded gaps
+divided by --speed. Updates of one user are sent strictly in order: the next
+one waits until the previous request has been answered, as Telegram does for
+a single chat. Latency counts from the time a request became due.
+
+Each update is sent with a new, increasing update_id, so replaying a capture
+again is not dropped by the server's redelivery check. Set
+UPDATE_DEDUP_TTL_SECONDS=0 on the target to measure without that check.
+
+Usage:
+    python -m tests.replay_traffic traffic_capture/*.jsonl.gz --url http://localhost:8000 --speed 10
+    python -m tests.replay_traffic capture.jsonl.gz --speed 100 --json-out replay.json
+"""
+
+import argparse
+import asyncio
+import gzip
+import heapq
+import itertools
+import json
+import logging
+import time
+from typing import Iterator, Dict, Any, List, Optional
+import aiohttp
+from tests.load_test import LatencyHistogram, TestResult, print_results, run_health_check
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def read_capture(path: str) -> Iterator[Dict[str, Any]]:
+    """Captured events of one file; files still being recorded are read up to the last flush"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    logger.warning(f"Skipping unreadable line in {path}")
+        except EOFError:
+            logger.warning(f"{path} has no gzip end marker (still recording or truncated); replaying what was flushed")
+
+
+def merge_captures(paths: List[str]) -> Iterator[Dict[str, Any]]:
+    """Events of all files in arrival order (each worker writes its own file)"""
+    return heapq.merge(*(read_capture(path) for path in paths), key=lambda event: event["ts"])
+
+
+def user_key(update: Dict[str, Any]) -> Any:
+    """Ordering key: the sending user, or the update itself if it has none"""
+    for value in update.values():
+        if isinstance(value, dict) and isinstance(value.get("from"), dict):
+            return value["from"].get("id")
+    return ("update", update.get("update_id"))
+
+
+def update_kind(update: Dict[str, Any]) -> str:
+    """Update type, e.g. message or callback_query"""
+    return next((key for key in update if key != "update_id"), "unknown")
+
+
+class TrafficReplayer:
+    """Sends captured updates on a time-scaled schedule"""
+    
+    def __init__(
+        self,
+        base_url: str,
+        speed: float = 1.0,
+        request_timeout: float = 30.0,
+        max_connections: int = 1000,
+        max_gap: Optional[float] = None,
+        limit: Optional[int] = None
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.speed = speed
+        self.request_timeout = request_timeout
+        self.max_connections = max_connections
+        self.max_gap = max_gap
+        self.limit = limit
+        self.results = TestResult()
+        self._last_by_user: Dict[Any, asyncio.Task] = {}
+        self._users = set()
+        # Fresh update_ids in send order, above any used by an earlier replay
+        self._update_ids = itertools.count(int(time.time() * 1_000_000))
+    
+    async def replay(self, events: Iterator[Dict[str, Any]]) -> TestResult:
+        """Send all events and wait for the replies"""
+        loop = asyncio.get_running_loop()
+        connector = aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.max_connections)
+        pending = set()
+        start = loop.time()
+        offset = 0.0
+        previous_ts = None
+        
+        async with aiohttp.ClientSession(connector=connector) as session:
+            for count, event in enumerate(events):
+                if self.limit is not None and count >= self.limit:
+                    break
+                
+                gap = 0.0 if previous_ts is None else max(0.0, event["ts"] - previous_ts)
+                if self.max_gap is not None:
+                    # Skip quiet periods (e.g. overnight) instead of waiting through them
+                    gap = min(gap, self.max_gap)
+                offset += gap / self.speed
+                previous_ts = event["ts"]
+                
+                due = start + offset
+                delay = due - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                
+                key = user_key(event["update"])
+                self._users.add(key)
+                update = dict(event["update"], update_id=next(self._update_ids))
+                task = asyncio.create_task(
+                    self._send(session, self._last_by_user.get(key), due, event["path"], update)
+                )
+                self._last_by_user[key] = task
+                task.add_done_callback(lambda done, key=key: self._forget(key, done))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            
+            if pending:
+                await asyncio.wait(pending)
+        
+        self.results.duration = loop.time() - start
+        self.results.sessions_started = len(self._users)
+        return self.results
+    
+    def _forget(self, key: Any, task: asyncio.Task):
+        if self._last_by_user.get(key) is task:
+            del self._last_by_user[key]
+    
+    async def _send(
+        self,
+        session: aiohttp.ClientSession,
+        previous: Optional[asyncio.Task],
+        due: float,
+        path: str,
+        update: Dict[str, Any]
+    ) -> None:
+        """Send one update after the same user's previous one has been answered"""
+        loop = asyncio.get_running_loop()
+        if previous is not None:
+            await asyncio.wait([previous])
+        
+        # Lag behind the time-scaled schedule, caused by a slow reply to this user or the client
+        ready = max(due, loop.time())
+        self.results.schedule_lag.record((loop.time() - due) * 1_000_000)
+        
+        error = None
+        try:
+            async with session.post(
+                f"{self.base_url}{path}",
+                json=update,
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+            ) as response:
+                await response.read()
+                if response.status != 200:
+                    error = f"HTTP_{response.status}"
+        except asyncio.TimeoutError:
+            error = "TIMEOUT"
+        except Exception as e:
+            error = f"ERROR_{type(e).__name__}"
+        
+        latency_us = (loop.time() - ready) * 1_000_000
+        self.results.total_requests += 1
+        if error:
+            self.results.failed_requests += 1
+            self.results.errors[error] = self.results.errors.get(error, 0) + 1
+        else:
+            self.results.successful_requests += 1
+        self.results.latency.record(latency_us)
+        self.results.latency_by_step.setdefault(update_kind(update), LatencyHistogram()).record(latency_us)
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Replay captured webhook traffic")
+    parser.add_argument("captures", nargs="+", help="Capture files (.jsonl.gz) from the traffic recorder")
+    parser.add_argument("--url", default="http://localhost:8000", help="Base URL of the target")
+    parser.add_argument("--speed", type=float, default=1.0, help="Time scale, e.g. 10 replays ten times faster")
+    parser.add_argument("--max-gap", type=float, default=None, help="Cap recorded gaps between updates (seconds)")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many updates")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Request timeout in seconds")
+    parser.add_argument("--connections", type=int, default=1000, help="Maximum concurrent connections")
+    parser.add_argument("--json-out", help="Write merged results (with histograms) as JSON")
+    parser.add_argument("--skip-health", action="store_true", help="Skip the initial health check")
+    
+    args = parser.parse_args()
+    
+    async def run() -> Optional[TestResult]:
+        if not args.skip_health and not await run_health_check(args.url):
+            logger.error("Health check failed. Aborting replay.")
+            return None
+        
+        replayer = TrafficReplayer(
+            args.url, speed=args.speed, request_timeout=args.timeout,
+            max_connections=args.connections, max_gap=args.max_gap, limit=args.limit
+        )
+        logger.info(f"Replaying {len(args.captures)} capture file(s) at {args.speed}x against {args.url}")
+        return await replayer.replay(merge_captures(args.captures))
+    
+    started = time.time()
+    results = asyncio.run(run())
+    if results is None:
+        return
+    
+    print_results(results)
+    logger.info(f"Replay finished in {time.time() - started:.1f}s")
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(results.to_dict(), f)
+
+
+if __name__ == "__main__":
+    main()
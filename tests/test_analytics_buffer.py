@@ -0,0 +1,103 @@
+import os
+import pytest
+from unittest.mock import patch
+from app.database.analytics import AnalyticsBuffer
+from app.database.models import AnalyticsEvent
+
+
+def make_event(user_id: int = 1, action: str = "search_examno") -> AnalyticsEvent:
+    return AnalyticsEvent(user_id=user_id, action=action, response_time_ms=120, shard_id=0)
+
+
+class TestAnalyticsBuffer:
+    """Test write-behind analytics buffer"""
+    
+    def test_emit_drops_when_full(self):
+        """Test emit queues without blocking and counts overload drops"""
+        buffer = AnalyticsBuffer(batch_size=2, max_buffered=3)
+        
+        assert all(buffer.emit(make_event(user_id=i)) for i in range(3))
+        assert buffer.emit(make_event(user_id=4)) is False
+        assert buffer._flush_needed.is_set()
+        
+        stats = buffer.get_stats()
+        assert stats["buffered"] == 3
+        assert stats["emitted"] == 3
+        assert stats["dropped"] == 1
+        assert buffer._events[0].created_at is not None
+    
+    @pytest.mark.asyncio
+    async def test_flush_writes_batches(self):
+        """Test queued events are written in bulk inserts of batch_size"""
+        buffer = AnalyticsBuffer(batch_size=2)
+        for i in range(5):
+            buffer.emit(make_event(user_id=i))
+        
+        with patch("app.database.analytics.supabase_client") as mock_client:
+            mock_client.insert_analytics_events.return_value = True
+            assert await buffer.flush() == 5
+        
+        assert [len(call.args[0]) for call in mock_client.insert_analytics_events.call_args_list] == [2, 2, 1]
+        assert buffer.get_stats()["written"] == 5
+        assert buffer.get_stats()["buffered"] == 0
+    
+    @pytest.mark.asyncio
+    async def test_spill_and_replay(self, tmp_path):
+        """Test events spill to disk while the database is down and replay after"""
+        buffer = AnalyticsBuffer(batch_size=2, spill_dir=str(tmp_path))
+        for i in range(3):
+            buffer.emit(make_event(user_id=i))
+        
+        with patch("app.database.analytics.supabase_client") as mock_client:
+            mock_client.insert_analytics_events.return_value = False
+            assert await buffer.flush() == 0
+            
+            assert buffer.get_stats()["spilled"] == 3
+            assert buffer.get_stats()["buffered"] == 0
+            assert os.path.exists(buffer.spill_path)
+            
+            # Still down: the spill file stays for the next attempt
+            await buffer.flush()
+            assert os.path.exists(buffer.spill_path)
+            
+            mock_client.insert_analytics_events.return_value = True
+            buffer.emit(make_event(user_id=10))
+            assert await buffer.flush() == 1
+        
+        assert buffer.get_stats()["replayed"] == 3
+        assert os.listdir(tmp_path) == []
+        replayed_ids = [event.user_id for call in mock_client.insert_analytics_events.call_args_list[-2:] for event in call.args[0]]
+        assert replayed_ids == [0, 1, 2]
+    
+    @pytest.mark.asyncio
+    async def test_replays_files_left_by_crashed_worker(self, tmp_path):
+        """Test a file a dead worker was replaying is picked up, and a live worker's is left alone"""
+        buffer = AnalyticsBuffer(batch_size=2, spill_dir=str(tmp_path))
+        lines = "".join(make_event(user_id=i).model_dump_json() + "\n" for i in range(3))
+        (tmp_path / "analytics-111.jsonl.replaying-111").write_text(lines, encoding="utf-8")
+        (tmp_path / "analytics-222.jsonl.replaying-222").write_text(lines, encoding="utf-8")
+        
+        with patch("app.database.analytics.supabase_client") as mock_client, \
+             patch("app.database.analytics._process_alive", side_effect=lambda pid: pid == 222):
+            mock_client.insert_analytics_events.return_value = True
+            await buffer.flush()
+        
+        assert buffer.get_stats()["replayed"] == 3
+        assert os.listdir(tmp_path) == ["analytics-222.jsonl.replaying-222"]
+    
+    @pytest.mark.asyncio
+    async def test_spill_limit(self, tmp_path):
+        """Test batches are dropped once the spill file reaches its size limit"""
+        buffer = AnalyticsBuffer(spill_dir=str(tmp_path), max_spill_bytes=10)
+        buffer.emit(make_event())
+        
+        with patch("app.database.analytics.supabase_client") as mock_client:
+            mock_client.insert_analytics_events.return_value = False
+            await buffer.flush()
+        
+        assert buffer.get_stats()["spilled"] == 0
+        assert buffer.get_stats()["dropped"] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,37 @@
+import json
+import pytest
+from tests.benchmarks.harness import BenchmarkSuite, BenchmarkResult, save_results, load_baseline, compare
+from tests.benchmarks.hot_paths import BENCHMARKS, build_suite
+
+
+class TestBenchmarkHarness:
+    """Test the microbenchmark harness and baseline files"""
+    
+    def test_run_and_baseline_round_trip(self, tmp_path):
+        """Test results are saved, reloaded and compared by name"""
+        suite = BenchmarkSuite(repeat=3, warmup=0, min_time=0.001)
+        suite.add("sum", lambda: sum(range(100)))
+        results = suite.run()
+        
+        assert results[0].loops >= 1
+        assert results[0].min_ns <= results[0].median_ns
+        
+        path = tmp_path / "baseline.json"
+        save_results(str(path), results)
+        assert "python" in json.loads(path.read_text())["environment"]
+        
+        baseline = load_baseline(str(path))
+        slower = BenchmarkResult("sum", 1, baseline["sum"] * 1.5, baseline["sum"], 0.0)
+        [comparison] = compare(baseline, [slower, BenchmarkResult("new", 1, 1.0, 1.0, 0.0)])
+        assert comparison.status(0.1) == "SLOWER"
+        assert comparison.ratio == pytest.approx(1.5)
+    
+    def test_hot_path_benchmarks_run(self):
+        """Test every hot-path benchmark runs without error"""
+        for func in BENCHMARKS.values():
+            func()
+        assert set(build_suite(name_filter="keyboards.").benchmarks) < set(BENCHMARKS)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,82 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, PropertyMock, patch
+from app.config import Settings, settings
+from app.bot.handlers import TelegramBotManager
+from app.bot.single_interface_manager import SingleInterfaceBotManager
+
+TOKENS = [f"{100 + i}:token{i}" for i in range(6)]
+
+
+class TestBotStartup:
+    """Test concurrent shard startup and lazy backend bots"""
+    
+    @pytest.mark.asyncio
+    async def test_ready_after_primary_shard(self):
+        """Test initialize returns after shard 0 and the others start with bounded fan-out"""
+        manager = TelegramBotManager()
+        running = []
+        peak = []
+        
+        async def create(shard_id, token):
+            running.append(shard_id)
+            peak.append(len(running))
+            await asyncio.sleep(0 if shard_id == 0 else 0.05)
+            running.remove(shard_id)
+            application = MagicMock()
+            application.process_update = AsyncMock()
+            manager.applications[shard_id] = application
+            manager.active_bots.append(application.bot)
+        
+        with patch.object(Settings, "active_bot_tokens", new_callable=PropertyMock, return_value=TOKENS), \
+             patch.object(settings, "bot_init_concurrency", 2), \
+             patch.object(manager, "_create_bot_instance", side_effect=create), \
+             patch("app.bot.handlers.Update.de_json", return_value=MagicMock()):
+            await manager.initialize()
+            assert list(manager.applications) == [0]
+            assert (await manager.get_stats())["starting_shards"] == 5
+            
+            # An update for a shard that is still starting waits for it
+            await manager.process_update(4, {"update_id": 1})
+            manager.applications[4].process_update.assert_called_once()
+            
+            await manager._init_task
+            assert sorted(manager.applications) == list(range(6))
+            assert max(peak) == 2
+            await manager.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_backend_bots_created_on_first_use(self):
+        """Test backend bots are created on first use and reused"""
+        with patch.object(Settings, "active_bot_tokens", new_callable=PropertyMock, return_value=TOKENS):
+            manager = SingleInterfaceBotManager()
+            assert manager.response_bots == {}
+            
+            bot = await manager.get_response_bot(7)
+            assert bot.token == TOKENS[7 % len(TOKENS)]
+            assert await manager.get_response_bot(7) is bot
+            assert list(manager.response_bots) == [bot.token]
+            assert (await manager.get_stats())["backend_bots_created"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_health_check_leaves_backend_bots_lazy(self):
+        """Test the health check only calls backend bots that were already created"""
+        with patch.object(Settings, "active_bot_tokens", new_callable=PropertyMock, return_value=TOKENS):
+            manager = SingleInterfaceBotManager()
+            manager.main_application = MagicMock()
+            manager.main_application.bot.get_me = AsyncMock(return_value=MagicMock(username="main", first_name="Main", id=1))
+            bot = MagicMock()
+            bot.get_me = AsyncMock(side_effect=ConnectionError("down"))
+            manager.response_bots[TOKENS[2]] = bot
+            
+            health = await manager.health_check()
+        
+        assert list(manager.response_bots) == [TOKENS[2]]
+        assert health["main_bot"] == "healthy"
+        assert health["backend_bots"]["bot_2"].startswith("error")
+        assert health["backend_bots"]["bot_0"] == "not created"
+        assert health["total_healthy"] == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,101 @@
+import csv
+import json
+import pytest
+from unittest.mock import MagicMock
+from app.jobs.bulk_load import BulkLoader, CopyBackend, normalize_record
+
+
+class FakeBackend:
+    """Records loaded chunks; fails the given chunk numbers once"""
+    
+    def __init__(self, fail_chunks=()):
+        self.fail_chunks = set(fail_chunks)
+        self.loaded = []
+    
+    def load_chunk(self, table, columns, rows):
+        first = rows[0]["examno"]
+        if first in self.fail_chunks:
+            self.fail_chunks.discard(first)
+            raise RuntimeError("connection lost")
+        self.loaded.append([row["examno"] for row in rows])
+        return len(rows)
+
+
+class TestBulkLoader:
+    """Test bulk loading of students"""
+    
+    @pytest.fixture
+    def students_csv(self, tmp_path):
+        """Write a small students CSV with one invalid row"""
+        path = tmp_path / "students.csv"
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=["examno", "aname", "gov_name", "unknown"])
+            writer.writeheader()
+            for i in range(1, 6):
+                writer.writerow({
+                    "examno": f"27259111043000{i}",
+                    "aname": "مُحَمَّد  علي",
+                    "gov_name": "كربلاء",
+                    "unknown": "x"
+                })
+            writer.writerow({"examno": "123", "aname": "خطأ", "gov_name": "بغداد", "unknown": ""})
+        return str(path)
+    
+    def test_normalize_record(self):
+        """Test unknown columns are dropped and names normalized"""
+        row = normalize_record("students", {"examno": "272-591-110-430-082", "aname": "عَلي", "extra": 1})
+        
+        assert row == {"examno": "272591110430082", "aname": "علي"}
+        assert normalize_record("students", {"examno": "12345"}) is None
+    
+    def test_load_and_resume(self, students_csv, tmp_path):
+        """Test failed chunks are retried on the next run and loaded chunks skipped"""
+        checkpoint = str(tmp_path / "load.checkpoint")
+        backend = FakeBackend(fail_chunks={"272591110430003"})
+        
+        report = BulkLoader(students_csv, "students", backend, chunk_size=2, workers=2, checkpoint_path=checkpoint).run()
+        
+        assert report.rows_read == 6
+        assert report.rows_rejected == 1
+        assert report.rows_loaded == 3
+        assert report.chunks_failed == 1
+        with open(checkpoint) as f:
+            assert json.load(f)["completed_chunks"] == [0, 2]
+        
+        report = BulkLoader(students_csv, "students", backend, chunk_size=2, workers=2, checkpoint_path=checkpoint).run()
+        
+        assert report.chunks_skipped == 2
+        assert report.rows_loaded == 2
+        assert sorted(sum(backend.loaded, [])) == [f"27259111043000{i}" for i in range(1, 6)]
+    
+    def test_checkpoint_chunk_size_mismatch(self, students_csv, tmp_path):
+        """Test resuming with another chunk size is refused"""
+        checkpoint = str(tmp_path / "load.checkpoint")
+        BulkLoader(students_csv, "students", FakeBackend(), chunk_size=2, checkpoint_path=checkpoint).run()
+        
+        with pytest.raises(ValueError):
+            BulkLoader(students_csv, "students", FakeBackend(), chunk_size=3, checkpoint_path=checkpoint)
+    
+    def test_copy_keeps_last_duplicate(self):
+        """Test staged rows carry their position so the last of repeated exam numbers wins"""
+        backend = CopyBackend("postgresql://localhost/test")
+        conn = MagicMock(closed=False)
+        backend._local.conn = conn
+        cur = conn.cursor.return_value.__enter__.return_value
+        copied = []
+        cur.copy_expert.side_effect = lambda sql, buffer: copied.append(buffer.read())
+        rows = [
+            {"examno": "272591110430001", "aname": "قديم"},
+            {"examno": "272591110430001", "aname": "جديد"}
+        ]
+        
+        assert backend.load_chunk("students", ["examno", "aname"], rows) == 2
+        
+        assert copied[0].splitlines() == ["0,272591110430001,قديم", "1,272591110430001,جديد"]
+        insert = cur.execute.call_args_list[-1].args[0]
+        assert "ORDER BY examno, rownum DESC" in insert
+        conn.commit.assert_called_once()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
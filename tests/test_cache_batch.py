@@ -0,0 +1,61 @@
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock, call
+from app.config import settings
+from app.external.cache import NearCache, RedisCache
+
+
+class TestRedisCacheBatch:
+    """Test pipelined batch operations on RedisCache"""
+    
+    @pytest.fixture
+    def cache(self):
+        """Create cache with a mocked Redis client and pipeline"""
+        cache = RedisCache()
+        cache.compact = None
+        cache.near = NearCache(max_entries=100, max_bytes=1024 * 1024, ttl=30)
+        cache.near_prefixes = {"result_render"}
+        cache.redis = MagicMock()
+        pipe = MagicMock()
+        pipe.execute = AsyncMock(return_value=[])
+        cache.redis.pipeline.return_value.__aenter__.return_value = pipe
+        return cache, pipe
+    
+    @pytest.mark.asyncio
+    async def test_get_many_single_mget(self, cache):
+        """Test misses are fetched with one MGET and near hits are skipped"""
+        cache, _ = cache
+        cache.near.set("result_render:1", json.dumps({"text": "محلي"}))
+        cache.redis.mget = AsyncMock(return_value=[json.dumps({"text": "ب"}), None])
+        
+        values = await cache.get_many(["result_render:1", "result_render:2", "result_render:3", "result_render:2"])
+        
+        assert values == [{"text": "محلي"}, {"text": "ب"}, None, {"text": "ب"}]
+        cache.redis.mget.assert_called_once_with(["result_render:2", "result_render:3"])
+        assert cache.get_stats()["redis"]["misses"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_set_many_per_key_ttl(self, cache):
+        """Test per-key TTLs fall back to the default"""
+        cache, pipe = cache
+        
+        assert await cache.set_many({"exam_result:1": {"a": 1}, "exam_result:2": {"b": 2}}, ttl={"exam_result:1": 60})
+        
+        pipe.setex.assert_has_calls([
+            call("exam_result:1", 60, json.dumps({"a": 1})),
+            call("exam_result:2", settings.cache_ttl_seconds, json.dumps({"b": 2}))
+        ])
+        pipe.execute.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_pipeline_requires_connection(self):
+        """Test pipeline context refuses to run without Redis"""
+        cache = RedisCache()
+        
+        with pytest.raises(ConnectionError):
+            async with cache.pipeline():
+                pass
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
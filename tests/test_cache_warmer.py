@@ -0,0 +1,95 @@
+import pytest
+from unittest.mock import AsyncMock, patch, MagicMock
+from app.config import settings
+from app.external.cache import read_entry
+from app.jobs.warm_cache import CacheWarmer
+
+
+class TestCacheWarmer:
+    """Test pre-release cache warm-up"""
+    
+    @pytest.fixture
+    def mock_deps(self):
+        """Mock database, cache and renderer"""
+        pages = [["1", "2", "3"], ["4"], []]
+        
+        with patch('app.jobs.warm_cache.supabase_client') as mock_db, \
+             patch('app.jobs.warm_cache.redis_cache') as mock_cache, \
+             patch('app.jobs.warm_cache.result_service') as mock_service:
+            mock_db.get_exam_numbers_page = MagicMock(side_effect=lambda table, after, limit, strict: pages.pop(0))
+            mock_db.get_students_with_results = MagicMock(
+                side_effect=lambda examnos, strict: {n: {"student": n, "exam_result": None} for n in examnos if n != "3"}
+            )
+            # "2" is already cached
+            mock_cache.exists_many = AsyncMock(side_effect=lambda keys: [key == "render:2" for key in keys])
+            mock_cache.set_many = AsyncMock(return_value=True)
+            mock_service.get_render_cache_key = MagicMock(side_effect=lambda n: f"render:{n}")
+            mock_service.render_result = AsyncMock(
+                side_effect=lambda data: (f"text {data['student']}", data["student"] != "4")
+            )
+            yield mock_db, mock_cache
+    
+    @pytest.mark.asyncio
+    async def test_warm_up_report(self, mock_deps):
+        """Test warm-up skips cached entries and reports hit ratio"""
+        mock_db, mock_cache = mock_deps
+        
+        report = await CacheWarmer(batch_size=3, concurrency=1).run()
+        
+        assert report.total == 4
+        assert report.already_cached == 1
+        assert report.hit_ratio == 0.25
+        assert report.missing == 1  # "3" has no student row
+        assert report.not_cacheable == 1  # "4" has no result yet
+        assert report.warmed == 1
+        
+        mock_cache.set_many.assert_called_once()
+        entries, ttls = mock_cache.set_many.call_args.args
+        assert list(entries) == ["render:1"]
+        assert read_entry(entries["render:1"]) == ({"text": "text 1"}, False)
+        assert ttls["render:1"] > settings.cache_ttl_seconds
+    
+    @pytest.mark.asyncio
+    async def test_warm_up_limit(self, mock_deps):
+        """Test warm-up stops after the limit"""
+        mock_db, mock_cache = mock_deps
+        
+        report = await CacheWarmer(batch_size=3, concurrency=2, limit=3).run()
+        
+        assert report.total == 3
+        assert mock_db.get_exam_numbers_page.call_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_database_error_fails_run(self, mock_deps):
+        """Test a page read is retried and the run fails instead of reporting a short warm-up as complete"""
+        mock_db, mock_cache = mock_deps
+        mock_db.get_exam_numbers_page = MagicMock(side_effect=[
+            ["1", "2", "3"], ConnectionError("db down"), ["4", "5", "6"],
+            ConnectionError("db down"), ConnectionError("db down"), ConnectionError("db down")
+        ])
+        warmer = CacheWarmer(batch_size=3, concurrency=1)
+        warmer.RETRY_DELAY_SECONDS = 0
+        
+        with pytest.raises(ConnectionError):
+            await warmer.run()
+        
+        assert mock_db.get_exam_numbers_page.call_count == 6
+        assert mock_db.get_exam_numbers_page.call_args_list[1].args == ("students", "3", 3)
+        assert mock_db.get_exam_numbers_page.call_args_list[2].args == ("students", "3", 3)
+        assert warmer.report.total == 6
+    
+    @pytest.mark.asyncio
+    async def test_failed_batch_is_counted(self, mock_deps):
+        """Test a batch the database could not read is reported as failed, not missing"""
+        mock_db, mock_cache = mock_deps
+        mock_db.get_students_with_results = MagicMock(side_effect=ConnectionError("db down"))
+        
+        report = await CacheWarmer(batch_size=3, concurrency=1).run()
+        
+        assert report.failed == 3  # "2" was already cached
+        assert report.missing == 0
+        assert report.warmed == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,123 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.external.circuit_breaker import CircuitBreaker
+from app.external.najah_api import NajahAPIClient
+
+
+class TestCircuitBreaker:
+    """Test circuit breaker states (in-process, without Redis)"""
+    
+    @pytest.fixture
+    def breaker(self):
+        """Create breaker with small thresholds"""
+        return CircuitBreaker("test", failure_ratio=0.5, min_calls=4, window_seconds=30, open_seconds=30)
+    
+    @pytest.mark.asyncio
+    async def test_opens_on_failure_ratio(self, breaker):
+        """Test circuit opens once enough calls in the window fail"""
+        await breaker.record_success()
+        await breaker.record_failure()
+        await breaker.record_failure()
+        assert await breaker.get_state() == CircuitBreaker.CLOSED
+        
+        await breaker.record_failure()
+        
+        assert await breaker.get_state() == CircuitBreaker.OPEN
+        assert await breaker.allow_request() is False
+        assert breaker.rejected == 1
+    
+    @pytest.mark.asyncio
+    async def test_half_open_probe(self, breaker):
+        """Test a single probe is let through and its outcome decides the state"""
+        for _ in range(4):
+            await breaker.record_failure()
+        
+        with patch("app.external.circuit_breaker.time.monotonic", return_value=10 ** 9):
+            assert await breaker.get_state() == CircuitBreaker.HALF_OPEN
+            assert await breaker.allow_request() is True
+            assert await breaker.allow_request() is False
+            
+            await breaker.record_failure()
+        assert await breaker.get_state() == CircuitBreaker.OPEN
+        
+        with patch("app.external.circuit_breaker.time.monotonic", return_value=10 ** 10):
+            assert await breaker.allow_request() is True
+            await breaker.record_success()
+            assert await breaker.get_state() == CircuitBreaker.CLOSED
+    
+    @pytest.mark.asyncio
+    async def test_open_circuit_serves_stale_result(self):
+        """Test API client answers from the stale copy without calling upstream"""
+        api_client = NajahAPIClient()
+        api_client.breaker.allow_request = AsyncMock(return_value=False)
+        stale_data = {"examno": "272591110430082", "total": 163}
+        
+        with patch("app.external.najah_api.redis_cache") as mock_redis, patch("httpx.AsyncClient") as mock_client:
+            mock_redis.get_cache_key = MagicMock(side_effect=lambda prefix, exam_id: f"{prefix}:{exam_id}")
+            mock_redis.get = AsyncMock(side_effect=lambda key: stale_data if key.startswith("exam_result_stale:") else None)
+            
+            result = await api_client.get_exam_result("272591110430082")
+            
+            assert result.success is True
+            assert result.stale is True
+            assert result.data == stale_data
+            mock_client.assert_not_called()
+            
+            mock_redis.get = AsyncMock(return_value=None)
+            result = await api_client.get_exam_result("272591110430082")
+            assert result.success is False
+            assert "مشغولة" in result.error
+    
+    @pytest.mark.asyncio
+    async def test_unexpected_error_releases_probe(self):
+        """Test an unexpected error during the half-open probe reopens the circuit"""
+        api_client = NajahAPIClient()
+        api_client.breaker._tripped = True
+        api_client._get = AsyncMock(side_effect=ValueError("bad body"))
+        api_client.retry_policy.backoff = AsyncMock(return_value=None)
+        
+        with patch("app.external.najah_api.redis_cache") as mock_redis, patch("httpx.AsyncClient"):
+            mock_redis.get = AsyncMock(return_value=None)
+            result = await api_client.get_exam_result("272591110430082")
+        
+        assert result.success is False
+        assert api_client._get.await_count == 1
+        assert api_client.breaker._probe_pending is False
+        assert await api_client.breaker.get_state() == CircuitBreaker.OPEN
+    
+    @pytest.mark.asyncio
+    async def test_shed_or_cancelled_probe_is_released(self):
+        """Test a probe rejected by the limiter or cancelled mid-request records no outcome and is given back"""
+        api_client = NajahAPIClient()
+        api_client.breaker._tripped = True
+        api_client.limiter.acquire = AsyncMock(return_value=False)
+        api_client._get = AsyncMock()
+        
+        with patch("app.external.najah_api.redis_cache") as mock_redis:
+            mock_redis.get = AsyncMock(return_value=None)
+            result = await api_client.get_exam_result("272591110430082")
+            
+            assert result.success is False
+            api_client._get.assert_not_called()
+            assert api_client.breaker._probe_pending is False
+            assert await api_client.breaker.get_state() == CircuitBreaker.HALF_OPEN
+            
+            # The next caller may probe; cancelling it mid-request gives the probe back too
+            api_client.limiter.acquire = AsyncMock(return_value=True)
+            async def slow_get(*args):
+                await asyncio.sleep(10)
+            api_client._get = slow_get
+            lookup = asyncio.create_task(api_client.get_exam_result("272591110430082"))
+            await asyncio.sleep(0.05)
+            assert api_client.breaker._probe_pending is True
+            lookup.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await lookup
+        
+        assert api_client.breaker._probe_pending is False
+        assert await api_client.breaker.get_state() == CircuitBreaker.HALF_OPEN
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,81 @@
+import time
+import pytest
+from unittest.mock import patch
+from app.external.cache import RedisCache
+from app.external.compact_cache import CompactHashLayout
+
+
+class TestCompactHashLayout:
+    """Test compact hash-bucket cache layout"""
+    
+    def test_bucket_for(self):
+        """Test exam-number keys map to prefix buckets"""
+        layout = CompactHashLayout(suffix_digits=2)
+        
+        assert layout.bucket_for("exam_result:272591110430082") == ("exam_result:h:2725911104300", "82")
+        assert layout.bucket_for("rate_limit:abc") is None
+        assert layout.bucket_for("exam_result:1") is None
+    
+    def test_encode_decode(self):
+        """Test values round-trip, compress and expire"""
+        layout = CompactHashLayout(compress=True, compress_min_bytes=16)
+        value = {"text": "👤 الاسم: عبدالله أحمد\n" * 10}
+        
+        encoded = layout.encode(value, ttl=60)
+        assert encoded[:1] == CompactHashLayout.COMPRESSED
+        assert len(encoded) < len(str(value).encode("utf-8"))
+        assert layout.decode(encoded) == value
+        
+        with patch("app.external.compact_cache.time.time", return_value=time.time() + 61):
+            assert layout.decode(encoded) is None
+        
+        assert CompactHashLayout(compress=False).encode(value, ttl=60)[:1] == CompactHashLayout.PLAIN
+    
+    @pytest.mark.asyncio
+    async def test_redis_cache_uses_compact_layout(self, fake_redis):
+        """Test RedisCache routes configured prefixes to hash buckets"""
+        cache = RedisCache()
+        cache.compact = CompactHashLayout()
+        cache.compact_prefixes = {"exam_result"}
+        cache.near = None
+        cache.redis = object()
+        cache.redis_raw = fake_redis
+        
+        assert await cache.set("exam_result:272591110430082", {"total": 163}, 300) is True
+        assert fake_redis.expiries == {"exam_result:h:2725911104300": 300}
+        assert await cache.get("exam_result:272591110430082") == {"total": 163}
+        assert await cache.exists_many(["exam_result:272591110430082", "exam_result:272591110430083"]) == [True, False]
+        
+        await cache.delete("exam_result:272591110430082")
+        assert await cache.get("exam_result:272591110430082") is None
+    
+    @pytest.mark.asyncio
+    async def test_bucket_ttl_only_extends_and_expired_fields_are_reaped(self, fake_redis):
+        """Test a short write keeps the bucket TTL and expired fields are deleted on read"""
+        layout = CompactHashLayout()
+        bucket = "exam_result:h:2725911104300"
+        
+        await layout.set(fake_redis, "exam_result:272591110430082", {"total": 163}, 3600)
+        await layout.set(fake_redis, "exam_result:272591110430083", {"total": 150}, 60)
+        assert fake_redis.expiries[bucket] == 3600
+        await layout.set(fake_redis, "exam_result:272591110430084", {"total": 140}, 7200)
+        assert fake_redis.expiries[bucket] == 7200
+        
+        with patch("app.external.compact_cache.time.time", return_value=time.time() + 61):
+            assert await layout.get(fake_redis, "exam_result:272591110430083") is None
+            assert await layout.get(fake_redis, "exam_result:272591110430082") == {"total": 163}
+            
+            cache = RedisCache()
+            cache.compact = layout
+            cache.compact_prefixes = {"exam_result"}
+            cache.near = None
+            cache.redis = object()
+            cache.redis_raw = fake_redis
+            await layout.set(fake_redis, "exam_result:272591110430085", {"total": 130}, -30)
+            assert await cache.get_many(["exam_result:272591110430082", "exam_result:272591110430085"]) == [{"total": 163}, None]
+        
+        assert sorted(fake_redis.hashes[bucket]) == ["82", "84"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,58 @@
+import asyncio
+import pytest
+from app.external.najah_api import AdaptiveConcurrencyLimiter
+
+
+class TestAdaptiveConcurrencyLimiter:
+    """Test AIMD upstream concurrency limit"""
+    
+    @pytest.mark.asyncio
+    async def test_additive_increase_multiplicative_decrease(self):
+        """Test fast successes raise the limit and errors cut it once per interval"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4, min_limit=1, max_limit=10, target_latency=1.0)
+        
+        for _ in range(8):
+            assert await limiter.acquire()
+            limiter.release(latency=0.1, success=True)
+        assert 5.0 < limiter.limit < 6.0
+        
+        before = limiter.limit
+        for _ in range(3):
+            await limiter.acquire()
+            limiter.release(latency=0.1, success=False)
+        assert limiter.limit == pytest.approx(before * 0.7)
+        
+        await limiter.acquire()
+        limiter.release(latency=5.0, success=True)
+        assert limiter.limit == pytest.approx(before * 0.7)
+    
+    @pytest.mark.asyncio
+    async def test_bounded_queue(self):
+        """Test callers over the limit queue in order and are rejected when the queue is full"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, min_limit=1, max_queue=1)
+        
+        assert await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        
+        assert await limiter.acquire() is False
+        
+        limiter.release(latency=0.1, success=True)
+        assert await waiter is True
+        stats = limiter.get_stats()
+        assert stats["queued"] == 1
+        assert stats["rejected"] == 1
+        assert stats["in_flight"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_queue_timeout(self):
+        """Test a queued caller gives up after its timeout"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, min_limit=1)
+        await limiter.acquire()
+        
+        assert await limiter.acquire(timeout=0.01) is False
+        assert limiter.get_stats()["queue_length"] == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,122 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from telegram.request import HTTPXRequest
+from app.bot.deadline_request import DeadlineRequest
+from app.external.najah_api import NajahAPIClient
+from app.utils.deadline import (
+    DeadlineExceeded, deadline_scope, no_deadline, run_with_deadline, time_remaining
+)
+
+
+class TestDeadline:
+    """Test per-update deadline budget"""
+    
+    def test_scopes(self):
+        """Test nested scopes keep the earlier deadline and background work escapes it"""
+        assert time_remaining() is None
+        
+        with deadline_scope(5):
+            with deadline_scope(60):
+                assert time_remaining() <= 5
+            with no_deadline():
+                assert time_remaining() is None
+        
+        with deadline_scope(-1):
+            assert time_remaining() < 0
+    
+    @pytest.mark.asyncio
+    async def test_run_with_deadline(self):
+        """Test awaiting past the budget is cut short"""
+        with deadline_scope(0.01):
+            with pytest.raises(DeadlineExceeded):
+                await run_with_deadline(asyncio.sleep(1))
+    
+    @pytest.mark.asyncio
+    async def test_bot_api_timeouts_capped(self):
+        """Test Bot API request timeouts are capped by the remaining budget"""
+        request = DeadlineRequest(read_timeout=5.0, connect_timeout=5.0)
+        
+        with patch.object(HTTPXRequest, "do_request", new=AsyncMock(return_value=(200, b"{}"))) as mock_do:
+            with deadline_scope(2):
+                await request.do_request("https://api.telegram.org/botTOKEN/sendMessage", "POST")
+            read_timeout = mock_do.call_args.args[3]
+            assert 1.0 < read_timeout <= 2.0
+            
+            with deadline_scope(-5):
+                await request.do_request("https://api.telegram.org/botTOKEN/sendMessage", "POST")
+            assert mock_do.call_args.args[3] == DeadlineRequest.MIN_TIMEOUT
+
+
+class TestNajahDeadlineAndHedging:
+    """Test upstream lookups respect the deadline and hedge slow requests"""
+    
+    @pytest.mark.asyncio
+    async def test_no_attempt_after_deadline(self):
+        """Test no upstream call is made once the budget is spent"""
+        api_client = NajahAPIClient()
+        
+        with patch("app.external.najah_api.redis_cache") as mock_redis, patch("httpx.AsyncClient") as mock_client:
+            mock_redis.get = AsyncMock(return_value=None)
+            with deadline_scope(-1):
+                result = await api_client.get_exam_result("272591110430082")
+        
+        assert result.success is False
+        assert "انتهت مهلة" in result.error
+        mock_client.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_hedged_request_takes_first_answer(self):
+        """Test a second request is sent after the p95 latency and the faster one wins"""
+        api_client = NajahAPIClient()
+        api_client._latencies.extend([0.01] * 50)
+        fast_response = MagicMock(status_code=200)
+        calls = []
+        
+        async def get(url, timeout):
+            calls.append(url)
+            if len(calls) == 1:
+                await asyncio.sleep(1)
+                return MagicMock(status_code=200)
+            return fast_response
+        
+        client = MagicMock()
+        client.get = get
+        
+        with patch("app.external.najah_api.settings") as mock_settings:
+            mock_settings.najah_hedge_enabled = True
+            response = await api_client._get(client, "https://upstream/exam-result/1", timeout=5.0)
+        
+        assert response is fast_response
+        assert len(calls) == 2
+        assert api_client.hedged_requests == 1
+    
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_cancels_requests(self):
+        """Test cancelling a lookup before the hedge is sent cancels the request in flight"""
+        api_client = NajahAPIClient()
+        api_client._latencies.extend([0.5] * 50)
+        requests = []
+        
+        async def get(url, timeout):
+            requests.append(asyncio.current_task())
+            await asyncio.sleep(10)
+        
+        client = MagicMock()
+        client.get = get
+        
+        with patch("app.external.najah_api.settings") as mock_settings:
+            mock_settings.najah_hedge_enabled = True
+            lookup = asyncio.create_task(api_client._get(client, "https://upstream/exam-result/1", timeout=5.0))
+            await asyncio.sleep(0.05)
+            lookup.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await lookup
+        
+        await asyncio.sleep(0)
+        assert len(requests) == 1
+        assert all(task.cancelled() for task in requests)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
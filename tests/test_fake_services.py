@@ -0,0 +1,99 @@
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from aiohttp.test_utils import TestClient, TestServer
+from tests.fake_services import FakePostgREST, FakeTelegramAPI, FakeNajahAPI, generate_dataset, exam_number
+
+
+class TestFakePostgREST:
+    """Test the in-memory PostgREST stand-in"""
+    
+    @staticmethod
+    def make_client() -> TestClient:
+        """Serve a small generated dataset"""
+        students, results = generate_dataset(50)
+        return TestClient(TestServer(FakePostgREST({"students": students, "exam_results": results}).app()))
+    
+    @pytest.mark.asyncio
+    async def test_filters_order_and_count(self):
+        """Test the query syntax supabase-py sends"""
+        async with self.make_client() as client:
+            response = await client.get("/rest/v1/students", params={"select": "examno", "examno": f"eq.{exam_number(3)}"})
+            assert await response.json() == [{"examno": exam_number(3)}]
+            
+            response = await client.get(
+                "/rest/v1/students",
+                params={"select": "examno", "order": "examno.desc", "offset": "2", "limit": "3", "examno": f"gt.{exam_number(40)}"},
+                headers={"Prefer": "count=exact"}
+            )
+            assert [row["examno"] for row in await response.json()] == [exam_number(47), exam_number(46), exam_number(45)]
+            assert response.headers["Content-Range"] == "2-4/9"
+            
+            response = await client.get("/rest/v1/exam_results", params={"examno": f"in.({exam_number(1)},{exam_number(2)})"})
+            assert len(await response.json()) == 2
+    
+    @pytest.mark.asyncio
+    async def test_insert_upsert_update(self):
+        """Test writes, including upsert on the table key"""
+        async with self.make_client() as client:
+            response = await client.post("/rest/v1/user_sessions", json={"user_id": 7, "current_state": "main_menu"})
+            assert response.status == 201
+            
+            response = await client.post("/rest/v1/user_sessions", json={"user_id": 7, "current_state": "x"})
+            assert response.status == 409
+            
+            await client.patch("/rest/v1/user_sessions", params={"user_id": "eq.7"}, json={"current_state": "waiting_examno"})
+            response = await client.post(
+                "/rest/v1/rate_limits", json=[{"user_id": 7, "request_count": 1}],
+                headers={"Prefer": "return=minimal,resolution=merge-duplicates"}
+            )
+            assert response.status == 201
+            
+            response = await client.get("/rest/v1/user_sessions", params={"user_id": "eq.7"})
+            assert (await response.json())[0]["current_state"] == "waiting_examno"
+
+
+class TestFakeTelegramAPI:
+    """Test the Bot API stand-in"""
+    
+    @pytest.mark.asyncio
+    async def test_per_chat_rate_limit(self):
+        """Test sends beyond the per-chat burst get 429 with retry_after"""
+        fake = FakeTelegramAPI(chat_rate=1.0, chat_burst=2.0)
+        async with TestClient(TestServer(fake.app())) as client:
+            statuses = []
+            for _ in range(3):
+                response = await client.post("/bot123:abc/sendMessage", data={"chat_id": "5", "text": "hi"})
+                statuses.append(response.status)
+            body = await response.json()
+            
+            response = await client.post("/bot123:abc/getMe")
+            me = (await response.json())["result"]
+        
+        assert statuses == [200, 200, 429]
+        assert body["parameters"]["retry_after"] >= 1
+        assert fake.rate_limited == 1
+        assert me["id"] == 123
+
+
+class TestFakeNajahAPI:
+    """Test the results API stand-in"""
+    
+    @pytest.mark.asyncio
+    async def test_profile_switch(self):
+        """Test results, 404s and a runtime switch to an error profile"""
+        fake = FakeNajahAPI({"1": {"examno": "1"}}, latency_ms=0)
+        async with TestClient(TestServer(fake.app())) as client:
+            assert (await client.get("/exam-result/1")).status == 200
+            assert (await client.get("/exam-result/2")).status == 404
+            
+            await client.post("/_profile", json={"error_rate": 1})
+            response = await client.get("/exam-result/1")
+        
+        assert response.status == 503
+        assert response.headers["Retry-After"] == "1"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,88 @@
+import random
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from tests import load_test
+from tests.load_test import LatencyHistogram, LoadTester, parse_mix
+
+
+class TestLatencyHistogram:
+    """Test HDR-style latency histogram used by the load generator"""
+    
+    def test_percentiles_within_error(self):
+        """Test percentiles stay within 1% of the exact values"""
+        random.seed(7)
+        values = [int(random.lognormvariate(10, 1)) for _ in range(20000)]
+        histogram = LatencyHistogram()
+        for value in values:
+            histogram.record(value)
+        
+        values.sort()
+        for percentile in (50, 90, 99, 99.9):
+            exact = values[int(len(values) * percentile / 100 + 0.5) - 1]
+            assert histogram.percentile(percentile) == pytest.approx(exact, rel=0.01)
+        assert histogram.percentile(100) == values[-1]
+    
+    def test_merge_and_round_trip(self):
+        """Test merged per-process histograms equal one histogram of all values"""
+        combined, first, second = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+        for value in range(1, 5000, 3):
+            combined.record(value * 37)
+            (first if value % 2 else second).record(value * 37)
+        
+        merged = LatencyHistogram.from_dict(first.to_dict())
+        merged.merge(LatencyHistogram.from_dict(second.to_dict()))
+        assert merged.counts == combined.counts
+        assert (merged.total, merged.min, merged.max) == (combined.total, combined.min, combined.max)
+
+
+class TestLoadTester:
+    """Test scenario sessions and result merging"""
+    
+    def test_build_session(self):
+        """Test every step of a session belongs to the same user"""
+        tester = LoadTester(load_test.TestConfig())
+        for scenario in ("examno", "name", "navigation"):
+            steps = tester.build_session(scenario, 4242)
+            assert steps[0][0] == "start"
+            for _, think_time, update in steps:
+                sender = update.get("message", update.get("callback_query", {}))["from"]["id"]
+                assert sender == 4242
+                assert think_time >= 0
+    
+    def test_update_ids_unique_across_processes(self):
+        """Test update_ids increase within a process and never repeat across processes"""
+        config = load_test.TestConfig(processes=2)
+        update_ids = []
+        for worker_index in range(2):
+            tester = LoadTester(config, worker_index)
+            ids = [update["update_id"] for scenario in ("examno", "name", "navigation") for _, _, update in tester.build_session(scenario, 4242)]
+            update_ids.extend(ids)
+            assert tester.update_generator.next_update_id() > max(ids)
+        assert len(set(update_ids)) == len(update_ids)
+    
+    def test_parse_mix(self):
+        """Test scenario mix parsing"""
+        assert parse_mix("examno=0.8,name=0.2") == {"examno": 0.8, "name": 0.2}
+        with pytest.raises(Exception):
+            parse_mix("checkout=1")
+    
+    def test_results_merge(self):
+        """Test process results add up"""
+        first = load_test.TestResult(total_requests=3, successful_requests=2, failed_requests=1)
+        second = load_test.TestResult(total_requests=2, successful_requests=2)
+        first.errors["TIMEOUT"] = 1
+        first.latency.record(1000)
+        second.latency.record(3000)
+        
+        merged = load_test.TestResult()
+        merged.merge(load_test.TestResult.from_dict(first.to_dict()))
+        merged.merge(load_test.TestResult.from_dict(second.to_dict()))
+        assert (merged.total_requests, merged.successful_requests, merged.failed_requests) == (5, 4, 1)
+        assert merged.errors == {"TIMEOUT": 1}
+        assert merged.latency.total == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
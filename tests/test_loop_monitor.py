@@ -0,0 +1,51 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import patch
+from app.utils.loop_monitor import LoopMonitor
+
+
+class TestLoopMonitor:
+    """Test the event-loop lag probe and blocked-loop watchdog"""
+    
+    @pytest.mark.asyncio
+    async def test_blocking_call_is_reported_with_stack(self):
+        """Test a blocking call shows up as lag and is logged with its stack"""
+        monitor = LoopMonitor(interval=0.02, slow_threshold=0.1)
+        
+        def blocking_database_call():
+            time.sleep(0.3)
+        
+        with patch("app.utils.loop_monitor.usage_rollups") as mock_rollups:
+            await monitor.start()
+            await asyncio.sleep(0.1)
+            blocking_database_call()
+            await asyncio.sleep(0.1)
+            await monitor.stop()
+        
+        stats = monitor.get_stats()
+        assert stats["slow_callbacks"] == 1
+        assert stats["max_lag_ms"] >= 150
+        assert stats["last_slow"]["blocked_ms"] >= 100
+        assert "blocking_database_call" in stats["last_slow"]["stack"]
+        assert mock_rollups.record_loop_lag.called
+        assert any(call.kwargs.get("slow") for call in mock_rollups.record_loop_lag.call_args_list)
+    
+    @pytest.mark.asyncio
+    async def test_idle_loop_has_low_lag(self):
+        """Test an idle loop reports no slow callbacks"""
+        monitor = LoopMonitor(interval=0.01, slow_threshold=0.1)
+        
+        with patch("app.utils.loop_monitor.usage_rollups"):
+            await monitor.start()
+            await asyncio.sleep(0.2)
+            await monitor.stop()
+        
+        stats = monitor.get_stats()
+        assert stats["samples"] >= 5
+        assert stats["slow_callbacks"] == 0
+        assert stats["lag_ms"]["p50"] < 50
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,66 @@
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.external.cache import NearCache, RedisCache
+
+
+class TestNearCache:
+    """Test in-process TTL/LRU cache tier"""
+    
+    def test_lru_eviction(self):
+        """Test least recently used entries are evicted over the entry limit"""
+        near = NearCache(max_entries=2, max_bytes=1024 * 1024, ttl=30)
+        near.set("exam_result:1", "a")
+        near.set("exam_result:2", "b")
+        assert near.get("exam_result:1") == "a"
+        
+        near.set("exam_result:3", "c")
+        
+        assert near.get("exam_result:2") is None
+        assert near.get("exam_result:1") == "a"
+        assert near.stats()["evictions"] == 1
+    
+    def test_size_limit_and_expiry(self):
+        """Test byte accounting and TTL expiry"""
+        near = NearCache(max_entries=100, max_bytes=400, ttl=30)
+        near.set("result_render:1", "x" * 200)
+        near.set("result_render:2", "y" * 200)
+        
+        assert near.get("result_render:1") is None
+        assert near.size_bytes <= 400
+        
+        with patch("app.external.cache.time.monotonic", return_value=10 ** 9):
+            assert near.get("result_render:2") is None
+        assert near.stats()["expirations"] == 1
+        assert near.size_bytes == 0
+    
+    @pytest.mark.asyncio
+    async def test_hot_keys_served_in_process(self):
+        """Test repeated reads skip Redis and writes notify other workers"""
+        cache = RedisCache()
+        cache.near = NearCache(max_entries=100, max_bytes=1024 * 1024, ttl=30)
+        cache.near_prefixes = {"result_render"}
+        cache.compact = None
+        cache.redis = MagicMock()
+        cache.redis.get = AsyncMock(return_value=json.dumps({"text": "نتيجة"}))
+        pipe = MagicMock()
+        pipe.execute = AsyncMock()
+        cache.redis.pipeline.return_value.__aenter__.return_value = pipe
+        
+        assert await cache.get("result_render:272591110430082") == {"text": "نتيجة"}
+        assert await cache.get("result_render:272591110430082") == {"text": "نتيجة"}
+        cache.redis.get.assert_called_once()
+        
+        cache.redis.delete = AsyncMock()
+        await cache.delete("result_render:272591110430082")
+        pipe.publish.assert_called_once_with(
+            RedisCache.INVALIDATION_CHANNEL, f"{cache.node_id} result_render:272591110430082"
+        )
+        
+        stats = cache.get_stats()
+        assert stats["near"]["hits"] == 1
+        assert stats["redis"]["hits"] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
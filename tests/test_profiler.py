@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import time
+import tracemalloc
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.bot.handlers import BotHandlers
+from app.utils.profiler import RuntimeProfiler, ProfilerBusy, ProfileResult
+
+
+async def busy_handler(seconds: float):
+    """Burns CPU on the loop in short slices"""
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        sum(i * i for i in range(2000))
+        await asyncio.sleep(0)
+
+
+async def slow_api_call():
+    await asyncio.sleep(1)
+
+
+async def waiting_handler():
+    await slow_api_call()
+
+
+class TestRuntimeProfiler:
+    """Test the on-demand sampling profiler and allocation diff"""
+    
+    @pytest.mark.asyncio
+    async def test_cpu_profile(self):
+        """Test loop stacks show CPU work and await chains show where tasks wait"""
+        profiler = RuntimeProfiler(interval=0.002)
+        busy = asyncio.create_task(busy_handler(0.5))
+        waiting = asyncio.create_task(waiting_handler())
+        
+        result = await profiler.cpu(0.3)
+        await busy
+        waiting.cancel()
+        
+        assert result.samples > 10
+        assert any("busy_handler" in stack for stack in result.stacks)
+        assert "waiting_handler;slow_api_call" in "".join(result.async_stacks).replace(" (tests/test_profiler.py)", "")
+        
+        top = {item["coroutine"].split(" ")[0]: item for item in result.top_coroutines()}
+        assert top["slow_api_call"]["avg_tasks"] > 0.9
+        assert top["slow_api_call"]["wall_seconds"] == pytest.approx(0.3, rel=0.3)
+        
+        folded = result.folded(result.stacks)
+        assert folded.splitlines()[0].rsplit(" ", 1)[1].isdigit()
+    
+    def test_cpu_profile_off_main_thread(self):
+        """Test the thread sampler takes over where signals are unavailable"""
+        profiler = RuntimeProfiler(interval=0.002)
+        
+        async def run():
+            busy = asyncio.create_task(busy_handler(0.3))
+            result = await profiler.cpu(0.2)
+            await busy
+            return result
+        
+        results = []
+        worker = threading.Thread(target=lambda: results.append(asyncio.run(run())))
+        worker.start()
+        worker.join()
+        
+        assert results[0].samples > 10
+        assert any("_run_once" in stack for stack in results[0].stacks)
+    
+    @pytest.mark.asyncio
+    async def test_one_profile_at_a_time(self):
+        """Test a second profile is refused while one is running"""
+        profiler = RuntimeProfiler(interval=0.01)
+        running = asyncio.create_task(profiler.cpu(0.2))
+        await asyncio.sleep(0.05)
+        
+        with pytest.raises(ProfilerBusy):
+            await profiler.memory(0.1)
+        await running
+        assert (await profiler.cpu(0.1)).samples > 0
+    
+    @pytest.mark.asyncio
+    async def test_memory_diff(self):
+        """Test allocations made during the window are reported by line"""
+        profiler = RuntimeProfiler()
+        retained = []
+        
+        async def leak():
+            await asyncio.sleep(0.05)
+            retained.extend(bytearray(1024) for _ in range(2000))
+        
+        task = asyncio.create_task(leak())
+        report = await profiler.memory(0.2, limit=5)
+        await task
+        
+        assert report["top"][0]["location"].startswith(__file__)
+        assert report["top"][0]["size_diff_kb"] >= 1500
+        assert report["top"][0]["count_diff"] >= 2000
+    
+    @pytest.mark.asyncio
+    async def test_memory_report_bounds(self):
+        """Test the report size and traceback depth are clamped"""
+        profiler = RuntimeProfiler()
+        
+        with patch("app.utils.profiler.tracemalloc.start", wraps=tracemalloc.start) as start:
+            report = await profiler.memory(0.1, limit=10**6, frames=10**6)
+        
+        start.assert_called_once_with(profiler.MAX_FRAMES)
+        assert len(report["top"]) <= profiler.MAX_TOP
+        assert (await profiler.memory(0.1, limit=-5, frames=0))["duration"] == 0.1
+    
+    @pytest.mark.asyncio
+    async def test_admin_profile_without_samples(self):
+        """Test an empty CPU profile is reported as text instead of an empty file"""
+        update = MagicMock()
+        update.message.reply_text = AsyncMock()
+        update.message.reply_document = AsyncMock()
+        
+        with patch("app.bot.handlers.runtime_profiler.cpu", AsyncMock(return_value=ProfileResult())):
+            await BotHandlers(shard_id=0)._run_profile(update, 1, memory=False)
+        
+        update.message.reply_document.assert_not_called()
+        assert "لم تُجمع عينات" in update.message.reply_text.call_args_list[0].args[0]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
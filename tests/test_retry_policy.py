@@ -0,0 +1,86 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from telegram.error import Forbidden, NetworkError
+from app.external.retry_policy import RetryPolicy, parse_retry_after
+from app.bot.single_interface_manager import SingleInterfaceBotManager
+from app.utils.deadline import deadline_scope
+
+
+class TestRetryPolicy:
+    """Test shared retry budget and backoff"""
+    
+    def test_budget_caps_retries(self):
+        """Test retries are limited to a fraction of requests plus the reserve"""
+        policy = RetryPolicy("test", budget_ratio=0.1, min_retries_per_second=0.2, window_seconds=10)
+        for _ in range(100):
+            policy.record_request()
+        
+        allowed = sum(policy.allow_retry() for _ in range(50))
+        
+        assert allowed == 12  # 0.1 * 100 + 0.2 * 10
+        assert policy.get_stats()["budget_exhausted"] == 38
+    
+    def test_decorrelated_jitter(self):
+        """Test delays stay between the base and three times the previous delay"""
+        policy = RetryPolicy("test", base_delay=0.5, max_delay=8.0)
+        delays = [policy.next_delay(2.0) for _ in range(200)]
+        
+        assert all(0.5 <= delay <= 6.0 for delay in delays)
+        assert len(set(delays)) > 100
+        assert policy.next_delay(100.0) <= 8.0
+    
+    @pytest.mark.asyncio
+    async def test_backoff_honours_retry_after_and_deadline(self):
+        """Test retry-after is used as the delay unless it is too long or past the deadline"""
+        policy = RetryPolicy("test", max_retry_after=30.0)
+        
+        with patch("app.external.retry_policy.asyncio.sleep", new=AsyncMock()) as mock_sleep:
+            assert await policy.backoff(0.5, retry_after=3.0) == 3.0
+            mock_sleep.assert_awaited_once_with(3.0)
+            
+            assert await policy.backoff(0.5, retry_after=60.0) is None
+            with deadline_scope(2):
+                assert await policy.backoff(0.5, retry_after=3.0) is None
+    
+    def test_parse_retry_after(self):
+        """Test Retry-After values are parsed"""
+        assert parse_retry_after("5") == 5.0
+        assert parse_retry_after(None) is None
+        assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") is None
+
+
+class TestTelegramFallback:
+    """Test backend bot fallback uses the retry budget for transient errors only"""
+    
+    @pytest.fixture
+    def manager(self):
+        """Create manager with mocked bots and an exhausted retry budget"""
+        manager = SingleInterfaceBotManager()
+        manager.retry_policy = RetryPolicy("telegram", budget_ratio=0.0, min_retries_per_second=0.0)
+        manager.get_response_bot = AsyncMock(return_value=MagicMock())
+        manager.main_application = MagicMock()
+        manager.main_application.bot.send_message = AsyncMock()
+        return manager
+    
+    @pytest.mark.asyncio
+    async def test_routing_fallback_not_budgeted(self, manager):
+        """Test users who never started the backend bot are answered by the main bot"""
+        manager.get_response_bot.return_value.send_message = AsyncMock(side_effect=Forbidden("bot can't initiate conversation"))
+        
+        await manager.send_message(123, "hi")
+        
+        manager.main_application.bot.send_message.assert_awaited_once_with(chat_id=123, text="hi")
+    
+    @pytest.mark.asyncio
+    async def test_transient_fallback_needs_budget(self, manager):
+        """Test network errors are not retried once the budget is spent"""
+        manager.get_response_bot.return_value.send_message = AsyncMock(side_effect=NetworkError("timeout"))
+        
+        with pytest.raises(NetworkError):
+            await manager.send_message(123, "hi")
+        
+        manager.main_application.bot.send_message.assert_not_called()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,89 @@
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import patch
+from app.database.models import AnalyticsEvent
+from app.external.rollups import RollupStore, latency_bucket, bucket_value, histogram_percentile
+
+
+def make_event(user_id, action="result", ms=100, success=True):
+    return AnalyticsEvent(
+        user_id=user_id, action=action, response_time_ms=ms, success=success,
+        created_at=datetime.now(timezone.utc)
+    )
+
+
+class TestHistogram:
+    """Test mergeable latency histogram helpers"""
+    
+    def test_bucket_resolution(self):
+        """Test bucket values stay within the histogram's relative error"""
+        for ms in [1, 12, 150, 980, 4200, 30000]:
+            assert abs(bucket_value(latency_bucket(ms)) - ms) / ms < 0.1
+    
+    def test_percentiles(self):
+        """Test percentiles over a bucket histogram"""
+        histogram = {}
+        for ms in [10] * 90 + [500] * 9 + [3000]:
+            bucket = latency_bucket(ms)
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+        
+        assert histogram_percentile(histogram, 50) == pytest.approx(10, rel=0.1)
+        assert histogram_percentile(histogram, 95) == pytest.approx(500, rel=0.1)
+        assert histogram_percentile(histogram, 99.9) == pytest.approx(3000, rel=0.1)
+        assert histogram_percentile({}, 50) is None
+
+
+class TestRollupStore:
+    """Test per-minute and per-hour usage rollups"""
+    
+    @pytest.mark.asyncio
+    async def test_flush_and_summary(self, fake_redis):
+        """Test events from two workers merge into one summary"""
+        with patch("app.external.rollups.redis_cache") as mock_cache:
+            mock_cache.redis = fake_redis
+            mock_cache.near = None
+            mock_cache.redis_hits, mock_cache.redis_misses = 0, 0
+            
+            workers = [RollupStore(), RollupStore()]
+            for i in range(10):
+                workers[i % 2].record(make_event(user_id=i % 4, ms=20))
+            workers[0].record(make_event(user_id=9, action="search_name", ms=2000, success=False))
+            workers[1].record_loop_lag(1.0)
+            workers[1].record_loop_lag(250.0, slow=True)
+            
+            mock_cache.redis_hits, mock_cache.redis_misses = 3, 1
+            for worker in workers:
+                assert await worker.flush() is True
+            
+            summary = await workers[0].summary("m", 5)
+            hourly = await workers[0].summary("h", 1)
+        
+        assert summary["requests"] == 11
+        assert summary["failures"] == 1
+        assert summary["by_action"] == {"result": 10, "search_name": 1}
+        assert summary["unique_users"] == 5
+        assert summary["latency_ms"]["p50"] == pytest.approx(20, rel=0.1)
+        assert summary["latency_ms"]["p99"] == pytest.approx(2000, rel=0.1)
+        assert summary["cache_hit_ratio"] == 0.75
+        assert summary["loop_lag_ms"]["max"] == pytest.approx(250, rel=0.1)
+        assert summary["slow_callbacks"] == 1
+        assert hourly["requests"] == 11
+        assert all(ttl in (48 * 3600, 30 * 24 * 3600) for ttl in fake_redis.expiries.values())
+    
+    @pytest.mark.asyncio
+    async def test_flush_without_redis(self):
+        """Test pending deltas are dropped instead of growing while Redis is down"""
+        store = RollupStore()
+        store.record(make_event(user_id=1))
+        
+        with patch("app.external.rollups.redis_cache") as mock_cache:
+            mock_cache.redis = None
+            mock_cache.near = None
+            mock_cache.redis_hits, mock_cache.redis_misses = 0, 0
+            assert await store.flush() is False
+        
+        assert store.get_stats() == {"pending_buckets": 0, "flushes": 0, "failed_flushes": 1}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,44 @@
+import logging
+import socket
+import pytest
+from app.serve import SampledAccessLog, bind_socket, server_options
+
+
+class TestServe:
+    """Test worker socket setup and runtime profiles"""
+    
+    def test_profiles(self):
+        """Test the default profile keeps uvicorn defaults and unknown names fail"""
+        assert server_options("default") == {}
+        options = server_options("performance")
+        assert options["loop"] == "uvloop" and options["http"] == "httptools"
+        assert options["limit_concurrency"] >= 1
+        with pytest.raises(ValueError):
+            server_options("fast")
+    
+    def test_sampled_access_log(self):
+        """Test errors are always kept and other lines follow the sample rate"""
+        def record(status):
+            return logging.LogRecord("uvicorn.access", logging.INFO, "", 0, "%s %s %s %s %d", ("1.2.3.4", "POST", "/webhook", "1.1", status), None)
+        
+        assert SampledAccessLog(0.0).filter(record(500))
+        assert not SampledAccessLog(0.0).filter(record(503))
+        assert not SampledAccessLog(0.0).filter(record(200))
+        assert SampledAccessLog(1.0).filter(record(200))
+    
+    @pytest.mark.skipif(not hasattr(socket, "SO_REUSEPORT"), reason="SO_REUSEPORT not available")
+    def test_reuse_port_sockets_share_a_port(self):
+        """Test two workers can bind the same port with SO_REUSEPORT"""
+        first = bind_socket("127.0.0.1", 0, reuse_port=True)
+        port = first.getsockname()[1]
+        second = bind_socket("127.0.0.1", port, reuse_port=True)
+        try:
+            assert second.getsockname()[1] == port
+            assert second.getsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT) == 1
+        finally:
+            first.close()
+            second.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
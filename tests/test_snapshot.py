@@ -0,0 +1,86 @@
+import os
+import pytest
+from unittest.mock import MagicMock, patch
+from app.database.snapshot import write_snapshot, ResultsSnapshot, ResultsSnapshotStore
+from app.jobs.export_snapshot import iter_snapshot_records
+
+
+def make_records(examnos, grade="ناجح"):
+    """Build sorted (examno, student, exam_result) records"""
+    return [
+        (examno, {"examno": examno, "aname": f"طالب {examno[-2:]}"}, {"examno": examno, "stucases": grade})
+        for examno in examnos
+    ]
+
+
+class TestResultsSnapshot:
+    """Test memory-mapped results snapshot"""
+    
+    def test_lookup(self, tmp_path):
+        """Test binary search lookups and misses"""
+        path = str(tmp_path / "results.snapshot")
+        examnos = [f"2725911104300{i:02d}" for i in range(0, 50, 2)]
+        
+        assert write_snapshot(path, make_records(examnos)) == 25
+        
+        snapshot = ResultsSnapshot(path)
+        try:
+            for examno in (examnos[0], examnos[12], examnos[-1]):
+                data = snapshot.get_student_with_result(examno)
+                assert data["student"].examno == examno
+                assert data["exam_result"].stucases == "ناجح"
+            
+            assert snapshot.get_student_with_result("272591110430001") is None
+            assert snapshot.get_student_with_result("999999999999999") is None
+            assert snapshot.get_student_with_result("abc") is None
+            # Only exact 15-digit keys: int() would map these onto stored exam numbers
+            assert snapshot.get_student_with_result("0" + examnos[0]) is None
+            assert snapshot.get_student_with_result(examnos[0][:-1]) is None
+        finally:
+            snapshot.close()
+    
+    def test_duplicates_skipped(self, tmp_path):
+        """Test out-of-order records are not written"""
+        path = str(tmp_path / "results.snapshot")
+        records = make_records(["272591110430002", "272591110430001", "272591110430002", "272591110430003"])
+        
+        assert write_snapshot(path, records) == 2
+    
+    def test_store_swaps_new_snapshot(self, tmp_path):
+        """Test a republished snapshot is picked up without reopening the store"""
+        path = str(tmp_path / "results.snapshot")
+        write_snapshot(path, make_records(["272591110430082"], grade="راسب"))
+        
+        store = ResultsSnapshotStore(path)
+        store.RELOAD_CHECK_SECONDS = 0
+        try:
+            assert store.get_student_with_result("272591110430082")["exam_result"].stucases == "راسب"
+            
+            write_snapshot(path, make_records(["272591110430082"], grade="ناجح"))
+            assert store.get_student_with_result("272591110430082")["exam_result"].stucases == "ناجح"
+            assert not [name for name in os.listdir(tmp_path) if name.startswith(".snapshot-")]
+        finally:
+            store.close()
+    
+    def test_export_error_keeps_published_snapshot(self, tmp_path):
+        """Test a database error aborts the export without replacing the file"""
+        path = str(tmp_path / "results.snapshot")
+        write_snapshot(path, make_records(["272591110430082"]))
+        published = open(path, "rb").read()
+        
+        with patch("app.jobs.export_snapshot.supabase_client") as mock_db:
+            mock_db.get_exam_numbers_page = MagicMock(side_effect=ConnectionError("db down"))
+            with pytest.raises(ConnectionError):
+                write_snapshot(path, iter_snapshot_records(batch_size=10))
+            mock_db.get_exam_numbers_page.assert_called_once_with("students", None, 10, strict=True)
+        
+        assert open(path, "rb").read() == published
+        assert not [name for name in os.listdir(tmp_path) if name.startswith(".snapshot-")]
+    
+    def test_store_disabled_without_path(self):
+        """Test lookups return None when no snapshot is configured"""
+        assert ResultsSnapshotStore("").get_student_with_result("272591110430082") is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.external.cache import RedisCache, make_entry, read_entry
+from app.bot.result_service import ResultService
+
+
+class TestStaleWhileRevalidate:
+    """Test soft/hard expiry and background refresh"""
+    
+    def test_entry_expiry(self):
+        """Test entries are fresh until the soft expiry and kept past it"""
+        entry, redis_ttl = make_entry({"total": 163}, ttl=60)
+        
+        assert read_entry(entry) == ({"total": 163}, False)
+        assert redis_ttl > 60
+        with patch("app.external.cache.time.time", return_value=entry["_soft"] + 1):
+            assert read_entry(entry) == ({"total": 163}, True)
+        
+        # Entries written before soft expiry existed are served as they are
+        assert read_entry({"total": 163}) == ({"total": 163}, False)
+        assert read_entry(None) == (None, False)
+    
+    def test_ttl_jitter(self):
+        """Test entries written together get spread-out soft expiries"""
+        soft_expiries = {make_entry({"n": i}, ttl=1000)[0]["_soft"] // 1 for i in range(50)}
+        
+        assert len(soft_expiries) > 10
+    
+    def test_early_refresh_probability(self):
+        """Test refresh becomes more likely closer to expiry and for slow values"""
+        def refresh_rate(seconds_left: float, compute_time: float) -> float:
+            entry, _ = make_entry({"total": 163}, ttl=600, compute_time=compute_time)
+            entry["_soft"] = 10 ** 6 + seconds_left
+            with patch("app.external.cache.time.time", return_value=10 ** 6):
+                return sum(read_entry(entry)[1] for _ in range(2000)) / 2000
+        
+        assert refresh_rate(300, 1.0) == 0.0
+        assert 0.0 < refresh_rate(2, 1.0) < refresh_rate(0.5, 1.0) < 1.0
+        assert refresh_rate(2, 1.0) < refresh_rate(2, 4.0)
+        assert refresh_rate(2, 0.0) == 0.0
+    
+    @pytest.mark.asyncio
+    async def test_single_background_refresh(self):
+        """Test concurrent stale reads start one refresh"""
+        cache = RedisCache()
+        cache.redis = MagicMock()
+        cache.redis.set = AsyncMock(return_value=True)
+        cache.redis.delete = AsyncMock()
+        refresh = AsyncMock()
+        
+        assert cache.refresh_in_background("result_render:1", refresh) is True
+        assert cache.refresh_in_background("result_render:1", refresh) is False
+        await asyncio.gather(*cache._refresh_tasks)
+        
+        refresh.assert_awaited_once()
+        cache.redis.delete.assert_awaited_once_with("refresh_lock:result_render:1")
+        assert cache.background_refreshes == 1
+    
+    @pytest.mark.asyncio
+    async def test_stale_render_served_immediately(self):
+        """Test a stale rendered result is returned without waiting on the refresh"""
+        service = ResultService()
+        entry, _ = make_entry({"text": "نتيجة قديمة"}, ttl=60)
+        entry["_soft"] = 0
+        
+        with patch("app.bot.result_service.redis_cache") as mock_cache, \
+             patch("app.bot.result_service.results_snapshot") as mock_snapshot:
+            mock_snapshot.get_student_with_result = MagicMock(return_value=None)
+            mock_cache.get_cache_key = MagicMock(return_value="result_render:272591110430082")
+            mock_cache.get = AsyncMock(return_value=entry)
+            
+            assert await service.get_result_text("272591110430082") == "نتيجة قديمة"
+            mock_cache.refresh_in_background.assert_called_once()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
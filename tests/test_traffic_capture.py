@@ -0,0 +1,146 @@
+import asyncio
+import gzip
+import json
+import re
+import time
+import pytest
+from app.utils.traffic_capture import TrafficRecorder, UpdateAnonymizer
+
+
+def message_update(update_id: int, user_id: int, text: str) -> dict:
+    user = {"id": user_id, "is_bot": False, "first_name": "محمد", "username": "student"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "from": user,
+            "chat": {"id": user_id, "first_name": "محمد", "type": "private"},
+            "date": 1752400000,
+            "text": text
+        }
+    }
+
+
+class TestTrafficRecorder:
+    """Test webhook capture and anonymization"""
+    
+    def test_anonymizer_is_consistent(self):
+        """Test the same user maps to the same ID in every object, and names are dropped"""
+        anonymizer = UpdateAnonymizer("salt")
+        update = anonymizer.anonymize(message_update(1, 42, "272591110430082"))
+        message = update["message"]
+        
+        assert message["from"]["id"] == message["chat"]["id"] != 42
+        assert message["from"]["id"] == UpdateAnonymizer("salt").remap_id(42)
+        assert message["from"]["id"] != UpdateAnonymizer("other").remap_id(42)
+        assert "first_name" not in message["from"] and "username" not in message["from"]
+        assert anonymizer.remap_id(-1001639586241) < 0
+    
+    def test_anonymizer_disguises_text(self):
+        """Test exam numbers and names are replaced by same-shape fakes, and contacts and locations are redacted"""
+        anonymizer = UpdateAnonymizer("salt")
+        fake_examno = anonymizer.anonymize(message_update(1, 42, "272591110430082"))["message"]["text"]
+        assert fake_examno != "272591110430082" and fake_examno.isdigit() and len(fake_examno) == 15
+        assert anonymizer.remap_message_text("272591110430082") == fake_examno
+        
+        name = anonymizer.remap_message_text("محمد أحمد")
+        assert name != "محمد أحمد" and [len(word) for word in name.split(" ")] == [4, 4]
+        assert anonymizer.remap_message_text("/start ref42").startswith("/start ")
+        assert anonymizer.remap_message_text("تأكيد") == "تأكيد"
+        
+        callback = anonymizer.anonymize({"callback_query": {"data": "share_272591110430082"}})
+        assert callback["callback_query"]["data"] == f"share_{fake_examno}"
+        
+        keyboard_update = {"callback_query": {
+            "data": "select_student_272591110430082",
+            "message": {
+                "text": "👤 272591110430082",
+                "reply_markup": {"inline_keyboard": [
+                    [{"text": "محمد أحمد", "callback_data": "select_student_272591110430082"}],
+                    [{"text": "📤 مشاركة النتيجة", "callback_data": "share_272591110430082"}]
+                ]}
+            }
+        }}
+        captured = json.dumps(anonymizer.anonymize(keyboard_update), ensure_ascii=False)
+        assert not re.search(r"\d{15}", captured.replace(fake_examno, ""))
+        assert f"share_{fake_examno}" in captured
+        
+        message = anonymizer.anonymize({"message": {
+            "contact": {"phone_number": "+962791234567", "first_name": "محمد", "user_id": 42},
+            "location": {"latitude": 31.95, "longitude": 35.91}
+        }})["message"]
+        assert message["contact"]["phone_number"] != "+962791234567" and message["contact"]["first_name"] == ""
+        assert message["contact"]["user_id"] == anonymizer.remap_id(42)
+        assert message["location"] == {"latitude": 0.0, "longitude": 0.0}
+    
+    @pytest.mark.asyncio
+    async def test_records_compressed_jsonl(self, tmp_path):
+        """Test queued bodies are written as anonymized gzip JSONL"""
+        recorder = TrafficRecorder(capture_dir=str(tmp_path), salt="salt", flush_interval=60, enabled=True)
+        await recorder.start()
+        for i in range(3):
+            assert recorder.record(json.dumps(message_update(i, 42 + i % 2, "hi")).encode(), "/webhook")
+        recorder.record(b"not json", "/webhook")
+        await recorder.stop()
+        
+        with gzip.open(recorder.path, "rt", encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f]
+        assert [line["update"]["update_id"] for line in lines] == [0, 1, 2]
+        assert lines[0]["path"] == "/webhook"
+        assert lines[0]["update"]["message"]["from"]["id"] == lines[2]["update"]["message"]["from"]["id"]
+        assert recorder.get_stats()["written"] == 3
+    
+    def test_disabled_recorder_ignores_updates(self):
+        """Test nothing is queued unless capture is enabled"""
+        recorder = TrafficRecorder(enabled=False)
+        assert recorder.record(b"{}", "/webhook") is False
+        assert recorder.get_stats()["pending"] == 0
+
+
+class TestTrafficReplayer:
+    """Test time-scaled replay of captured updates"""
+    
+    @pytest.mark.asyncio
+    async def test_per_user_order_and_speed(self):
+        """Test a slow reply delays only that user's next update, and gaps are scaled"""
+        aiohttp = pytest.importorskip("aiohttp")
+        from aiohttp import web
+        from aiohttp.test_utils import TestServer
+        from tests.replay_traffic import TrafficReplayer
+        
+        received = []
+        
+        async def webhook(request):
+            update = await request.json()
+            if update["message"]["text"] == "a":
+                await asyncio.sleep(0.3)
+            received.append((update["message"]["text"], update["update_id"]))
+            return web.json_response({"status": "ok"})
+        
+        app = web.Application()
+        app.router.add_post("/webhook", webhook)
+        events = [
+            {"ts": 1000.0, "path": "/webhook", "update": message_update(1, 7, "a")},
+            {"ts": 1001.0, "path": "/webhook", "update": message_update(2, 7, "b")},
+            {"ts": 1002.0, "path": "/webhook", "update": message_update(3, 8, "c")},
+        ]
+        
+        async with TestServer(app) as server:
+            started = time.monotonic()
+            results = await TrafficReplayer(str(server.make_url("")), speed=10).replay(iter(events))
+            elapsed = time.monotonic() - started
+        
+        # User 8's update overtakes user 7's, which waits for the slow first reply
+        assert [text for text, _ in received] == ["c", "a", "b"]
+        
+        # update_ids are rewritten so a second replay is not dropped as redelivery
+        update_ids = dict(received)
+        assert update_ids["a"] < update_ids["b"] < update_ids["c"]
+        assert update_ids["a"] > 3
+        assert results.successful_requests == 3
+        assert results.sessions_started == 2
+        assert elapsed < 1.0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
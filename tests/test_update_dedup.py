@@ -0,0 +1,40 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from app.external.cache import RedisCache
+
+
+class TestUpdateDedup:
+    """Test cross-worker deduplication of redelivered updates"""
+    
+    @pytest.fixture
+    def cache(self):
+        """Create cache with a mocked Redis client"""
+        cache = RedisCache()
+        cache.redis = MagicMock()
+        cache.redis.set = AsyncMock(side_effect=[True, None])
+        cache.redis.delete = AsyncMock()
+        return cache
+    
+    @pytest.mark.asyncio
+    async def test_second_delivery_is_duplicate(self, cache):
+        """Test only the first claim of an update wins"""
+        assert await cache.claim_update("shard1", 42, ttl=120) is True
+        assert await cache.claim_update("shard1", 42, ttl=120) is False
+        cache.redis.set.assert_called_with("update_seen:shard1:42", 1, nx=True, ex=120)
+    
+    @pytest.mark.asyncio
+    async def test_release_and_fail_open(self, cache):
+        """Test release deletes the marker and errors or missing IDs never drop updates"""
+        await cache.release_update("main", 7)
+        cache.redis.delete.assert_called_once_with("update_seen:main:7")
+        
+        assert await cache.claim_update("main", None) is True
+        cache.redis.set = AsyncMock(side_effect=ConnectionError("down"))
+        assert await cache.claim_update("main", 8) is True
+        
+        cache.redis = None
+        assert await cache.claim_update("main", 9) is True
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,89 @@
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi import FastAPI
+from app.main import lifespan
+from app.external.user_activity import UserActivityTracker
+from app.jobs.backfill_user_activity import backfill_user_activity
+
+
+class TestUserActivityTracker:
+    """Test HyperLogLog unique-user counters"""
+    
+    @pytest.mark.asyncio
+    async def test_record_and_count(self, fake_redis):
+        """Test repeated activity counts each user once, and today/this hour come from the UTC rollup buckets"""
+        tracker = UserActivityTracker()
+        now = datetime(2026, 10, 19, 14, 30, tzinfo=timezone.utc).timestamp()
+        fake_redis.sets["rollup:h:2026101813:users"] = {7}
+        fake_redis.sets["rollup:h:2026101900:users"] = {1, 2}
+        fake_redis.sets["rollup:h:2026101914:users"] = {2, 3}
+        
+        with patch("app.external.user_activity.redis_cache") as mock_cache, \
+             patch("app.external.user_activity.time.time", return_value=now):
+            mock_cache.redis = fake_redis
+            for user_id in [1, 2, 2, 3, 1]:
+                tracker.record(user_id)
+            assert await tracker.flush() is True
+            
+            await tracker.add_all_time([3, 4, 5])
+            counts = await tracker.get_counts()
+        
+        assert counts == {"total": 5, "today": 3, "this_hour": 2}
+        assert len(tracker.hour_keys(now)) == 15
+        assert fake_redis.sets[tracker.ALL_TIME_KEY] == {1, 2, 3, 4, 5}
+    
+    @pytest.mark.asyncio
+    async def test_backfill_fails_on_database_error(self):
+        """Test a database error fails the backfill instead of ending it as complete"""
+        with patch("app.jobs.backfill_user_activity.supabase_client") as mock_db:
+            mock_db.get_user_ids_page = MagicMock(side_effect=[[1, 2], ConnectionError("db down")])
+            with patch("app.jobs.backfill_user_activity.user_activity") as mock_tracker:
+                mock_tracker.add_all_time = AsyncMock(return_value=True)
+                with pytest.raises(ConnectionError):
+                    await backfill_user_activity(batch_size=2)
+        
+        mock_db.get_user_ids_page.assert_called_with(2, 2, strict=True)
+    
+    @pytest.mark.asyncio
+    async def test_without_redis(self):
+        """Test counts report an error and pending users are dropped without Redis"""
+        tracker = UserActivityTracker()
+        tracker.record(1)
+        
+        with patch("app.external.user_activity.redis_cache") as mock_cache:
+            mock_cache.redis = None
+            assert await tracker.flush() is False
+            assert "error" in await tracker.get_counts()
+        
+        assert tracker.failed_flushes == 1
+        assert not tracker._pending
+    
+    @pytest.mark.asyncio
+    async def test_final_flush_runs_before_redis_disconnect(self, fake_redis):
+        """Test shutdown flushes pending users while Redis is still connected"""
+        tracker = UserActivityTracker()
+        services = ["loop_monitor", "analytics_buffer", "usage_rollups", "traffic_recorder"]
+        
+        with patch("app.external.user_activity.redis_cache") as mock_cache, \
+             patch("app.main.redis_cache") as main_cache, \
+             patch("app.main.user_activity", tracker), \
+             patch("app.main.TelegramBotManager", return_value=AsyncMock()), \
+             patch("app.main.SingleInterfaceBotManager", return_value=AsyncMock()), \
+             patch("app.main.results_snapshot"), \
+             patch.multiple("app.main", **{name: AsyncMock() for name in services}):
+            mock_cache.redis = fake_redis
+            main_cache.connect = AsyncMock()
+            main_cache.disconnect = AsyncMock(side_effect=lambda: setattr(mock_cache, "redis", None))
+            
+            async with lifespan(FastAPI()):
+                tracker.record(1)
+            
+            main_cache.disconnect.assert_called_once()
+        
+        assert tracker.failed_flushes == 0
+        assert fake_redis.sets[tracker.ALL_TIME_KEY] == {1}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
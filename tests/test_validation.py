@@ -91,6 +91,19 @@ class TestValidationUtils:
             result = ValidationUtils.clean_arabic_name(input_val)
             assert result == expected
     
+    def test_normalize_arabic_name(self):
+        """Test Arabic name normalization for bulk loading"""
+        test_cases = [
+            ("مُحَمَّد  حَسَن", "محمد حسن"),
+            ("عبـــدالله", "عبدالله"),
+            ("  فاطمة   الزهراء ", "فاطمة الزهراء"),
+            ("", None),
+            (None, None)
+        ]
+        
+        for input_val, expected in test_cases:
+            assert ValidationUtils.normalize_arabic_name(input_val) == expected
+    
     def test_is_spam_input(self):
         """Test spam detection"""
         spam_inputs = [
@@ -0,0 +1,78 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+from telegram.request import HTTPXRequest, RequestData
+from telegram.request._requestparameter import RequestParameter
+from app.bot.webhook_reply import WebhookReplyRequest, webhook_reply_scope, direct_send
+
+BASE_URL = "https://api.telegram.org/botTOKEN"
+
+
+def make_request_data(**params) -> RequestData:
+    """Build request data the way python-telegram-bot does"""
+    return RequestData([RequestParameter.from_input(key, value) for key, value in params.items()])
+
+
+class TestWebhookReplyRequest:
+    """Test deferring the first reply into the webhook response"""
+    
+    @pytest.fixture
+    def request_backend(self):
+        """Create request backend with network posts mocked"""
+        with patch.object(HTTPXRequest, "post", new=AsyncMock(return_value={"message_id": 1})) as mock_post:
+            yield WebhookReplyRequest(), mock_post
+    
+    @pytest.mark.asyncio
+    async def test_passthrough_without_scope(self, request_backend):
+        """Test calls go out normally outside a webhook reply scope"""
+        backend, mock_post = request_backend
+        
+        result = await backend.post(f"{BASE_URL}/sendMessage", make_request_data(chat_id=1, text="hi"))
+        
+        assert result == {"message_id": 1}
+        mock_post.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_first_reply_deferred(self, request_backend):
+        """Test first eligible call is returned as webhook payload"""
+        backend, mock_post = request_backend
+        
+        with webhook_reply_scope() as slot:
+            result = await backend.post(f"{BASE_URL}/answerCallbackQuery", make_request_data(callback_query_id="42"))
+            await backend.post(f"{BASE_URL}/editMessageText", make_request_data(chat_id=1, message_id=2, text="x"))
+        
+        assert result is True
+        assert slot.to_payload() == {"method": "answerCallbackQuery", "callback_query_id": "42"}
+        # The edit is sent normally
+        assert mock_post.call_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_deferred_message_flushed_before_next_send(self, request_backend):
+        """Test a deferred message is sent first to keep message order"""
+        backend, mock_post = request_backend
+        
+        with webhook_reply_scope() as slot:
+            await backend.post(f"{BASE_URL}/sendMessage", make_request_data(chat_id=1, text="first"))
+            await backend.post(f"{BASE_URL}/sendMessage", make_request_data(chat_id=1, text="second"))
+        
+        assert slot.to_payload() is None
+        sent_urls = [call.args[0] for call in mock_post.call_args_list]
+        assert sent_urls == [f"{BASE_URL}/sendMessage", f"{BASE_URL}/sendMessage"]
+        assert mock_post.call_args_list[0].args[1].parameters["text"] == "first"
+    
+    @pytest.mark.asyncio
+    async def test_direct_send_and_reads_not_deferred(self, request_backend):
+        """Test bypassed calls and non-reply methods are not deferred"""
+        backend, mock_post = request_backend
+        
+        with webhook_reply_scope() as slot:
+            await backend.post(f"{BASE_URL}/getChatMember", make_request_data(chat_id=1, user_id=1))
+            with direct_send():
+                await backend.post(f"{BASE_URL}/sendMessage", make_request_data(chat_id=1, text="loading"))
+            await backend.post(f"{BASE_URL}/editMessageText", make_request_data(chat_id=1, message_id=1, text="done"))
+        
+        assert mock_post.call_count == 2
+        assert slot.to_payload()["method"] == "editMessageText"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])